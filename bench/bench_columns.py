@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG benchmarks
+####################
+# File:       bench/bench_columns.py
+#
+#             Status.data memory use of a large colon listing,
+#             comparing the list of namedtuple's against the
+#             columnar ColumnStore.
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Colon listing record storage benchmark
+
+usage: python bench/bench_columns.py [number of keys]
+'''
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyGPG.status import Status
+
+from generators import colon_listing
+
+
+def data_size(listing, columnar):
+    '''Returns the memory held by the parsed Status.data,
+    and the number of records'''
+    tracemalloc.start()
+    status = Status(columnar=columnar)
+    for line in listing.split('\n'):
+        status.process_colon_listing(line)
+    # the raw lines are not part of the data
+    status.status_msgs = []
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, len(status.data)
+
+
+def main(keys=100000):
+    listing = colon_listing(keys)
+    rows, records = data_size(listing, False)
+    columns, records2 = data_size(listing, True)
+    assert records == records2
+    print("keys:                %d" % keys)
+    print("records:             %d" % records)
+    print("namedtuple rows:     %12.1f MiB" % (rows / 1048576.0))
+    print("ColumnStore:         %12.1f MiB" % (columns / 1048576.0))
+    print("reduction:           %12.2fx" % (float(rows) / columns))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
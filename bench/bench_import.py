@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG benchmarks
+####################
+# File:       bench/bench_import.py
+#
+#             'import pyGPG.gpg' start up time, with the legend
+#             record classes created on first use, compared to
+#             creating them all at import.
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Import time benchmark
+
+usage: python bench/bench_import.py [number of runs]
+'''
+
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the import time of the module, measured in a fresh interpreter
+SCRIPT = '''
+import time
+start = time.perf_counter()
+%s
+print(time.perf_counter() - start)
+'''
+
+LAZY = 'import pyGPG.gpg'
+# creating every record class, as the import used to
+EAGER = 'import pyGPG.gpg; from pyGPG.legend import *'
+
+
+def import_time(statement, runs):
+    '''Returns the best import time in seconds of the statement'''
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='')
+    times = []
+    for run in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', SCRIPT % statement], env=env)
+        times.append(float(output))
+    return min(times)
+
+
+def class_creation_time():
+    '''Returns the time to create all of the legend record classes'''
+    from pyGPG import legend
+    names = [name for (name, fields, msg) in legend.CLASSES]
+
+    def create():
+        for name in names:
+            legend.__dict__.pop(name, None)
+        for name in names:
+            getattr(legend, name)
+    return min(timeit.Timer(create).repeat(repeat=5, number=1))
+
+
+def main(runs=20):
+    sys.path.insert(0, ROOT)
+    lazy = import_time(LAZY, runs)
+    eager = import_time(EAGER, runs)
+    print("import pyGPG.gpg:    %12.2f ms" % (lazy * 1000))
+    print("+ all classes:       %12.2f ms" % (eager * 1000))
+    print("classes alone:       %12.2f ms" % (class_creation_time() * 1000))
+    print("speedup:             %12.2fx" % (eager / lazy))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG benchmarks
+####################
+# File:       bench/bench_launch.py
+#
+#             gpg launch latency of the Popen, posix_spawn and
+#             forkserver launchers, at growing parent process sizes
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Process launch benchmark
+
+usage: python bench/bench_launch.py [runs] [parent sizes in MiB ...]
+'''
+
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pyGPG.config import GPGConfig
+from pyGPG.gpg import GPG
+from pyGPG.launch import LAUNCHERS, start_forkserver
+
+PAGE = 4096
+
+
+def grow(buffers, mib):
+    '''Grows the process by mib MiB of touched memory'''
+    buf = bytearray(mib * 1024 * 1024)
+    # write to every page, so they are all really mapped
+    buf[::PAGE] = b'\x01' * len(range(0, len(buf), PAGE))
+    buffers.append(buf)
+
+
+def launch_latency(launcher, runs):
+    '''Returns the best per run latency, in ms, of the launcher'''
+    config = GPGConfig()
+    config.options['gpg_command'] = os.path.join(ROOT, 'test', 'gpg-cat')
+    config.options['launcher'] = launcher
+    gpg = GPG(config)
+    timer = timeit.Timer(lambda: gpg.decrypt(b'x'))
+    return min(timer.repeat(repeat=3, number=runs)) / runs * 1000
+
+
+def main(runs=50, *sizes):
+    sizes = sizes or (0, 512, 2048)
+    # the fork server must be started while the process is small
+    start_forkserver()
+    buffers = []
+    grown = 0
+    print('parent MiB  ' + ''.join('%14s' % x for x in LAUNCHERS))
+    for size in sorted(sizes):
+        grow(buffers, size - grown)
+        grown = size
+        latency = [launch_latency(launcher, runs) for launcher in LAUNCHERS]
+        print('%10d  ' % size + ''.join('%11.2f ms' % x for x in latency))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG benchmarks
+####################
+# File:       bench/bench_status.py
+#
+#             Status.extract_data() parsing speed, comparing the keyword
+#             dispatch table parser against the previous substring scan
+#             and getattr(legend, key) parser.
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Status parsing benchmark
+
+usage: python bench/bench_status.py [number of lines]
+'''
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyGPG import legend
+from pyGPG.legend import GPG_IDENTIFIER, PYGPG_IDENTIFIER, GPG_VER_IDENTFIER
+from pyGPG.status import Status
+
+from generators import status_stream
+
+
+class LegacyStatus(Status):
+    '''The substring scan, getattr(legend, key) parser
+    the dispatch table replaced'''
+
+    @staticmethod
+    def isinstance_msg(identifier, msg):
+        return identifier in msg
+
+    def extract_data(self, messages):
+        stderr_msgs = []
+        self.messages = messages
+        for msg in messages:
+            if self.isinstance_msg(GPG_IDENTIFIER, msg):
+                self.process_status_msg(msg)
+            elif self.isinstance_msg(PYGPG_IDENTIFIER, msg):
+                self.process_pygpg_msg(msg)
+            elif self.isinstance_msg(GPG_VER_IDENTFIER, msg):
+                self.process_gpg_ver(messages[1:])
+                break
+            else:
+                stderr_msgs.append(msg)
+        return stderr_msgs
+
+    def _split_message(self, msg):
+        alerts = []
+        parts = msg.split(' ', 2)[1:]
+        key = parts.pop(0)
+        try:
+            status = getattr(legend, key)
+        except AttributeError:
+            alerts.append(
+                (self.errors, [PYGPG_IDENTIFIER, 'PYGPG_ATTRIBUTE_ERROR',
+                               legend, key]))
+            return (None, parts, alerts)
+        num_fields = len(status._fields)
+        if num_fields != len(parts):
+            if parts is not [] and len(parts) == 1:
+                parts = parts[0].split(' ', num_fields - 1)
+            missing = num_fields - len(parts)
+            while missing > 0:
+                parts.append(None)
+                missing -= 1
+            if missing < 0:
+                alerts.append(
+                    (self.errors, [PYGPG_IDENTIFIER, 'PYGPG_UNEXPECTED_DATA',
+                                   key, str(status._fields), str(parts[missing:])]))
+                parts = parts[:missing]
+        return (status, parts, alerts)
+
+
+def lines_per_second(klass, stream, repeat=5):
+    '''Returns the best lines/second rate of klass().extract_data(stream)'''
+    timer = timeit.Timer(lambda: klass().extract_data(stream))
+    best = min(timer.repeat(repeat=repeat, number=1))
+    return len(stream) / best
+
+
+def main(lines=200000):
+    stream = status_stream(lines)
+    legacy, table = LegacyStatus(), Status()
+    assert legacy.extract_data(stream) == table.extract_data(stream)
+    assert legacy.data == table.data
+    legacy = lines_per_second(LegacyStatus, stream)
+    table = lines_per_second(Status, stream)
+    print("status lines:        %d" % len(stream))
+    print("legacy parser:       %12.0f lines/s" % legacy)
+    print("dispatch table:      %12.0f lines/s" % table)
+    print("speedup:             %12.2fx" % (table / legacy))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG benchmarks
+####################
+# File:       bench/generators.py
+#
+#             Synthetic gpg output generators for the benchmarks
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Synthetic status-fd streams and colon listings.
+
+The output only depends on the size asked for, so the benchmark
+results are comparable between runs and commits.
+'''
+
+
+# one signature verification worth of stderr, status and human messages
+VERIFY_BLOCK = [
+    '[GNUPG:] NEWSIG',
+    'gpg: Signature made Sun 22 Jan 2017 09:16:08 AM PST',
+    '[GNUPG:] KEY_CONSIDERED 476935D6D659B4C27B700FEDABB2F2DC74991EE9 0',
+    '[GNUPG:] SIG_ID us8uQLSk4XNs1xU1fQeZRaPI9WE 2017-01-22 1485105368',
+    '[GNUPG:] GOODSIG A9661AC8014A7CF0 pyGPG Test <pygpg@nowhere.foo>',
+    'gpg: Good signature from "pyGPG Test <pygpg@nowhere.foo>" [ultimate]',
+    '[GNUPG:] VALIDSIG 884D0847E08005BC1E6DA041A9661AC8014A7CF0 2017-01-22 '
+        '1485105368 0 4 0 1 8 00 476935D6D659B4C27B700FEDABB2F2DC74991EE9',
+    '[GNUPG:] TRUST_ULTIMATE 0 pgp',
+    '[GNUPG:] PROGRESS file:foo.txt ? 100 1000',
+    '[GNUPG:] NO_PUBKEY 2214D90A014F17CB',
+]
+
+
+def status_stream(lines):
+    '''Returns a synthetic stderr stream of about the number of lines
+
+    @param lines: int
+    @rtype list: of stderr lines
+    '''
+    blocks = max(1, lines // len(VERIFY_BLOCK))
+    return VERIFY_BLOCK * blocks
+
+
+def key_lines(num):
+    '''Returns the colon listing lines of the num'th synthetic key,
+    a primary key with a user id and a subkey
+
+    @param num: int
+    @rtype list: of colon listing lines
+    '''
+    keyid = '%016X' % (0xABB2F2DC00000000 + num)
+    subid = '%016X' % (0xA9661AC800000000 + num)
+    return [
+        'pub:u:4096:1:%s:%d:1578417368::u:::cSC:::::::' % (keyid, 1485105368 + num),
+        'fpr:::::::::476935D6D659B4C27B700FED%s:' % keyid,
+        'uid:u::::%d::64D29249C3C521D9557A5AE461B02179%08X::'
+            'pyGPG Test %d <pygpg%d@nowhere.foo>:' % (1485105368 + num, num, num, num),
+        'sub:u:4096:1:%s:%d:1578417368:::::s::::::' % (subid, 1485105368 + num),
+        'fpr:::::::::884D0847E08005BC1E6DA041%s:' % subid,
+    ]
+
+
+def colon_listing(keys):
+    '''Returns a synthetic --with-colons listing of the number of keys
+
+    @param keys: int
+    @rtype string
+    '''
+    lines = ['tru::1:1485105495:1578417368:3:1:5']
+    for num in range(keys):
+        lines.extend(key_lines(num))
+    return '\n'.join(lines)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG benchmarks
+####################
+# File:       bench/run_bench.py
+#
+#             The benchmark suite of the parsing and
+#             process launch hot paths
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''pyGPG benchmark suite
+
+usage: python bench/run_bench.py [-k KEYS] [-l LINES] [-r REPEAT]
+                                 [-o results.json] [-c baseline.json]
+                                 [benchmark names ...]
+
+Each benchmark reports its best time of REPEAT runs.  Save the results
+of a commit with -o, then compare another commit against them with -c.
+'''
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from pyGPG.config import GPGConfig
+from pyGPG.gpg import GPG
+from pyGPG.output import GPGResult
+from pyGPG.replay import Corpus, RecordingBackend, ReplayBackend
+from pyGPG.status import Status
+
+from generators import colon_listing, status_stream
+
+# the config benchmarks are too quick to time a single pass
+CONFIG_LOOPS = 1000
+
+
+class Context(object):
+    '''The synthetic data shared by the benchmarks'''
+
+    def __init__(self, keys, lines, runs):
+        self.keys = keys
+        self.lines = lines
+        self.runs = runs
+        self.stream = status_stream(lines)
+        self.listing = colon_listing(keys)
+        self.listing_bytes = self.listing.encode('UTF-8')
+        self.stream_bytes = '\n'.join(self.stream).encode('UTF-8')
+        # the data files the fake gpg scripts print
+        self.data_dir = tempfile.mkdtemp(prefix='pygpg-bench-')
+        with open(os.path.join(self.data_dir, 'listing.txt'), 'w') as out:
+            out.write(self.listing + '\n')
+        with open(os.path.join(self.data_dir, 'status.txt'), 'w') as out:
+            out.write('\n'.join(self.stream) + '\n')
+
+    def cleanup(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def gpg(self, command):
+        '''Returns a GPG instance running the named fake gpg script'''
+        config = GPGConfig()
+        config.options['gpg_command'] = os.path.join(BENCH_DIR, command)
+        config.options['tasks']['list-keys'] = ['--with-colons']
+        gpg = GPG(config)
+        gpg.env['PYGPG_BENCH_DIR'] = self.data_dir
+        return gpg
+
+
+def bench_extract_data(ctx):
+    '''Status.extract_data() of the status-fd stream'''
+    return (lambda: Status().extract_data(ctx.stream)), len(ctx.stream), 'lines'
+
+
+def bench_extract_output(ctx):
+    '''Status.extract_output() of the colon listing'''
+    return (lambda: Status().extract_output(ctx.listing)), ctx.keys, 'keys'
+
+
+def bench_result_verify(ctx):
+    '''GPGResult creation and its verify properties'''
+    def run():
+        result = GPGResult(None, (b'', ctx.stream_bytes))
+        return (result.verified, result.keyid, result.username,
+                result.fingerprint, result.no_pubkey)
+    return run, len(ctx.stream), 'lines'
+
+
+def bench_result_listing(ctx):
+    '''GPGResult creation of the colon listing and its keyring'''
+    def run():
+        result = GPGResult(None, (ctx.listing_bytes, b''), extract_stdout=True)
+        return (result.fingerprint, result.keyring)
+    return run, ctx.keys, 'keys'
+
+
+def bench_config_cached(ctx):
+    '''GPGConfig.compile_task() of every task, unchanged config'''
+    config = GPGConfig()
+    tasks = list(config.defaults['tasks'])
+
+    def run():
+        for loop in range(CONFIG_LOOPS):
+            for task in tasks:
+                config.compile_task(task)
+    return run, len(tasks) * CONFIG_LOOPS, 'tasks'
+
+
+def bench_config_resolve(ctx):
+    '''GPGConfig.compile_task() of every task, after a config change'''
+    config = GPGConfig()
+    tasks = list(config.defaults['tasks'])
+
+    # alternated, every pass changes the task options it was built from
+    task_opts = ([], ['--no-tty'])
+
+    def run():
+        for loop in range(CONFIG_LOOPS):
+            for task in tasks:
+                # a change to a compile input recompiles the task
+                config.options['tasks'][task] = task_opts[loop % 2]
+                config.compile_task(task)
+    return run, len(tasks) * CONFIG_LOOPS, 'tasks'
+
+
+def bench_rungpg_listing(ctx):
+    '''GPG.listkeys() end to end, fake gpg printing the colon listing'''
+    gpg = ctx.gpg('gpg-listing')
+    return (lambda: gpg.listkeys('0xABB2F2DC74991EE9')), ctx.keys, 'keys'
+
+
+def bench_rungpg_verify(ctx):
+    '''GPG.verify() end to end, fake gpg printing the status-fd stream'''
+    gpg = ctx.gpg('gpg-status')
+    return (lambda: gpg.verify(b'signed data')), len(ctx.stream), 'lines'
+
+
+def bench_rungpg_launch(ctx):
+    '''GPG.runGPG() process launch, the runs per second'''
+    gpg = ctx.gpg('gpg-cat')
+    gpg.config.options['gpg_command'] = os.path.join(ROOT, 'test', 'gpg-cat')
+
+    def run():
+        for num in range(ctx.runs):
+            gpg.decrypt(b'x')
+    return run, ctx.runs, 'runs'
+
+
+def bench_replay_verify(ctx):
+    '''GPG.verify() replayed from a recorded run, no gpg process'''
+    gpg = ctx.gpg('gpg-status')
+    corpus = Corpus()
+    gpg.backend = RecordingBackend(corpus)
+    gpg.verify(b'signed data')
+    gpg.backend = ReplayBackend(corpus)
+    return (lambda: gpg.verify(b'signed data')), len(ctx.stream), 'lines'
+
+
+BENCHMARKS = [
+    ('extract_data', bench_extract_data),
+    ('extract_output', bench_extract_output),
+    ('result_verify', bench_result_verify),
+    ('result_listing', bench_result_listing),
+    ('config_cached', bench_config_cached),
+    ('config_resolve', bench_config_resolve),
+    ('rungpg_listing', bench_rungpg_listing),
+    ('rungpg_verify', bench_rungpg_verify),
+    ('rungpg_launch', bench_rungpg_launch),
+    ('replay_verify', bench_replay_verify),
+]
+
+
+def git_commit():
+    '''Returns the checked out commit of the source tree, if known'''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.STDOUT).decode('UTF-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, keys, lines, repeat, runs):
+    '''Runs the benchmarks
+
+    @rtype dict: of the json results
+    '''
+    ctx = Context(keys, lines, runs)
+    results = {}
+    try:
+        for name, bench in BENCHMARKS:
+            if names and name not in names:
+                continue
+            func, items, unit = bench(ctx)
+            func()  # warm up
+            best = min(timeit.Timer(func).repeat(repeat=repeat, number=1))
+            results[name] = {
+                'description': bench.__doc__,
+                'seconds': best,
+                'items': items,
+                'unit': unit,
+                'per_second': items / best if best else None,
+            }
+    finally:
+        ctx.cleanup()
+    return {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'keys': keys, 'lines': lines, 'repeat': repeat,
+                   'runs': runs},
+        'results': results,
+    }
+
+
+def report(data, baseline=None):
+    '''Prints the results, compared to the baseline results if any'''
+    base = (baseline or {}).get('results', {})
+    for name, _bench in BENCHMARKS:
+        result = data['results'].get(name)
+        if result is None:
+            continue
+        line = '%-16s %10.2f ms %14.0f %s/s' % (name, result['seconds'] * 1000,
+            result['per_second'] or 0, result['unit'])
+        if name in base and result['seconds']:
+            line += '   %6.2fx' % (base[name]['seconds'] / result['seconds'])
+        print(line)
+    if baseline:
+        print('(speedup against commit %s)' % baseline.get('commit'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='pyGPG benchmark suite')
+    parser.add_argument('names', nargs='*',
+        help='the benchmarks to run, defaults to all of them: %s'
+             % ', '.join(name for name, bench in BENCHMARKS))
+    parser.add_argument('-k', '--keys', type=int, default=100000,
+        help='the number of keys of the colon listings')
+    parser.add_argument('-l', '--lines', type=int, default=200000,
+        help='the number of lines of the status-fd streams')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+        help='the number of runs of each benchmark, the best one counts')
+    parser.add_argument('-n', '--runs', type=int, default=50,
+        help='the number of gpg processes of rungpg_launch')
+    parser.add_argument('-o', '--output', help='save the results to a json file')
+    parser.add_argument('-c', '--compare', help='json results to compare to')
+    args = parser.parse_args(argv)
+    data = run(args.names, args.keys, args.lines, args.repeat, args.runs)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as results:
+            baseline = json.load(results)
+    report(data, baseline)
+    if args.output:
+        with open(args.output, 'w') as results:
+            json.dump(data, results, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,482 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG AsyncGPG handler
+####################
+# File:       aio.py
+#
+#             asyncio Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles running gnupg from an asyncio event loop.'''
+
+import asyncio
+import os
+from asyncio.subprocess import DEVNULL, PIPE
+from collections import OrderedDict
+
+from pyGPG.gpg import GPG, chunk_args
+from pyGPG.metrics import Timing, clock
+from pyGPG.output import GPGResult
+from pyGPG.status import parse_colon_line
+from pyGPG.streams import (buffer_size, fileno_of, is_buffer, iter_chunks,
+    to_bytes)
+
+
+class AsyncGPG(GPG):
+    '''asyncio subprocess gnupg handler class
+
+    The coroutine versions of the GPG methods build the same command
+    lines from the GPGConfig and return the same GPGResult objects,
+    without blocking the event loop while gpg runs.  gpg's pipes are
+    read and written by the event loop.  The blocking parts, the
+    execution backends and launchers, and reading the chunks of a
+    streamed input, are run in the loop's default executor.
+    '''
+
+    async def runGPG(self, task=None, inputtxt=None, inputfile=None,
+                     outputfile=None, binary=False):
+        '''Creates, opens and runs the gpg subprocess,
+        you must pass in at least one of either inputtxt or inputfile
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param inputtxt: string or bytes (optional) to send to gpg's stdin,
+                         an open file or raw fd handed to gpg as its
+                         stdin, or a file like object or an iterable of
+                         chunks to stream to gpg's stdin
+        @param inputfile: string (optional) a filepath to pass to gpg,
+                          or a raw fd or an open file, passed to gpg as
+                          the '-&N' special filename, or a list of them
+        @param outputfile: string (optional) filepath to pass to
+                           gpg for it's output
+        @param binary: boolean, leave gpg's stdout undecoded, as bytes
+        @rtype GnuPGResult object
+        '''
+        if not task:
+            return None
+        args, inputtxt = self._build_args(task, inputtxt, inputfile, outputfile)
+        if args is None:
+            return self._no_input_error()
+        return await self._execute_async(task, args, inputtxt, binary)
+
+    async def _execute_async(self, task, args, inputtxt, binary=False):
+        '''Runs the gpg subprocess with the fully built args,
+        the coroutine version of GPG._execute()
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param args: list of command line arguments
+        @param inputtxt: see runGPG()
+        @param binary: see runGPG()
+        @rtype GnuPGResult object
+        '''
+        loop = asyncio.get_running_loop()
+        backend = self.backend
+        launcher = self.config.get_key('launcher')
+        if (backend is None and launcher not in (None, '', 'popen')
+                and self._launchable(args, inputtxt)):
+            from pyGPG.launch import launcher_backend
+            backend = launcher_backend(launcher)
+        if backend is not None:
+            # the backends and launchers block until gpg is done
+            return await loop.run_in_executor(None, self._execute_backend,
+                task, args, inputtxt, None, backend, binary)
+        status = None
+        status_w = None
+        pass_fds = list(self._special_fds(args))
+        if self.config.get_key('status_pipe'):
+            status_fd, status_w = os.pipe()
+            args = self._status_fd_args(args, status_w)
+            pass_fds.append(status_w)
+        stdin = PIPE
+        if not is_buffer(inputtxt) and not isinstance(inputtxt, str):
+            # a real file or fd, gpg reads it directly
+            stdin = fileno_of(inputtxt)
+            if stdin is None:
+                stdin = PIPE
+            else:
+                inputtxt = None
+        if isinstance(inputtxt, str):
+            inputtxt = to_bytes(inputtxt)
+        if self.logger:
+            self.logger.debug("Running gpg with: '%s'" % str(args))
+        timing = Timing(task, args)
+        start = clock()
+        try:
+            gpg = await asyncio.create_subprocess_exec(*args, stdin=stdin,
+                stdout=PIPE, stderr=PIPE, env=self._env, pass_fds=pass_fds)
+        except Exception:
+            if status_w is not None:
+                os.close(status_fd)
+            raise
+        finally:
+            if status_w is not None:
+                os.close(status_w)
+        if status_w is not None:
+            status = self._new_status()
+            reader = asyncio.ensure_future(
+                self._read_status_async(status_fd, status))
+        spawned = clock()
+        timing.spawn = spawned - start
+        if inputtxt is None or is_buffer(inputtxt):
+            results = await gpg.communicate(inputtxt)
+            timing.bytes_in = buffer_size(inputtxt)
+        else:
+            written, out, err = await asyncio.gather(
+                self._feed_async(gpg, inputtxt), gpg.stdout.read(),
+                gpg.stderr.read())
+            await gpg.wait()
+            results = (out, err)
+            timing.bytes_in = written
+        if status is not None:
+            await reader
+        timing.wait = clock() - spawned
+        timing.bytes_out = len(results[0] or b'')
+        timing.bytes_err = len(results[1] or b'')
+        return self._result(task, args, gpg, results, status, timing, binary)
+
+    @staticmethod
+    async def _read_status_async(fd, status):
+        '''Feeds each status-fd line to the Status parser as it arrives,
+        read by the event loop, see GPG._read_status()
+
+        @param fd: int, the readable end of the status pipe
+        @param status: Status instance to fill
+        '''
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        transport, protocol = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader),
+            os.fdopen(fd, 'rb'))
+        try:
+            async for line in reader:
+                status.extract_line(line.decode('UTF-8', 'replace').rstrip('\n'))
+        finally:
+            transport.close()
+
+    @staticmethod
+    async def _feed_async(gpg, inputtxt):
+        '''Streams a file like object or iterable input to gpg's stdin,
+        each chunk is read in the executor, then written from the loop
+
+        @param gpg: the asyncio Process instance
+        @param inputtxt: a file like object or an iterable of chunks
+        @rtype int: the number of bytes written
+        '''
+        loop = asyncio.get_running_loop()
+        chunks = iter_chunks(inputtxt)
+        written = 0
+        try:
+            while True:
+                chunk = await loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    break
+                gpg.stdin.write(chunk)
+                await gpg.stdin.drain()
+                written += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # gpg quit reading, its status output will tell why
+            pass
+        finally:
+            gpg.stdin.close()
+        return written
+
+    async def listkey(self, id_string=None):
+        '''Lists the keys with --list-key <argument>
+
+        @param id_string: string (optional) argument to --list-key
+        @rtype GnuPGResult object
+        '''
+        return await self._cached_run('list-key', id_string)
+
+    async def listkeys(self, id_string=None):
+        '''Lists the keys with --list-keys <argument>
+
+        @param id_string: string (optional) argument to --list-keys
+        @rtype GnuPGResult object
+        '''
+        return await self._cached_run('list-keys', id_string)
+
+    async def fingerprint(self, id_string=None):
+        '''Lists the key, with the fingerprint
+
+        @param id_string: string (optional) argument to --fingerprint
+        @rtype GnuPGResult object
+        '''
+        return await self._cached_run('fingerprint', id_string)
+
+    async def _cached_run(self, task, id_string):
+        '''Runs a key listing task through the key cache,
+        see GPG._cached_run()
+
+        @rtype GnuPGResult object
+        '''
+        key = self._listing_key(task, id_string)
+        if key is None:
+            return await self.runGPG(task, inputfile=id_string)
+        result = self._key_cache.get(key)
+        if result is None:
+            result = await self.runGPG(task, inputfile=key[1])
+            self._key_cache.put(key, result)
+        return result
+
+    async def _cached_verify(self, key, run, *args):
+        '''Runs a verification through the verify cache,
+        see GPG._cached_verify()
+
+        @param key: the _verify_key() of the verification or None
+        @param run: the coroutine method running gpg
+        @param args: the parameters to pass to run
+        @rtype GnuPGResult object
+        '''
+        if key is None:
+            return await run(*args)
+        cache = self._sized_verify_cache()
+        result = cache.get(key)
+        if result is None:
+            result = await run(*args)
+            # pyGPG errors, gpg did not run, are not cached
+            if result.gpg is not None:
+                cache.put(key, result)
+        return result
+
+    async def fingerprints(self, ids, max_ids=None):
+        '''Looks up many keys with as few 'gpg --fingerprint'
+        runs as possible, see GPG.fingerprints()
+
+        @param ids: list of key id strings
+        @param max_ids: int (optional) maximum ids per gpg process
+        @rtype KeyLookup: of {id: Key or None}
+        '''
+        return await self._bulk_listing('fingerprint', ids, max_ids)
+
+    async def listkeys_bulk(self, ids, max_ids=None):
+        '''Looks up many keys with as few 'gpg --list-keys' runs as
+        possible, see GPG.listkeys_bulk()
+
+        @param ids: list of key id strings
+        @param max_ids: int (optional) maximum ids per gpg process
+        @rtype KeyLookup: of {id: Key or None}
+        '''
+        return await self._bulk_listing('list-keys', ids, max_ids)
+
+    async def _bulk_listing(self, task, ids, max_ids=None):
+        '''Runs the bulk key listings for fingerprints(), listkeys_bulk()
+
+        @rtype KeyLookup
+        '''
+        from pyGPG.keyring import KeyLookup
+        lookup = KeyLookup()
+        ids = list(OrderedDict.fromkeys(ids))
+        for group in chunk_args(ids, max_items=max_ids):
+            result = await self._execute_async(task,
+                self._listing_args(task, group), '')
+            self._add_keys(lookup, group, result)
+        return lookup
+
+    async def iter_listing(self, task='list-keys', id_string=None,
+                           keys=False, status=None):
+        '''Asynchronous generator version of GPG.iter_listing(), use
+        with 'async for'.  gpg's stdout is read and parsed by the event
+        loop, one line at a time.  A replay or recording backend runs
+        the whole listing in the loop's executor.
+
+        @param task: string, see GPG.iter_listing()
+        @param id_string: string or list (optional) of key ids to list
+        @param keys: boolean, yield whole Key's instead of the records
+        @param status: Status instance (optional) to fill with gpg's stderr
+                       status data once the listing is done
+        @rtype async generator: of legend colon record class or Key
+                                instances
+        '''
+        if self.backend is not None:
+            items = await asyncio.get_running_loop().run_in_executor(None,
+                list, GPG.iter_listing(self, task, id_string, keys, status))
+            for item in items:
+                yield item
+            return
+        if isinstance(id_string, str):
+            id_string = [id_string]
+        args = self._listing_args(task, id_string)
+        if self.logger:
+            self.logger.debug("Running gpg with: '%s'" % str(args))
+        timing = Timing(task, args)
+        start = clock()
+        gpg = await asyncio.create_subprocess_exec(*args, stdin=DEVNULL,
+            stdout=PIPE, stderr=PIPE, env=self._env)
+        spawned = clock()
+        timing.spawn = spawned - start
+        stderr = asyncio.ensure_future(gpg.stderr.read())
+        read = 0
+        done = False
+        if keys:
+            from pyGPG.keyring import KEY_RECORDS, iter_keys
+        try:
+            # the records of the key being read
+            records = []
+            async for line in gpg.stdout:
+                read += len(line)
+                record = parse_colon_line(
+                    line.decode('UTF-8', 'replace').rstrip('\r\n'))
+                if record is None:
+                    continue
+                if not keys:
+                    yield record
+                    continue
+                if record.name in KEY_RECORDS and records:
+                    for key in iter_keys(records):
+                        yield key
+                    records = []
+                records.append(record)
+            if keys:
+                for key in iter_keys(records):
+                    yield key
+            done = True
+        finally:
+            if not done and gpg.returncode is None:
+                # the consumer stopped early
+                gpg.kill()
+            err = await stderr
+            await gpg.wait()
+            timing.wait = clock() - spawned
+            timing.bytes_out = read
+            timing.bytes_err = len(err)
+            if status is not None:
+                status.extract_data(err.decode('UTF-8', 'replace').split('\n'))
+            self._record(GPGResult(gpg, (b'', err), lazy=True, timing=timing))
+
+    async def decrypt(self, inputtxt=None, inputfile=None, outputfile=None,
+                      binary=False):
+        '''Decrypts the inputtxt block passed in
+        or the file found at inputfile and saves it to outputfile,
+        and/or returns the decrypted as GPGResult.output
+
+        @param inputtxt: string (optional)  of text to send to gpg's stdin
+        @param inputfile: string (optional) a filepath to pass to gpg
+        @param outputfile: string (optional) filepath to pass to
+                           gpg for it's output
+        @param binary: boolean, keep the decrypted output as bytes
+        @rtype GnuPGResult object
+        '''
+        return await self.runGPG('decrypt', inputtxt, inputfile, outputfile,
+                                 binary)
+
+    async def verify(self, inputtxt=None, inputfile=None, outputfile=None,
+                     binary=False):
+        '''
+        @param inputtxt: string (optional)  of text to send to gpg's stdin
+        @param inputfile: string (optional) a filepath to pass to gpg
+        @param outputfile: string (optional) filepath to pass to
+                           gpg for it's output
+        @param binary: boolean, keep the signed data output as bytes
+        @rtype GnuPGResult object
+        '''
+        if inputfile is not None and self.config.get_key('verify_cache_size'):
+            # the input files are digested, off the event loop
+            key = await asyncio.get_running_loop().run_in_executor(None,
+                self._verify_run_key, inputtxt, inputfile, outputfile,
+                None, binary)
+        else:
+            key = self._verify_run_key(inputtxt, inputfile, outputfile,
+                                       binary=binary)
+        return await self._cached_verify(key, self.runGPG, 'verify',
+            inputtxt, inputfile, outputfile, binary)
+
+    async def verify_detached(self, data, signature, binary=False):
+        '''Verifies a detached signature of the data, both held in
+        memory, see GPG.verify_detached()
+
+        @param data: the signed data, anything runGPG() accepts
+                     as inputtxt
+        @param signature: the detached signature, text or a bytes like
+                          buffer, or an open file or fd to pass to gpg
+        @param binary: boolean, see verify()
+        @rtype GnuPGResult object
+        '''
+        return await self._cached_verify(
+            self._detached_key(data, signature, binary=binary),
+            self._verify_detached, data, signature, binary)
+
+    async def _verify_detached(self, data, signature, binary=False):
+        '''Runs the verify_detached() gpg process, see it for the
+        parameters
+
+        @rtype GnuPGResult object
+        '''
+        sig_fd = fileno_of(signature)
+        if sig_fd is not None:
+            return await self.runGPG('verify', data, [sig_fd], binary=binary)
+        sig_r, sig_w = os.pipe()
+        # the transport writes the signature as gpg reads it
+        writer, protocol = await asyncio.get_running_loop().connect_write_pipe(
+            asyncio.Protocol, os.fdopen(sig_w, 'wb'))
+        writer.write(to_bytes(signature))
+        writer.close()
+        try:
+            return await self.runGPG('verify', data, [sig_r], binary=binary)
+        finally:
+            os.close(sig_r)
+            if writer.get_write_buffer_size():
+                # drops what gpg did not read
+                writer.abort()
+
+    async def verify_files(self, files, max_files=None):
+        '''Verifies many signed files using as few gpg processes as
+        possible, see GPG.verify_files()
+
+        @param files: list of filepaths to verify
+        @param max_files: int (optional) maximum files per gpg process
+        @rtype OrderedDict: of {filepath: GPGResult}
+        '''
+        results = OrderedDict()
+        for group in chunk_args(files, max_items=max_files):
+            self._file_results(results, group,
+                await self.runGPG('verify-files', inputfile=group))
+        return results
+
+    async def sign(self, mode, inputtxt=None, inputfile=None, outputfile=None):
+        '''
+        @param inputtxt: string (optional)  of text to send to gpg's stdin
+        @param inputfile: string (optional) a filepath to pass to gpg
+        @param outputfile: string (optional) filepath to pass to
+                           gpg for it's output
+        @rtype GnuPGResult object
+        '''
+        if mode not in self.config.sign_modes():
+            return self._sign_mode_error(mode)
+        return await self.runGPG(mode, inputtxt, inputfile, outputfile)
+
+    @property
+    def options(self):
+        '''Awaitable list of all available gpg options,
+        see GPG.options
+
+        @rtype coroutine: of the list of options from gpg'''
+        return self._options()
+
+    async def _options(self):
+        if not self._gpg_options or self.config['refetch']:
+            self._gpg_options = self._load_probe('dump-options')
+            if self._gpg_options is None:
+                self._gpg_options = await self.runGPG('dump-options', '')
+                self._save_probe('dump-options', self._gpg_options)
+        return self._options_list()
+
+    async def version(self, verbose=False):
+        '''Runs 'gpg --version' and also returns the pyGPG version
+
+        checks config parameter refetch: Boolean
+        @param verbose: boolean, defaults to False
+        @rtype dict: of versions'''
+        if (self._gpg_version is None) or self.config['refetch']:
+            self._gpg_version = self._load_probe('version')
+            if self._gpg_version is None:
+                self._gpg_version = self._process_version(
+                    await self.runGPG('version', ''))
+                self._save_probe('version', self._gpg_version)
+        return self._version_info(verbose)
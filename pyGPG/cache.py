@@ -0,0 +1,299 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG cache
+####################
+# File:       cache.py
+#
+#             Python classes for caching gpg results
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles pyGPG's gpg result caching.'''
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+from pyGPG import __version__
+from pyGPG.streams import CHUNK_SIZE, is_buffer, to_bytes
+
+# os.replace() is atomic on all platforms, os.rename() only on posix
+_replace = getattr(os, 'replace', os.rename)
+
+# monotonic clock of the cache entry expiry times
+_clock = getattr(time, 'monotonic', time.time)
+
+# the probe cache file format version
+PROBE_VERSION = 1
+
+
+# the gnupg homedir files whose changes invalidate cached results,
+# gpg 2.4's keyboxd keeps the keys in an sqlite database and its
+# write ahead log
+KEYRING_FILES = ['pubring.kbx', 'pubring.gpg', 'trustdb.gpg',
+                 os.path.join('public-keys.d', 'pubring.db'),
+                 os.path.join('public-keys.d', 'pubring.db-wal')]
+
+
+def keyring_token(homedir, files=None):
+    '''Returns a generation token for the keyring files in homedir.
+    The token changes whenever one of the files is replaced,
+    modified or resized.
+
+    @param homedir: string, the gnupg homedir path
+    @param files: list (optional) of file names, defaults to KEYRING_FILES
+    @rtype tuple: of (name, inode, mtime, size) tuples
+    '''
+    token = []
+    for name in files or KEYRING_FILES:
+        try:
+            stat = os.stat(os.path.join(homedir, name))
+        except OSError:
+            token.append((name, None, None, None))
+            continue
+        mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+        token.append((name, stat.st_ino, mtime, stat.st_size))
+    return tuple(token)
+
+
+def content_digest(source):
+    '''Returns the digest of a text or bytes like buffer input
+
+    @param source: text string or bytes like buffer
+    @rtype string: the sha256 hex digest, None for other inputs
+                   (streams, open files, fds) which can not be read
+                   without consuming them
+    '''
+    if is_buffer(source):
+        return hashlib.sha256(source).hexdigest()
+    if hasattr(source, 'encode'):
+        return hashlib.sha256(to_bytes(source)).hexdigest()
+    return None
+
+
+def file_digest(path):
+    '''Returns the digest of a file's content
+
+    @param path: string, the file path
+    @rtype string: the sha256 hex digest, None if it can not be read
+    '''
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+class LRUCache(object):
+    '''Thread safe, size bounded, least recently used cache'''
+
+
+    def __init__(self, maxsize=128, ttl=None):
+        '''Class init function
+
+        @param maxsize: int, the maximum number of entries to keep
+        @param ttl: number (optional) of seconds the entries are kept,
+                    they never expire by default
+        '''
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # the misses due to expired entries
+        self.expired = 0
+        # {key: (value, expiry time or None)}
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+    def get(self, key, default=None):
+        '''Returns the cached value for key, marking it as recently used
+
+        @param key: hashable cache key
+        @param default: returned on a cache miss
+        '''
+        with self._lock:
+            try:
+                entry = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if entry[1] is not None and entry[1] <= _clock():
+                self.misses += 1
+                self.expired += 1
+                return default
+            self._data[key] = entry
+            self.hits += 1
+            return entry[0]
+
+
+    def put(self, key, value):
+        '''Adds or replaces a cache entry, evicting the least
+        recently used entries over maxsize
+
+        @param key: hashable cache key
+        @param value: the value to cache
+        '''
+        expires = _clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+    def discard(self, key):
+        '''Removes a cache entry, if present
+
+        @param key: hashable cache key
+        '''
+        with self._lock:
+            self._data.pop(key, None)
+
+
+    def clear(self):
+        '''Empties the cache and resets its counters'''
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.expired = 0
+
+
+def binary_token(command):
+    '''Returns the identity of an executable, it changes whenever
+    the executable is upgraded or replaced
+
+    @param command: string, the executable's path or name in $PATH
+    @rtype list: of [resolved path, inode, size, mtime] or None
+               if the executable was not found
+    '''
+    path = command if os.sep in command else which(command)
+    if not path:
+        return None
+    path = os.path.realpath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+    return [path, stat.st_ino, stat.st_size, mtime]
+
+
+class ProbeCache(object):
+    '''On disk cache of the gpg probes (--version, --dump-options)
+    shared between processes.  There is one json file per gpg
+    executable, it is only used while the executable's path, inode,
+    size and mtime, the file format and the pyGPG version are
+    unchanged.  The file is replaced atomically, so concurrent
+    readers always see a complete file.'''
+
+
+    def __init__(self, directory):
+        '''Class init function
+
+        @param directory: string, the cache directory path
+        '''
+        self.directory = directory
+
+
+    def _path(self, token):
+        '''Returns the cache file path of the executable'''
+        name = hashlib.sha1(token[0].encode('UTF-8')).hexdigest()
+        return os.path.join(self.directory, 'probe-%s.json' % name)
+
+
+    def _load(self, token):
+        '''Returns the probe entries of a cache file still valid
+        for the executable'''
+        try:
+            with open(self._path(token)) as cache_file:
+                cached = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if (not isinstance(cached, dict) or cached.get('binary') != token
+                or cached.get('version') != PROBE_VERSION
+                or cached.get('pygpg') != __version__):
+            return {}
+        return cached.get('probes') or {}
+
+
+    def get(self, command, probe, context=None):
+        '''Returns the cached probe data
+
+        @param command: string, the gpg executable
+        @param probe: string, the probe name, ie: 'version'
+        @param context: json compatible value (optional) the probe data
+                        also depends on, ie: its command line
+        @rtype the cached data or None
+        '''
+        token = binary_token(command)
+        if token is None:
+            return None
+        entry = self._load(token).get(probe)
+        if entry is None or entry.get('context') != context:
+            return None
+        return entry.get('data')
+
+
+    def put(self, command, probe, data, context=None):
+        '''Saves the probe data, a failure to write the cache
+        file is ignored
+
+        @param command: string, the gpg executable
+        @param probe: string, the probe name, ie: 'version'
+        @param data: json compatible value, the probe data
+        @param context: json compatible value (optional), see get()
+        @rtype boolean: True if saved
+        '''
+        token = binary_token(command)
+        if token is None:
+            return False
+        probes = self._load(token)
+        probes[probe] = {'context': context, 'data': data}
+        try:
+            if not os.path.isdir(self.directory):
+                try:
+                    os.makedirs(self.directory)
+                except OSError:
+                    # created by a concurrent process
+                    if not os.path.isdir(self.directory):
+                        raise
+            fd, tmp = tempfile.mkstemp(prefix='.probe-', dir=self.directory)
+            try:
+                with os.fdopen(fd, 'w') as cache_file:
+                    json.dump({'version': PROBE_VERSION, 'pygpg': __version__,
+                               'binary': token, 'probes': probes}, cache_file)
+                _replace(tmp, self._path(token))
+            except Exception:
+                os.unlink(tmp)
+                raise
+        except (IOError, OSError):
+            return False
+        return True
@@ -0,0 +1,231 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG ColumnStore
+####################
+# File:       columns.py
+#
+#             Python class for the compact, column wise
+#             storage of the status data records
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles pyGPG's columnar storage of the status data records.'''
+
+from array import array
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+
+# the number of distinct values a column is coded for,
+# past that the column holds the values themselves
+VOCAB_LIMIT = 1024
+
+# the array typecode used for a column's codes, for a vocabulary
+# of up to the size
+_CODE_TYPES = [(0x100, 'B'), (0x10000, 'H')]
+
+
+class ColumnStore(Sequence):
+    '''List like store of legend record class instances, kept as one
+    column per field position instead of one namedtuple per record.
+
+    The columns of mostly repeated values (validity, key length,
+    algorithm, capabilities, ...) only store a small integer code per
+    record, in an array, with one shared copy of each distinct value.
+    Columns that turn out to be mostly distinct values (fingerprints,
+    keyids, user ids, dates) switch to a plain list of the values.
+    The records are rebuilt, as namedtuple's, when they are accessed.
+    '''
+
+
+    def __init__(self, records=None):
+        '''Class init function
+
+        @param records: iterable (optional) of legend class instances
+        '''
+        # the record classes and their index in _classes
+        self._classes = []
+        self._class_codes = {}
+        # the record class index of each record
+        self._kinds = array('B')
+        # one array of codes, or list of values, per field position
+        self._columns = []
+        # the {value: code} and [value, ...] vocabularies of the columns,
+        # None once the column holds the values
+        self._vocab = []
+        self._values = []
+        if records is not None:
+            self.extend(records)
+
+
+    def __len__(self):
+        return len(self._kinds)
+
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._row(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('ColumnStore index out of range')
+        return self._row(idx)
+
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._row(idx)
+
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, ColumnStore)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+
+    __hash__ = None
+
+
+    def __repr__(self):
+        return 'ColumnStore(%r)' % list(self)
+
+
+    def _row(self, idx):
+        '''Rebuilds the record at idx'''
+        cls = self._classes[self._kinds[idx]]
+        values = []
+        for pos in range(len(cls._fields)):
+            code = self._columns[pos][idx]
+            vocab = self._values[pos]
+            values.append(code if vocab is None else vocab[code])
+        return cls._make(values)
+
+
+    def classes(self):
+        '''Generates the record class of each record, in order,
+        without rebuilding the records
+
+        @rtype generator: of legend classes
+        '''
+        classes = self._classes
+        for kind in self._kinds:
+            yield classes[kind]
+
+
+    def value(self, idx, pos):
+        '''Returns one field of a record, without rebuilding the record
+
+        @param idx: int, the record index, 0 or more
+        @param pos: int, the field position
+        '''
+        code = self._columns[pos][idx]
+        vocab = self._values[pos]
+        return code if vocab is None else vocab[code]
+
+
+    def _add_column(self):
+        '''Adds a field position column, empty for the existing records'''
+        self._columns.append(array('B', [0]) * len(self))
+        self._vocab.append({'': 0})
+        self._values.append([''])
+
+
+    def _encode(self, pos, value):
+        '''Returns the column value or code to store for value'''
+        vocab = self._vocab[pos]
+        if vocab is None:
+            return value
+        try:
+            return vocab[value]
+        except KeyError:
+            pass
+        values = self._values[pos]
+        code = len(values)
+        if code >= VOCAB_LIMIT:
+            # mostly distinct values, store them as they are
+            self._columns[pos] = [values[x] for x in self._columns[pos]]
+            self._vocab[pos] = self._values[pos] = None
+            return value
+        vocab[value] = code
+        values.append(value)
+        column = self._columns[pos]
+        for size, typecode in _CODE_TYPES:
+            if code < size:
+                if column.typecode != typecode:
+                    self._columns[pos] = array(typecode, column)
+                break
+        return code
+
+
+    def _kind(self, record):
+        '''Returns the record class index of the record'''
+        cls = record.__class__
+        try:
+            return self._class_codes[cls]
+        except KeyError:
+            pass
+        code = self._class_codes[cls] = len(self._classes)
+        self._classes.append(cls)
+        if code == 0x100:
+            self._kinds = array('H', self._kinds)
+        return code
+
+
+    def insert(self, idx, record):
+        '''Inserts a record before idx
+
+        @param idx: int
+        @param record: legend class instance
+        '''
+        if idx < 0:
+            idx = max(0, idx + len(self))
+        idx = min(idx, len(self))
+        kind = self._kind(record)
+        while len(self._columns) < len(record):
+            self._add_column()
+        for pos in range(len(self._columns)):
+            value = record[pos] if pos < len(record) else ''
+            # encode first, it may replace the column
+            code = self._encode(pos, value)
+            self._columns[pos].insert(idx, code)
+        self._kinds.insert(idx, kind)
+
+
+    def append(self, record):
+        '''Appends a record
+
+        @param record: legend class instance
+        '''
+        kind = self._kind(record)
+        while len(self._columns) < len(record):
+            self._add_column()
+        for pos in range(len(self._columns)):
+            value = record[pos] if pos < len(record) else ''
+            code = self._encode(pos, value)
+            self._columns[pos].append(code)
+        self._kinds.append(kind)
+
+
+    def extend(self, records):
+        '''Appends the records
+
+        @param records: iterable of legend class instances
+        '''
+        for record in records:
+            self.append(record)
@@ -17,7 +17,50 @@
 #
 '''Handles pyGPG's config's.'''
 
+import copy
 import re
+import sys
+from collections import namedtuple
+
+if sys.version_info[0] >= 3:
+    _str = str
+    _unicode = str
+else:
+    _str = basestring
+    _unicode = unicode
+
+
+# the compiled, ready to use command line data for a task
+CompiledTask = namedtuple('CompiledTask', ['args', 'command', 'colons'])
+
+
+# the %(name)s substitution names of a string
+_SUB_NAME_RE = re.compile(r'%\(([^)]*)\)')
+
+# the option and default values compile_task() always reads
+_COMPILE_KEYS = (('gpg_command', None), ('gpg_defaults', None))
+
+
+class _Missing(object):
+    '''Stands in for a missing option or default in the compile_task()
+    inputs, the class itself is used, deepcopy() keeps it as is'''
+
+
+def _sub_names(value, names):
+    '''Collects the %(name)s substitution names of an option value
+
+    @param value: unknown, the option value
+    @param names: list the names are appended to
+    '''
+    if isinstance(value, _str):
+        if '%(' in value:
+            names.extend(_SUB_NAME_RE.findall(value))
+    elif isinstance(value, dict):
+        for member in value.values():
+            _sub_names(member, names)
+    elif isinstance(value, (list, tuple)):
+        for member in value:
+            _sub_names(member, names)
 
 
 class GPGConfig(object):
@@ -43,12 +86,38 @@ class GPGConfig(object):
         'send-keys': '--send-keys',
         'sign': '--sign',
         'verify': '--verify',
+        'verify-files': '--verify-files',
         'version': '--version',
         # defaults added to each gpg process run
         'gpg_defaults': ['--display-charset', 'utf-8', '--status-fd', '2',
             '--no-tty'],
+        # how gpg is started, one of pyGPG.launch.LAUNCHERS:
+        # 'popen', 'posix_spawn' or 'forkserver', the last two are
+        # opt-in, they only pay off where Popen still does a full fork
+        'launcher': 'popen',
+        # keep the GPGResult status data in a compact ColumnStore,
+        # for the very large colon listings
+        'columnar_records': False,
+        # directory of the on disk cache of the version and
+        # dump-options probes, shared between processes, '' disables it
+        'probe_cache_dir': '',
+        # the number of list-key(s), fingerprint results to cache
+        # until the keyring changes, 0 disables the cache
+        'key_cache_size': 0,
+        # the number of verify results to cache, by the digest of the
+        # signed data and signature, until the keyring or trustdb
+        # changes, 0 disables the cache
+        'verify_cache_size': 0,
+        # seconds the cached verify results are kept, 0 for no expiry
+        'verify_cache_ttl': 0,
+        # defer the decoding and parsing of the GPGResult's
+        # until their output or data is first used
+        'lazy_results': False,
         'only_usable': False,
         'refetch': False,
+        # read gpg's status messages from a dedicated pipe
+        # instead of from the --status-fd 2 (stderr) default
+        'status_pipe': False,
         'tasks': {
             'clearsign': [],
             'decrypt': [],
@@ -66,6 +135,7 @@ class GPGConfig(object):
             'send-keys': [],
             'sign': [],
             'verify': [],
+            'verify-files': [],
             'version': [],
         },
         'trust-models': ['always', 'auto', 'classic', 'direct', 'pgp'],
@@ -74,12 +144,23 @@ class GPGConfig(object):
 
     def __init__(self):
         '''Class init function'''
+        # {task: (CompiledTask, the options and defaults it was built from)}
+        self._compiled = {}
         self.options = {
             'tasks': {}
         }
         self.unsupported = set()
         self.sub_re = r'.*\%(.*)'
         self.type_re = re.compile(r'(type)|[< >\']')
+        # the compiled sub_re, recompiled if sub_re is changed
+        self._sub_re = re.compile(self.sub_re)
+        self._sub_types = {
+            dict: self._sub_dict,
+            list: self._sub_list,
+            str: self._sub_str,
+            _unicode: self._sub_str,
+            tuple: self._sub_tuple,
+        }
 
     def __getitem__(self, key):
         return self._get_(key)
@@ -118,6 +199,65 @@ class GPGConfig(object):
         return self._get_(key, subkey)
 
 
+    def compile_task(self, task):
+        '''Returns the fully resolved gpg command line data for a task.
+        The result is cached until one of the options or defaults
+        it was built from is changed.
+
+        @param task: string, one of config['tasks'].keys()
+        @rtype CompiledTask: (args tuple: gpg command, gpg_defaults and
+            task options; command: the task's gpg command option;
+            colons: bool, the task options include --with-colons)
+        '''
+        try:
+            compiled, keys, built_from = self._compiled[task]
+        except KeyError:
+            pass
+        else:
+            # the options and their lists and dicts may have been
+            # changed in place, compare them with the copy
+            if self._compile_inputs(keys) == built_from:
+                return compiled
+        args = [self._get_('gpg_command')]
+        args.extend(self._get_('gpg_defaults'))
+        task_opts = self._get_('tasks', task) or []
+        args.extend(task_opts)
+        compiled = CompiledTask(tuple(x for x in args if x != ''),
+                                self._get_(task), '--with-colons' in task_opts)
+        keys = _COMPILE_KEYS + (('tasks', task), (task, None))
+        seen = set()
+        new_keys = keys
+        # the substituted values may hold more substitutions
+        while new_keys:
+            names = []
+            _sub_names(self._compile_inputs(new_keys), names)
+            new_keys = tuple((name, None) for name in sorted(set(names) - seen))
+            seen.update(names)
+            keys += new_keys
+        self._compiled[task] = (compiled, keys,
+                                copy.deepcopy(self._compile_inputs(keys)))
+        return compiled
+
+
+    def _compile_inputs(self, keys):
+        '''Returns the option and default values a compiled task was
+        built from, as they are now
+
+        @param keys: tuple of (key, subkey or None) tuples
+        @rtype list
+        '''
+        options = self.options
+        defaults = self.defaults
+        inputs = []
+        for key, subkey in keys:
+            for source in (options, defaults):
+                value = source.get(key, _Missing)
+                if subkey is not None and isinstance(value, dict):
+                    value = value.get(subkey, _Missing)
+                inputs.append(value)
+        return inputs
+
+
     def get_defaults(self):
         '''Returns a dictionary of the default settings
 
@@ -150,11 +290,9 @@ class GPGConfig(object):
         @param data: unknown, one of string, dict, list, tuple
         @return: data of the same type
         '''
-        data_type = type(data)
-        data_type = re.sub(self.type_re, '', str(data_type)).replace('class', '')
-        if data_type not in ['dict', 'list', 'str', 'tuple']:
+        func = self._sub_types.get(type(data))
+        if func is None:
             return data
-        func = getattr(self, '_sub_%s' % data_type)
         return func(data)
 
 
@@ -194,12 +332,14 @@ class GPGConfig(object):
         @return: string
         '''
         data2 = None
-        if re.match(self.sub_re, data):
+        sub_re = self._sub_re
+        if sub_re.pattern != self.sub_re:
+            sub_re = self._sub_re = re.compile(self.sub_re)
+        if sub_re.match(data):
             try:
                 data2 = data % self.options
             except KeyError:
                 pass
-        if re.match(self.sub_re, data):
             try:
                 data2 = data % self.defaults
             except KeyError:
@@ -19,97 +19,666 @@
 
 
 import os
-import copy
 import sys
+from collections import OrderedDict
+from io import BytesIO
 from subprocess import Popen, PIPE
+from threading import Thread
 
 from pyGPG import __version__, __license__
 from pyGPG.output import GPGResult
+from pyGPG.status import Status
+from pyGPG import legend
 from pyGPG.legend import PYGPG_IDENTIFIER
+from pyGPG.streams import (buffer_size, collect, feed, fileno_of, is_buffer,
+    is_stream, iter_chunks, pump, sink_writer, to_bytes)
 
 if sys.hexversion >= 0x30200f0:
     STR = str
 else:
     STR = basestring
 
+# keep the combined size of the arguments of a batched gpg run
+# well under the kernel's ARG_MAX command line limit
+ARG_MAX_BYTES = 64 * 1024
+
+# the suffixes gpg strips from a lone detached signature file
+# to find the data file it was made of
+DETACHED_SUFFIXES = ('.asc', '.sig', '.sign')
+
+
+def chunk_args(items, max_bytes=ARG_MAX_BYTES, max_items=None):
+    '''Splits the items into groups small enough to pass
+    on a single gpg command line
+
+    @param items: list of string arguments
+    @param max_bytes: int, the maximum combined size of a group
+    @param max_items: int (optional), the maximum number of items in a group
+    @rtype generator: of lists of strings
+    '''
+    group = []
+    size = 0
+    for item in items:
+        length = len(item) + 1
+        if group and (size + length > max_bytes or
+                      (max_items and len(group) >= max_items)):
+            yield group
+            group = []
+            size = 0
+        group.append(item)
+        size += length
+    if group:
+        yield group
+
 
 class GPG(object):
     '''Subprocess gnupg handler class'''
 
-    def __init__(self, config, logger=None):
+    def __init__(self, config, logger=None, backend=None):
         '''Class init function
 
         @param config: GPGConfig config instance to use
+        @param backend: execution backend (optional) to run gpg through,
+                        see pyGPG.replay, defaults to running gpg here
         '''
         self.config = config
         self.logger = logger
         self._gpg_version = None
         self._gpg_options = None
+        self._key_cache = None
+        self._verify_cache = None
         self.history = []
-        self.env = copy.copy(os.environ)
+        # the gpg environment, None runs gpg with os.environ
+        self._env = None
+        # the per task gpg run counts and latency histograms
+        from pyGPG.metrics import Metrics
+        self.metrics = Metrics()
+        # callables called with each GPGResult, once its gpg run is done
+        self.hooks = []
+        self.backend = backend
+
+
+    @property
+    def env(self):
+        '''The environment gpg is run with, a copy of os.environ made on
+        first access.  Until then gpg simply inherits os.environ.'''
+        if self._env is None:
+            self._env = os.environ.copy()
+        return self._env
 
 
-    def runGPG(self, task=None, inputtxt=None, inputfile=None, outputfile=None):
+    @env.setter
+    def env(self, value):
+        self._env = value
+
+
+    def runGPG(self, task=None, inputtxt=None, inputfile=None, outputfile=None,
+               sink=None, binary=False):
         '''Creates, opens and runs the gpg subprocess,
         you must pass in at least one of either inputtxt or inputfile
 
         @param task: string, one of pygpg's config['tasks'].keys()
-        @param inputtxt: string (optional)  of text to send to gpg's stdin
-        @param inputfile: string (optional) a filepath to pass to gpg
+        @param inputtxt: string (optional)  of text to send to gpg's stdin,
+                         a bytes like buffer (bytes, bytearray, memoryview,
+                         mmap) written to it without a copy, an open file
+                         or raw fd handed to gpg as its stdin, or a file
+                         like object or an iterable of chunks to stream
+                         to gpg's stdin
+        @param inputfile: string (optional) a filepath to pass to gpg,
+                          or a raw fd or an open file, passed to gpg as
+                          the '-&N' special filename, or a list of them
         @param outputfile: string (optional) filepath to pass to
                            gpg for it's output
+        @param sink: callable or file like object (optional) to stream
+                     gpg's stdout to, one chunk at a time
+        @param binary: boolean, leave gpg's stdout undecoded, the
+                       GPGResult.output is then bytes, only the status
+                       messages are decoded
         @rtype GnuPGResult object
         '''
-        results = ('', '') # null
-        gpg = None
         if not task:
             return None
-        args = [self.config.get_key('gpg_command')]
-        defaults = self.config.get_key('gpg_defaults')
-        if self.logger:
-            self.logger.debug("defaults =" + str(defaults))
-        args.extend(defaults)
-        task_opts = self.config.get_key('tasks', task)
-        if task_opts:
-            args.extend(task_opts)
-        if outputfile:
-            args.extend(['-o', outputfile])
-        args = [x for x in args if x != '']
-        if inputfile and isinstance(inputfile, STR):
+        args, inputtxt = self._build_args(task, inputtxt, inputfile, outputfile)
+        if args is None:
+            return self._no_input_error()
+        return self._execute(task, args, inputtxt, sink, binary)
+
+
+    def _build_args(self, task, inputtxt=None, inputfile=None, outputfile=None):
+        '''Builds the complete gpg command line for the task and inputs
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param inputtxt: see runGPG()
+        @param inputfile: see runGPG()
+        @param outputfile: see runGPG()
+        @rtype tuple: (list of args or None if there is no input, inputtxt)
+        '''
+        args = self._task_args(task, outputfile)
+        command = self.config.compile_task(task).command
+        if inputfile is not None and not isinstance(inputfile, (list, tuple)):
             inputfile = [inputfile]
+        if inputfile is not None:
+            inputfile = self._special_filenames(args, inputfile)
         if inputtxt is None and inputfile is not None:
                 inputtxt = ''  # open('/dev/null', 'wb')
-                args.append(self.config[task])
+                args.append(command)
                 args += inputfile
-        elif inputtxt and inputfile is not None:
-                args += [self.config[task]] + inputfile + ['-']
+        elif inputtxt is not None and inputfile is not None:
+                args += [command] + inputfile + ['-']
         elif inputtxt is None:
-            err = GPGResult(None, ['', ''])
-            parts = [
-                PYGPG_IDENTIFIER,
-                'PYGPG_ERROR',
-                'no-input-specified',
-                'GPG.runGPG()',
-                'You must pass in a non-None inputtxt or inputfile to process',
-                ]
-            err.status.process_pygpg_msg(parts=parts)
-            return err
+            return (None, None)
         else:
-            args.append(self.config[task])
+            args.append(command)
+        return (args, inputtxt)
+
+
+    @staticmethod
+    def _error_result(error, function, message):
+        '''Creates a GPGResult holding a pyGPG error for a gpg
+        process that could not be run
+
+        @param error: string, the error identifier
+        @param function: string, the function reporting the error
+        @param message: string, the error message
+        @rtype GnuPGResult object
+        '''
+        err = GPGResult(None, ['', ''])
+        parts = [PYGPG_IDENTIFIER, 'PYGPG_ERROR', error, function, message]
+        err.status.process_pygpg_msg(parts=parts)
+        return err
+
+
+    def _no_input_error(self):
+        '''Returns the error result for a missing inputtxt and inputfile'''
+        return self._error_result('no-input-specified', 'GPG.runGPG()',
+            'You must pass in a non-None inputtxt or inputfile to process')
+
+
+    def _task_args(self, task, outputfile=None):
+        '''Builds the gpg command line up to, but not including
+        the task's command and its inputs
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param outputfile: string (optional) filepath to pass to
+                           gpg for it's output
+        @rtype list: of command line arguments
+        '''
+        args = list(self.config.compile_task(task).args)
+        if outputfile:
+            args.extend(['-o', outputfile])
+        return args
+
+
+    @staticmethod
+    def _special_filenames(args, inputfiles):
+        '''Replaces the raw fds and open files of the inputfiles by gpg's
+        '-&N' special filenames, enabling them in args if needed
+
+        @param args: list of command line arguments, modified in place
+        @param inputfiles: list of file paths, raw fds or open files
+        @rtype list: of file paths and special filenames, after a '--'
+                     end of options marker if there are special filenames
+        '''
+        files = []
+        special = False
+        for inputfile in inputfiles:
+            fd = None if isinstance(inputfile, STR) else fileno_of(inputfile)
+            if fd is None:
+                files.append(inputfile)
+                continue
+            special = True
+            files.append('-&%d' % fd)
+        if special:
+            if '--enable-special-filenames' not in args:
+                args.insert(1, '--enable-special-filenames')
+            # gpg would otherwise parse '-&N' as an option
+            files.insert(0, '--')
+        return files
+
+
+    @staticmethod
+    def _special_fds(args):
+        '''Returns the fds of the '-&N' special filenames in args,
+        they must be passed on to gpg
+
+        @param args: list of command line arguments
+        @rtype tuple: of ints
+        '''
+        if '--enable-special-filenames' not in args:
+            return ()
+        return tuple(int(arg[2:]) for arg in args
+                     if arg.startswith('-&') and arg[2:].isdigit())
+
+
+    def _execute(self, task, args, inputtxt, sink=None, binary=False):
+        '''Runs the gpg subprocess with the fully built args
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param args: list of command line arguments
+        @param inputtxt: text for gpg's stdin or a stream, see runGPG()
+        @param sink: see runGPG()
+        @param binary: see runGPG()
+        @rtype GnuPGResult object
+        '''
+        backend = self.backend
+        launcher = self.config.get_key('launcher')
+        if (backend is None and launcher not in (None, '', 'popen')
+                and self._launchable(args, inputtxt, sink)):
+            from pyGPG.launch import launcher_backend
+            backend = launcher_backend(launcher)
+        if backend is not None:
+            return self._execute_backend(task, args, inputtxt, sink, backend,
+                                         binary)
+        from pyGPG.metrics import Timing, clock
+        status = None
+        status_w = None
+        pass_fds = list(self._special_fds(args))
+        if self.config.get_key('status_pipe'):
+            status_fd, status_w = os.pipe()
+            args = self._status_fd_args(args, status_w)
+            pass_fds.append(status_w)
+        stdin = PIPE
+        if not is_buffer(inputtxt) and not isinstance(inputtxt, STR):
+            # a real file or fd, gpg reads it directly
+            stdin = fileno_of(inputtxt)
+            if stdin is None:
+                stdin = PIPE
+            else:
+                inputtxt = None
+        if isinstance(inputtxt, STR):
+            inputtxt = to_bytes(inputtxt)
         # history is only for initial debugging
         #self.history.append(
         if self.logger:
             self.logger.debug("Running gpg with: '%s'" % str(args))
-        gpg = Popen(args, stdin=PIPE, stdout=PIPE, stderr=PIPE, env=self.env)
-        results = gpg.communicate(inputtxt)
-        for pipe in (gpg.stdin, gpg.stdout, gpg.stderr):
-            if pipe:
-                pipe.close()
+        timing = Timing(task, args)
+        start = clock()
+        try:
+            gpg = Popen(args, stdin=stdin, stdout=PIPE, stderr=PIPE,
+                        env=self._env, pass_fds=pass_fds)
+        except Exception:
+            if status_w is not None:
+                os.close(status_fd)
+            raise
+        finally:
+            if status_w is not None:
+                os.close(status_w)
+        if status_w is not None:
+            status = self._new_status()
+            reader = Thread(target=self._read_status,
+                            args=(os.fdopen(status_fd, 'rb'), status))
+            reader.daemon = True
+            reader.start()
+        spawned = clock()
+        timing.spawn = spawned - start
+        if sink is None and not binary and not is_stream(inputtxt):
+            results = gpg.communicate(inputtxt)
+            for pipe in (gpg.stdin, gpg.stdout, gpg.stderr):
+                if pipe:
+                    pipe.close()
+            timing.bytes_in = buffer_size(inputtxt)
+            timing.bytes_out = len(results[0] or b'')
+        else:
+            results = self._stream(gpg, inputtxt, sink, timing, binary)
+        if status is not None:
+            reader.join()
+        timing.wait = clock() - spawned
+        timing.bytes_err = len(results[1] or b'')
         #inputtxt.close()
-        if task in ['list-key', 'list-keys', 'fingerprint', 'refresh-keys'] \
-                and '--with-colons' in self.config.get_key('tasks', task):
-            return GPGResult(gpg, results, extract_stdout=True)
-        return GPGResult(gpg, results)
+        return self._result(task, args, gpg, results, status, timing, binary)
+
+
+    def _launchable(self, args, inputtxt, sink=None):
+        '''Checks if the config's launcher can run the gpg process.
+        The launchers only take in memory input and return the output
+        in full, a sink, a streamed, file or fd input, '-&N' special
+        filenames or the status_pipe need the default Popen launch.
+
+        @param args: list of command line arguments
+        @param inputtxt: see runGPG()
+        @param sink: see runGPG()
+        @rtype boolean
+        '''
+        return (sink is None
+                and (is_buffer(inputtxt) or isinstance(inputtxt, STR))
+                and not self._special_fds(args)
+                and not self.config.get_key('status_pipe'))
+
+
+    def _execute_backend(self, task, args, inputtxt, sink=None, backend=None,
+                         binary=False):
+        '''Runs the gpg command line through the execution backend.
+        The input is read in full first, and the status messages stay
+        on stderr, config's status_pipe does not apply.
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param args: list of command line arguments
+        @param inputtxt: text for gpg's stdin or a stream, see runGPG()
+        @param sink: see runGPG()
+        @param backend: the backend to use, defaults to self.backend
+        @param binary: see runGPG()
+        @rtype GnuPGResult object
+        '''
+        backend = backend or self.backend
+        if self._special_fds(args):
+            return self._error_result('special-filenames-unsupported',
+                'GPG.runGPG()', "fd inputs need the 'popen' launcher, "
+                "they can not be passed to: %r" % backend)
+        if self.logger:
+            self.logger.debug("Running gpg backend with: '%s'" % str(args))
+        from pyGPG.metrics import Timing, clock
+        timing = Timing(task, args)
+        start = clock()
+        if not is_buffer(inputtxt):
+            inputtxt = b''.join(iter_chunks(inputtxt))
+        gpg, results = backend.run(args, inputtxt, self._env)
+        timing.wait = clock() - start
+        timing.bytes_in = buffer_size(inputtxt)
+        timing.bytes_out = len(results[0] or b'')
+        timing.bytes_err = len(results[1] or b'')
+        if sink is not None:
+            if results[0]:
+                sink_writer(sink)(results[0])
+            results = (b'', results[1])
+        return self._result(task, args, gpg, results, timing=timing,
+                            binary=binary)
+
+
+    def _result(self, task, args, gpg, results, status=None, timing=None,
+                binary=False):
+        '''Creates the GPGResult for a finished gpg process
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param args: list of the command line arguments gpg was run with
+        @param gpg: the finished process instance
+        @param results: tuple of (stdout, stderr) output
+        @param status: Status instance (optional) from a status pipe
+        @param timing: Timing instance (optional) of the gpg run
+        @param binary: boolean, leave stdout undecoded, see runGPG()
+        @rtype GnuPGResult object
+        '''
+        lazy = self.config.get_key('lazy_results')
+        if status is None and self.config.get_key('columnar_records'):
+            status = self._new_status()
+        extract_stdout = '--with-colons' in args and task in \
+            ['list-key', 'list-keys', 'fingerprint', 'refresh-keys']
+        # a colon listing is always text, it is parsed
+        result = GPGResult(gpg, results, extract_stdout=extract_stdout,
+                           status=status, lazy=lazy, timing=timing,
+                           binary=binary and not extract_stdout)
+        if timing is not None:
+            self._record(result)
+        return result
+
+
+    def _record(self, result):
+        '''Adds the timing of a finished gpg run to the metrics,
+        then passes its result to the hooks, their errors are only
+        logged.  The decode and parse durations of lazy results are
+        not known yet, they are only in the result's timing once used.
+
+        @param result: GPGResult with a timing
+        '''
+        timing = result.timing
+        timing.returncode = result.gpg.returncode
+        self.metrics.record(timing, failed=timing.returncode not in (0, None))
+        for hook in self.hooks:
+            try:
+                hook(result)
+            except Exception:
+                # a failing hook must not fail the gpg run it observes
+                if self.logger:
+                    self.logger.exception('GPG._record(): hook %r failed'
+                                          % hook)
+
+
+    def _new_status(self):
+        '''Creates the Status for a gpg run, with a ColumnStore
+        data when the config's columnar_records is set
+
+        @rtype Status instance
+        '''
+        return Status(columnar=self.config.get_key('columnar_records'))
+
+
+    @staticmethod
+    def _status_fd_args(args, fd):
+        '''Points gpg's --status-fd at the fd passed in
+
+        @param args: list of command line arguments
+        @param fd: int, the write end of the status pipe
+        @rtype list: of command line arguments
+        '''
+        args = list(args)
+        if '--status-fd' in args:
+            args[args.index('--status-fd') + 1] = str(fd)
+        else:
+            args[1:1] = ['--status-fd', str(fd)]
+        return args
+
+
+    @staticmethod
+    def _read_status(pipe, status):
+        '''Feeds each status-fd line to the Status parser as it arrives,
+        so the parsing overlaps with gpg's run time.
+
+        @param pipe: the readable end of the status pipe
+        @param status: Status instance to fill
+        '''
+        with pipe:
+            for line in iter(pipe.readline, b''):
+                status.extract_line(line.decode('UTF-8', 'replace').rstrip('\n'))
+
+
+    def _stream(self, gpg, inputtxt, sink, timing=None, binary=False):
+        '''Streams the input to, and the output from the running gpg
+        process one chunk at a time, so memory use stays bounded
+        no matter the size of the data being processed.
+
+        @param gpg: the running Popen instance
+        @param inputtxt: text, a file like object or an iterable of chunks
+        @param sink: callable or file like object (optional), if None
+                     the output is collected and returned
+        @param timing: Timing instance (optional) to count the bytes in
+        @param binary: boolean, collect the output in a single BytesIO,
+                       it is never held twice, as chunks then joined
+        @rtype tuple: (stdout, stderr) results
+        '''
+        stderr = []
+        stdout = []
+        written = []
+
+        def feeder():
+            written.append(feed(gpg.stdin, inputtxt))
+
+        workers = [Thread(target=collect, args=(gpg.stderr, stderr))]
+        if gpg.stdin is not None:
+            workers.append(Thread(target=feeder))
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        try:
+            if sink is None and binary:
+                output = BytesIO()
+                read = pump(gpg.stdout, output.write)
+            elif sink is None:
+                read = collect(gpg.stdout, stdout)
+            else:
+                read = pump(gpg.stdout, sink)
+        except BaseException:
+            # the sink failed, stop gpg so the feeder's writes fail
+            # and the stderr pipe ends, nothing is left running
+            if gpg.poll() is None:
+                gpg.kill()
+            gpg.stdout.close()
+            raise
+        finally:
+            for worker in workers:
+                worker.join()
+            gpg.wait()
+        if timing is not None:
+            timing.bytes_in = sum(written)
+            timing.bytes_out = read
+        if sink is None and binary:
+            return (output.getvalue(), b''.join(stderr))
+        return (b''.join(stdout), b''.join(stderr))
+
+    def homedir(self, task):
+        '''Returns the gnupg homedir gpg uses for the task,
+        from its --homedir option, $GNUPGHOME or the ~/.gnupg default
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @rtype string
+        '''
+        args = self.config.compile_task(task).args
+        for index, arg in enumerate(args):
+            if arg == '--homedir' and index + 1 < len(args):
+                return args[index + 1]
+            if arg.startswith('--homedir='):
+                return arg.split('=', 1)[1]
+        env = self._env if self._env is not None else os.environ
+        return env.get('GNUPGHOME') or os.path.expanduser('~/.gnupg')
+
+
+    def keyring_token(self, task):
+        '''Returns the generation token of the keyring used for the task,
+        it changes whenever the keyring or trustdb files change
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @rtype tuple
+        '''
+        from pyGPG.cache import keyring_token
+        return keyring_token(self.homedir(task))
+
+
+    def _cached_run(self, task, id_string):
+        '''Runs a key listing task through the key cache when the
+        config's key_cache_size is set, the cached GPGResult is
+        returned as long as the keyring has not changed.
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param id_string: string or list (optional) the key ids
+        @rtype GnuPGResult object
+        '''
+        key = self._listing_key(task, id_string)
+        if key is None:
+            return self.runGPG(task, inputfile=id_string)
+        result = self._key_cache.get(key)
+        if result is None:
+            result = self.runGPG(task, inputfile=key[1])
+            self._key_cache.put(key, result)
+        return result
+
+
+    def _listing_key(self, task, id_string):
+        '''Returns the key cache key of a key listing, None when the
+        config's key_cache_size is not set.  The key cache is created,
+        or resized, as needed.
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param id_string: string or list (optional) the key ids
+        @rtype tuple: (task, id_string, args, keyring token)
+        '''
+        size = self.config.get_key('key_cache_size')
+        if not size:
+            return None
+        if self._key_cache is None or self._key_cache.maxsize != size:
+            from pyGPG.cache import LRUCache
+            self._key_cache = LRUCache(size)
+        if id_string is not None and not isinstance(id_string, STR):
+            id_string = tuple(id_string)
+        return (task, id_string, self.config.compile_task(task).args,
+                self.keyring_token(task))
+
+
+    @property
+    def key_cache(self):
+        '''The LRUCache of key listing results, None until first used'''
+        return self._key_cache
+
+
+    def _verify_key(self, kind, digests, binary=False):
+        '''Returns the verify cache key of a verification, None when
+        one of the inputs could not be digested.  The callers check
+        the config's verify_cache_size before digesting the inputs.
+
+        @param kind: string, the verify method, 'verify' or 'detached'
+        @param digests: list of the input digests, in gpg's order
+        @param binary: boolean, see runGPG()
+        @rtype tuple
+        '''
+        if None in digests:
+            return None
+        return (kind, tuple(digests), binary,
+                self.config.compile_task('verify').args,
+                self.keyring_token('verify'))
+
+
+    @staticmethod
+    def _verify_digests(inputtxt, files):
+        '''Returns the digests of all the data a verify() gpg run reads
+
+        @param inputtxt: see verify()
+        @param files: list of the verify() inputfiles
+        @rtype list: of the digests, None for an input that can not
+                     be digested
+        '''
+        from pyGPG.cache import content_digest, file_digest
+        digests = ['' if inputtxt is None else content_digest(inputtxt)]
+        digests += [file_digest(path) if isinstance(path, STR) else None
+                    for path in files]
+        if (inputtxt is None and len(files) == 1 and isinstance(files[0], STR)
+                and files[0].endswith(DETACHED_SUFFIXES)):
+            # a lone detached signature, gpg verifies it against
+            # the data file of the same name, without the suffix
+            data = os.path.splitext(files[0])[0]
+            digests.append(file_digest(data) if os.path.lexists(data)
+                           else 'missing')
+        return digests
+
+
+    def _cached_verify(self, key, run, *args):
+        '''Runs a verification through the verify cache.  The keyring
+        token is part of the key, so any keyring or trustdb change
+        invalidates the entries, they are no longer found.
+
+        @param key: the _verify_key() of the verification or None
+        @param run: the method running gpg
+        @param args: the parameters to pass to run
+        @rtype GnuPGResult object
+        '''
+        if key is None:
+            return run(*args)
+        cache = self._sized_verify_cache()
+        result = cache.get(key)
+        if result is None:
+            result = run(*args)
+            # pyGPG errors, gpg did not run, are not cached
+            if result.gpg is not None:
+                cache.put(key, result)
+        return result
+
+
+    def _sized_verify_cache(self):
+        '''Returns the verify cache, created or resized to the config's
+        verify_cache_size and verify_cache_ttl as needed
+
+        @rtype LRUCache
+        '''
+        size = self.config.get_key('verify_cache_size')
+        ttl = self.config.get_key('verify_cache_ttl') or None
+        if (self._verify_cache is None or self._verify_cache.maxsize != size
+                or self._verify_cache.ttl != ttl):
+            from pyGPG.cache import LRUCache
+            self._verify_cache = LRUCache(size, ttl)
+        return self._verify_cache
+
+
+    @property
+    def verify_cache(self):
+        '''The LRUCache of verify results, None until first used'''
+        return self._verify_cache
+
 
     def listkey(self, id_string=None):
         '''Lists the keys with --list-key <argument>
@@ -117,7 +686,7 @@ class GPG(object):
         @param id_string: string (optional) argument to --list-key
         @rtype GnuPGResult object
         '''
-        return self.runGPG('list-key', inputfile=id_string)
+        return self._cached_run('list-key', id_string)
 
     def listkeys(self, id_string=None):
         '''Lists the keys with --list-keys <argument>
@@ -125,41 +694,333 @@ class GPG(object):
         @param id_string: string (optional) argument to --list-keys
         @rtype GnuPGResult object
         '''
-        return self.runGPG('list-keys', inputfile=id_string)
+        return self._cached_run('list-keys', id_string)
 
     def fingerprint(self, id_string=None):
         '''Lists the key, with the fingerprint
 
-        @param task: string, one of pygpg's config['tasks'].keys()
-        @param inputtxt: string (optional)  of text to send to gpg's stdin
-        @param inputfile: string (optional) a filepath to pass to gpg
+        @param id_string: string (optional) argument to --fingerprint
         @rtype GnuPGResult object
         '''
-        return self.runGPG('fingerprint', inputfile=id_string)
+        return self._cached_run('fingerprint', id_string)
+
+    def fingerprints(self, ids, max_ids=None):
+        '''Looks up many keys with as few 'gpg --fingerprint'
+        runs as possible, see listkeys_bulk()
+
+        @param ids: list of key id strings
+        @param max_ids: int (optional) maximum ids per gpg process
+        @rtype KeyLookup: of {id: Key or None}
+        '''
+        return self._bulk_listing('fingerprint', ids, max_ids)
+
+    def listkeys_bulk(self, ids, max_ids=None):
+        '''Looks up many keys with as few 'gpg --list-keys' runs as
+        possible.  The ids are split into command line sized groups,
+        the colon listing of each run is grouped into Key's and
+        matched back to the ids that were asked for.
+
+        @param ids: list of key id strings, fingerprints, long keyids
+                    or email addresses
+        @param max_ids: int (optional) maximum ids per gpg process
+        @rtype KeyLookup: of {id: Key or None}, Key.records holding
+            the key's records, with the missing ids also listed in
+            KeyLookup.missing
+        '''
+        return self._bulk_listing('list-keys', ids, max_ids)
+
+    def _bulk_listing(self, task, ids, max_ids=None):
+        '''Runs the bulk key listings for fingerprints(), listkeys_bulk()
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param ids: list of key id strings
+        @param max_ids: int (optional) maximum ids per gpg process
+        @rtype KeyLookup
+        '''
+        from pyGPG.keyring import KeyLookup
+        lookup = KeyLookup()
+        ids = list(OrderedDict.fromkeys(ids))
+        for group in chunk_args(ids, max_items=max_ids):
+            result = self._execute(task, self._listing_args(task, group), '')
+            self._add_keys(lookup, group, result)
+        return lookup
+
+
+    def _listing_args(self, task, id_strings=None):
+        '''Builds the --with-colons key listing command line
+
+        @param task: string, one of pygpg's config['tasks'].keys()
+        @param id_strings: list (optional) of the key ids to list
+        @rtype list: of command line arguments
+        '''
+        args = self._task_args(task)
+        if '--with-colons' not in args:
+            args.append('--with-colons')
+        args.append(self.config.compile_task(task).command)
+        if id_strings:
+            args += id_strings
+        return args
+
+
+    @staticmethod
+    def _add_keys(lookup, group, result):
+        '''Matches the keys of a bulk listing run to the ids asked for
+
+        @param lookup: KeyLookup instance to fill
+        @param group: list of the key ids of the run
+        @param result: GPGResult of the run
+        '''
+        lookup.results.append(result)
+        keyring = result.keyring
+        for id_string in group:
+            key = keyring.get(id_string)
+            lookup[id_string] = key
+            if key is None:
+                lookup.missing.append(id_string)
+
+    def iter_listing(self, task='list-keys', id_string=None, keys=False,
+                     status=None):
+        '''Runs a --with-colons key listing, parsing gpg's stdout as it
+        is read.  Nothing is kept, so the memory use stays flat no matter
+        the size of the keyring, and the first records are available
+        before gpg finishes.  The config's launcher is not used, the
+        launchers do not stream.  A replay or recording backend runs
+        the whole listing, its output is then parsed from memory.  The
+        run is added to the metrics and passed to the hooks once done,
+        its GPGResult only holds the stderr status data.
+
+        @param task: string, one of 'list-keys', 'list-key',
+                     'fingerprint', 'list-secret-keys'
+        @param id_string: string or list (optional) of key ids to list,
+                          defaults to all the keys
+        @param keys: boolean, yield whole Key's instead of the records
+        @param status: Status instance (optional) to fill with gpg's stderr
+                       status data once the listing is done
+        @rtype generator: of legend colon record class or Key instances
+        '''
+        if isinstance(id_string, STR):
+            id_string = [id_string]
+        args = self._listing_args(task, id_string)
+        if self.logger:
+            self.logger.debug("Running gpg with: '%s'" % str(args))
+        from pyGPG.metrics import Timing, clock
+        timing = Timing(task, args)
+        start = clock()
+        stderr = []
+        if self.backend is not None:
+            # the replay and recording backends return the whole output,
+            # it is parsed from memory, the listing is not streamed
+            gpg, results = self.backend.run(args, b'', self._env)
+            stdout = BytesIO(results[0])
+            stderr.append(results[1])
+            reader = None
+        else:
+            gpg = Popen(args, stdin=PIPE, stdout=PIPE, stderr=PIPE,
+                        env=self._env)
+            gpg.stdin.close()
+            stdout = gpg.stdout
+            reader = Thread(target=collect, args=(gpg.stderr, stderr))
+            reader.daemon = True
+            reader.start()
+        spawned = clock()
+        timing.spawn = spawned - start
+        read = [0]
+
+        def lines():
+            for line in stdout:
+                read[0] += len(line)
+                yield line
+
+        records = Status.iter_colon_listing(lines())
+        if keys:
+            from pyGPG.keyring import iter_keys
+            records = iter_keys(records)
+        try:
+            for item in records:
+                yield item
+        finally:
+            if gpg.poll() is None:
+                # the consumer stopped early
+                gpg.kill()
+            stdout.close()
+            gpg.wait()
+            if reader is not None:
+                reader.join()
+            err = b''.join(stderr)
+            timing.wait = clock() - spawned
+            timing.bytes_out = read[0]
+            timing.bytes_err = len(err)
+            if status is not None:
+                status.extract_data(err.decode('UTF-8', 'replace').split('\n'))
+            # the stdout records were yielded, the hooks get the status
+            self._record(GPGResult(gpg, (b'', err), lazy=True, timing=timing))
+
 
-    def decrypt(self, inputtxt=None, inputfile=None, outputfile=None):
+    def decrypt(self, inputtxt=None, inputfile=None, outputfile=None,
+                sink=None, binary=False):
         '''Decrypts the inputtxt block passed in
         or the file found at inputfile and saves it to outputfile,
         and/or returns the decrypted as GPGResult.output
 
-        @param inputtxt: string (optional)  of text to send to gpg's stdin
+        @param inputtxt: string (optional)  of text to send to gpg's stdin,
+                         or a file like object or iterable to stream
         @param inputfile: string (optional) a filepath to pass to gpg
         @param outputfile: string (optional) filepath to pass to
                            gpg for it's output
+        @param sink: callable or file like object (optional) to stream
+                     the decrypted output to instead of GPGResult.output
+        @param binary: boolean, keep the decrypted output as bytes,
+                       never decoded, see runGPG()
         @rtype GnuPGResult object
         '''
-        return self.runGPG('decrypt', inputtxt, inputfile, outputfile)
+        return self.runGPG('decrypt', inputtxt, inputfile, outputfile, sink,
+                           binary)
 
 
-    def verify(self, inputtxt=None, inputfile=None, outputfile=None):
+    def verify(self, inputtxt=None, inputfile=None, outputfile=None,
+               sink=None, binary=False):
         '''
-        @param inputtxt: string (optional)  of text to send to gpg's stdin
+        @param inputtxt: string (optional)  of text to send to gpg's stdin,
+                         or a file like object or iterable to stream
         @param inputfile: string (optional) a filepath to pass to gpg
         @param outputfile: string (optional) filepath to pass to
                            gpg for it's output
+        @param sink: callable or file like object (optional) to stream
+                     the signed data output to instead of GPGResult.output
+        @param binary: boolean, keep the signed data output as bytes,
+                       never decoded, see runGPG()
         @rtype GnuPGResult object
         '''
-        return self.runGPG('verify', inputtxt, inputfile, outputfile)
+        key = self._verify_run_key(inputtxt, inputfile, outputfile, sink,
+                                   binary)
+        return self._cached_verify(key, self.runGPG, 'verify', inputtxt,
+                                   inputfile, outputfile, sink, binary)
+
+
+    def _verify_run_key(self, inputtxt, inputfile, outputfile=None,
+                        sink=None, binary=False):
+        '''Returns the verify cache key of a verify() run, None if it
+        is not cached, see verify() for the parameters
+
+        @rtype tuple
+        '''
+        if not (self.config.get_key('verify_cache_size') and outputfile is None
+                and sink is None
+                and (inputtxt is not None or inputfile is not None)):
+            return None
+        files = inputfile
+        if files is not None and not isinstance(files, (list, tuple)):
+            files = [files]
+        return self._verify_key('verify',
+            self._verify_digests(inputtxt, files or []), binary)
+
+
+    def verify_detached(self, data, signature, sink=None, binary=False):
+        '''Verifies a detached signature of the data, both held in
+        memory, without writing either of them to a file.  The data is
+        sent to gpg's stdin, the signature through a pipe passed as a
+        '-&N' special filename.
+
+        @param data: the signed data, anything runGPG() accepts
+                     as inputtxt (text, buffer, open file, fd, stream)
+        @param signature: the detached signature, text or a bytes like
+                          buffer, or an open file or fd to pass to gpg
+        @param sink: callable or file like object (optional), see verify()
+        @param binary: boolean, see verify()
+        @rtype GnuPGResult object
+        '''
+        key = self._detached_key(data, signature, sink, binary)
+        return self._cached_verify(key, self._verify_detached, data,
+                                   signature, sink, binary)
+
+
+    def _detached_key(self, data, signature, sink=None, binary=False):
+        '''Returns the verify cache key of a verify_detached() run,
+        None if it is not cached, see verify_detached() for the parameters
+
+        @rtype tuple
+        '''
+        if not self.config.get_key('verify_cache_size') or sink is not None:
+            return None
+        from pyGPG.cache import content_digest
+        return self._verify_key('detached', [content_digest(data),
+            content_digest(signature)], binary)
+
+
+    def _verify_detached(self, data, signature, sink=None, binary=False):
+        '''Runs the verify_detached() gpg process, see it for the
+        parameters
+
+        @rtype GnuPGResult object
+        '''
+        sig_fd = fileno_of(signature)
+        if sig_fd is not None:
+            return self.runGPG('verify', data, [sig_fd], sink=sink,
+                               binary=binary)
+        sig_r, writer = self._signature_pipe(signature)
+        try:
+            return self.runGPG('verify', data, [sig_r], sink=sink,
+                               binary=binary)
+        finally:
+            # unblocks the writer if gpg did not read the signature
+            os.close(sig_r)
+            writer.join()
+
+
+    @staticmethod
+    def _signature_pipe(signature):
+        '''Starts feeding the signature to a pipe for gpg to read.
+        gpg reads the signature before the data, it is fed from a thread
+        so a signature bigger than the pipe buffer can not block.
+
+        @param signature: text or a bytes like buffer
+        @rtype tuple: (the pipe's read fd, the writer Thread)
+        '''
+        sig_r, sig_w = os.pipe()
+        writer = Thread(target=feed, args=(os.fdopen(sig_w, 'wb'), signature))
+        writer.daemon = True
+        writer.start()
+        return (sig_r, writer)
+
+
+    def verify_files(self, files, max_files=None):
+        '''Verifies many signed files using as few gpg processes as
+        possible (--verify-files), then splits the status data
+        into one GPGResult per file.
+
+        @param files: list of filepaths to verify
+        @param max_files: int (optional) maximum files per gpg process
+        @rtype OrderedDict: of {filepath: GPGResult}
+        '''
+        results = OrderedDict()
+        for group in chunk_args(files, max_items=max_files):
+            self._file_results(results, group,
+                               self.runGPG('verify-files', inputfile=group))
+        return results
+
+
+    def _file_results(self, results, group, batch):
+        '''Splits the result of a verify_files() gpg run into one
+        GPGResult per file, matched on gpg's FILE_START filenames
+
+        @param results: OrderedDict to add the {filepath: GPGResult} to
+        @param group: list of the filepaths of the run
+        @param batch: GPGResult of the run
+        '''
+        # {filename: [Status, ...]}, a file may be listed twice
+        per_file = {}
+        for name, status in batch.status.split_files():
+            if name is not None:
+                per_file.setdefault(name, []).append(status)
+        for filepath in group:
+            statuses = per_file.get(filepath)
+            if statuses:
+                results[filepath] = GPGResult(batch.gpg, ('', ''),
+                                              status=statuses.pop(0))
+            elif filepath not in results:
+                results[filepath] = self._error_result('no-file-status',
+                    'GPG.verify_files()',
+                    'gpg ended before processing file: %s' % filepath)
 
 
     def sign(self, mode, inputtxt=None, inputfile=None, outputfile=None):
@@ -171,8 +1032,7 @@ class GPG(object):
         @rtype GnuPGResult object
         '''
         if mode not in self.config.sign_modes():
-            return GPGResult(None, '', 'pyGPG: Error, no/unsupported signing'
-                             'mode passed in: %s\n' % mode)
+            return self._sign_mode_error(mode)
         return self.runGPG(mode, inputtxt, inputfile, outputfile)
 
 
@@ -186,7 +1046,21 @@ class GPG(object):
         checks config parameter refetch: Boolean
         @rtype list: of options from gpg'''
         if not self._gpg_options or self.config['refetch']:
-            self._gpg_options = self.runGPG('dump-options', '')
+            self._gpg_options = self._load_probe('dump-options')
+            if self._gpg_options is None:
+                self._gpg_options = self.runGPG('dump-options', '')
+                self._save_probe('dump-options', self._gpg_options)
+        return self._options_list()
+
+
+    def _sign_mode_error(self, mode):
+        '''Returns the error result for an unsupported signing mode'''
+        return self._error_result('unsupported-sign-mode', 'GPG.sign()',
+            'no/unsupported signing mode passed in: %s' % mode)
+
+
+    def _options_list(self):
+        '''Returns the list of options from the dump-options result'''
         opts = [x for x in self._gpg_options.output.split("\n") if x]
         if self.config.get_key('only_usable'):
             return list(set(opts).difference(self.config.unsupported))
@@ -200,14 +1074,110 @@ class GPG(object):
         @param verbose: boolean, defaults to False
         @rtype dict: of versions'''
         if (self._gpg_version is None) or self.config['refetch']:
-            self._gpg_version = self.runGPG('version', '')
-            self._gpg_version.status.process_gpg_ver(self._gpg_version.output.split('\n'))
-            # now do pygpg version
-            # insert it as the first entry in status.data
-            target = []
-            parts = [PYGPG_IDENTIFIER, 'PYGPG_VERSION', __version__, __license__]
-            self._gpg_version.status.process_pygpg_msg(parts=parts, target=target)
-            self._gpg_version.status.data.insert(0, target[0])
+            self._gpg_version = self._load_probe('version')
+            if self._gpg_version is None:
+                self._gpg_version = self._process_version(
+                    self.runGPG('version', ''))
+                self._save_probe('version', self._gpg_version)
+        return self._version_info(verbose)
+
+
+    @property
+    def probe_cache(self):
+        '''The on disk ProbeCache of the version and dump-options
+        results, None unless the config's probe_cache_dir is set'''
+        directory = self.config.get_key('probe_cache_dir')
+        if not directory:
+            return None
+        from pyGPG.cache import ProbeCache
+        return ProbeCache(os.path.expanduser(directory))
+
+
+    def _probe_context(self, task):
+        '''Returns what, besides the gpg executable, the probe
+        result depends on: its command line and the homedir'''
+        compiled = self.config.compile_task(task)
+        return [list(compiled.args) + [compiled.command], self.homedir(task)]
+
+
+    def _load_probe(self, task):
+        '''Returns the GPGResult of the 'version' or 'dump-options' task
+        rebuilt from the probe cache, None if it is not cached
+
+        @param task: string, 'version' or 'dump-options'
+        @rtype GnuPGResult object or None
+        '''
+        cache = self.probe_cache
+        if cache is None:
+            return None
+        data = cache.get(self.config.compile_task(task).args[0], task,
+                         self._probe_context(task))
+        if not data:
+            return None
+        if task == 'version':
+            try:
+                version = legend.GPG_VERSION._make(data)
+            except (TypeError, ValueError):
+                # an entry not matching GPG_VERSION's fields is a miss
+                return None
+            result = GPGResult(None, (b'', b''))
+            result.status.data.append(version)
+            return self._add_pygpg_version(result)
+        return GPGResult(None, ('\n'.join(data).encode('UTF-8'), b''))
+
+
+    def _save_probe(self, task, result):
+        '''Saves the parsed GPG_VERSION data or the option set of
+        a 'version' or 'dump-options' result to the probe cache
+
+        @param task: string, 'version' or 'dump-options'
+        @param result: GPGResult of the task
+        '''
+        cache = self.probe_cache
+        if cache is None or result.failed:
+            return
+        if task == 'version':
+            data = [list(x) for x in result.status.data
+                    if x.name == 'GPG_VERSION']
+            data = data[0] if data else None
+        else:
+            data = [x for x in result.output.split('\n') if x]
+        if data:
+            cache.put(self.config.compile_task(task).args[0], task, data,
+                      self._probe_context(task))
+
+
+    @staticmethod
+    def _process_version(result):
+        '''Parses the 'gpg --version' output of the result passed in
+        and inserts the pyGPG version as the first entry in status.data
+
+        @param result: GPGResult of the 'gpg --version' run
+        @rtype GnuPGResult object
+        '''
+        result.status.process_gpg_ver(result.output.split('\n'))
+        return GPG._add_pygpg_version(result)
+
+
+    @staticmethod
+    def _add_pygpg_version(result):
+        '''Inserts the pyGPG version as the first entry in status.data
+
+        @param result: GPGResult of the 'gpg --version' run
+        @rtype GnuPGResult object
+        '''
+        target = []
+        parts = [PYGPG_IDENTIFIER, 'PYGPG_VERSION', __version__, __license__]
+        result.status.process_pygpg_msg(parts=parts, target=target)
+        result.status.data.insert(0, target[0])
+        return result
+
+
+    def _version_info(self, verbose=False):
+        '''Returns the version information from the cached version result
+
+        @param verbose: boolean, defaults to False
+        @rtype dict: of versions'''
         data = self._gpg_version.status.data
         if verbose:
             result = {}
@@ -0,0 +1,296 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG Keyring
+####################
+# File:       keyring.py
+#
+#             Python classes grouping the colon listing
+#             records into keys
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles pyGPG's structured key model of the gpg colon listings.'''
+
+import re
+from collections import OrderedDict
+
+
+# records starting a new key
+KEY_RECORDS = frozenset(['PUB', 'SEC', 'CRT', 'CRS'])
+# records starting a new subkey of the current key
+SUBKEY_RECORDS = frozenset(['SUB', 'SSB'])
+# records starting a new user id of the current key
+UID_RECORDS = frozenset(['UID', 'UAT'])
+# records holding signatures on the current key, subkey or user id
+SIG_RECORDS = frozenset(['SIG', 'REV'])
+
+HEX_RE = re.compile(r'^[0-9A-F]+$')
+EMAIL_RE = re.compile(r'<([^<>\s]+@[^<>\s]+)>|^([^<>\s]+@[^<>\s]+)$')
+
+
+def email_of(user_id):
+    '''Returns the lower case email address of a user id string
+
+    @param user_id: string, ie: 'pyGPG Test <pygpg@nowhere.foo>'
+    @rtype string or None
+    '''
+    if not user_id:
+        return None
+    match = EMAIL_RE.search(user_id.strip())
+    if match:
+        return (match.group(1) or match.group(2)).lower()
+    return None
+
+
+class Subkey(object):
+    '''A subkey (SUB, SSB record) of a Key'''
+
+    __slots__ = ('record', 'fingerprint', 'keygrip', 'sigs', 'records')
+
+    def __init__(self, record):
+        self.record = record
+        self.fingerprint = None
+        self.keygrip = None
+        self.sigs = []
+        self.records = [record]
+
+    @property
+    def long_keyid(self):
+        return self.record.long_keyid
+
+    def __repr__(self):
+        return '<Subkey %s>' % (self.fingerprint or self.long_keyid)
+
+
+class UserID(object):
+    '''A user id (UID, UAT record) of a Key'''
+
+    __slots__ = ('record', 'sigs', 'records', 'email')
+
+    def __init__(self, record):
+        self.record = record
+        self.sigs = []
+        self.records = [record]
+        self.email = email_of(self.user_ID)
+
+    @property
+    def user_ID(self):
+        return getattr(self.record, 'user_ID', None)
+
+    def __repr__(self):
+        return '<UserID %r>' % self.user_ID
+
+
+class Key(Subkey):
+    '''A primary key (PUB, SEC record) with its fingerprint,
+    subkeys, user ids and signatures'''
+
+    __slots__ = ('subkeys', 'uids')
+
+    def __init__(self, record):
+        Subkey.__init__(self, record)
+        self.subkeys = []
+        self.uids = []
+
+    @property
+    def fingerprints(self):
+        '''The primary key's, then the subkeys fingerprints'''
+        return [x.fingerprint for x in [self] + self.subkeys if x.fingerprint]
+
+    @property
+    def keyids(self):
+        '''The primary key's, then the subkeys long keyids'''
+        return [x.long_keyid for x in [self] + self.subkeys if x.long_keyid]
+
+    @property
+    def emails(self):
+        return [x.email for x in self.uids if x.email]
+
+    def __repr__(self):
+        return '<Key %s>' % (self.fingerprint or self.long_keyid)
+
+
+def iter_keys(records):
+    '''Groups a flat sequence of colon listing records into Key's,
+    yielding each key as soon as its last record has been seen.
+    Records outside of any key (TRU, CFG, ...) are skipped.
+
+    @param records: iterable of legend colon record class instances
+    @rtype generator: of Key instances
+    '''
+    key = None
+    current = None
+    for record in records:
+        name = record.name
+        if name in KEY_RECORDS:
+            if key is not None:
+                yield key
+            key = current = Key(record)
+            continue
+        if key is None:
+            continue
+        key.records.append(record)
+        if name in SUBKEY_RECORDS:
+            current = Subkey(record)
+            key.subkeys.append(current)
+            continue
+        elif name in UID_RECORDS:
+            current = UserID(record)
+            key.uids.append(current)
+            continue
+        elif name == 'FPR':
+            if isinstance(current, Subkey) and not current.fingerprint:
+                current.fingerprint = record.fingerprint
+        elif name == 'GRP':
+            if isinstance(current, Subkey) and not current.keygrip:
+                current.keygrip = record.user_ID
+        elif name in SIG_RECORDS:
+            current.sigs.append(record)
+        if current is not key:
+            current.records.append(record)
+    if key is not None:
+        yield key
+
+
+class Keyring(object):
+    '''Holds Key's, indexed by long keyid, fingerprint (both including
+    those of the subkeys) and email address for constant time lookups'''
+
+
+    def __init__(self, keys=None):
+        '''Class init function
+
+        @param keys: iterable (optional) of Key instances
+        '''
+        self.keys = []
+        self.by_keyid = {}
+        self.by_fingerprint = {}
+        self.by_email = {}
+        self._by_short_keyid = None
+        for key in keys or []:
+            self.add(key)
+
+
+    @classmethod
+    def from_records(cls, records):
+        '''Creates a Keyring from a flat list of colon listing records,
+        such as Status.data
+
+        @param records: iterable of legend colon record class instances
+        @rtype Keyring
+        '''
+        return cls(iter_keys(records))
+
+
+    def __len__(self):
+        return len(self.keys)
+
+
+    def __iter__(self):
+        return iter(self.keys)
+
+
+    def __contains__(self, id_string):
+        return self.get(id_string) is not None
+
+
+    def add(self, key):
+        '''Adds a Key and indexes it
+
+        @param key: Key instance
+        '''
+        self.keys.append(key)
+        self._by_short_keyid = None
+        by_keyid = self.by_keyid
+        by_fingerprint = self.by_fingerprint
+        for item in [key] + key.subkeys:
+            keyid = item.record.long_keyid
+            if keyid:
+                by_keyid.setdefault(keyid.upper(), key)
+            if item.fingerprint:
+                by_fingerprint.setdefault(item.fingerprint.upper(), key)
+        for uid in key.uids:
+            if uid.email:
+                keys = self.by_email.setdefault(uid.email, [])
+                if key not in keys:
+                    keys.append(key)
+
+
+    def get(self, id_string):
+        '''Returns the key matching a fingerprint, keyid, email address
+        or user id
+
+        @param id_string: string, ie: '0xABB2F2DC74991EE9',
+                          '476935D6D659B4C27B700FEDABB2F2DC74991EE9',
+                          'pygpg@nowhere.foo' or '<pygpg@nowhere.foo>'
+        @rtype Key or None
+        '''
+        keys = self.find(id_string)
+        if keys:
+            return keys[0]
+        return None
+
+
+    def find(self, id_string):
+        '''Returns all the keys matching a fingerprint, keyid, email
+        address or user id.  Fingerprints, long keyids and email addresses
+        are constant time lookups, short keyids use an index built on
+        first use, anything else is a gpg like case insensitive
+        substring search of the user ids.
+
+        @param id_string: string, see get()
+        @rtype list: of Key instances
+        '''
+        id_string = id_string.strip()
+        if '@' in id_string:
+            keys = self.by_email.get(email_of(id_string) or
+                                     email_of('<%s>' % id_string))
+            if keys:
+                return list(keys)
+            return self._search(id_string)
+        ident = id_string.upper()
+        if ident.startswith('0X'):
+            ident = ident[2:]
+        ident = ident.replace(' ', '')
+        if not HEX_RE.match(ident):
+            return self._search(id_string)
+        key = self.by_fingerprint.get(ident) or self.by_keyid.get(ident)
+        if key is None and len(ident) == 8:
+            key = self._short_keyids().get(ident)
+        if key is not None:
+            return [key]
+        return []
+
+
+    def _short_keyids(self):
+        '''Returns the short (8 hex digit) keyid index'''
+        if self._by_short_keyid is None:
+            self._by_short_keyid = {}
+            for keyid, key in self.by_keyid.items():
+                self._by_short_keyid.setdefault(keyid[-8:], key)
+        return self._by_short_keyid
+
+
+    def _search(self, text):
+        '''Returns the keys with a user id containing text'''
+        text = text.lower()
+        return [key for key in self.keys
+                if any(text in (uid.user_ID or '').lower() for uid in key.uids)]
+
+
+class KeyLookup(OrderedDict):
+    '''The {id: Key} results of a bulk key lookup,
+    the ids that were not found map to None'''
+
+    def __init__(self, *args, **kwargs):
+        OrderedDict.__init__(self, *args, **kwargs)
+        # the ids not found in the keyring
+        self.missing = []
+        # the GPGResult of each gpg run
+        self.results = []
@@ -0,0 +1,217 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG launchers
+####################
+# File:       launch.py
+#
+#             Python classes starting gpg processes
+#             without forking the calling process
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles pyGPG's low overhead gpg process launchers.
+
+subprocess.Popen forks the calling process, the cost of which grows with
+its memory size.  These execution backends (see pyGPG.replay) avoid it:
+
+    SpawnBackend       os.posix_spawn(), a vfork style spawn on most
+                       platforms, the parent's memory is not copied
+    ForkServerBackend  hands the launches to a small helper process,
+                       started early, which does the forking
+
+They are opt-in, selected with the config's 'launcher' option, 'popen'
+by default.  Where Popen already uses vfork (python 3.8+ on Linux) they
+are slower than it.  They only run gpg with an in memory input, the runs
+with a sink, a streamed, file or fd input, '-&N' special filenames or the
+status_pipe still use Popen.
+'''
+
+import os
+from threading import Thread
+
+from pyGPG.replay import PopenBackend
+from pyGPG.streams import collect, feed
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+
+# the config 'launcher' option values
+LAUNCHERS = ['popen', 'posix_spawn', 'forkserver']
+
+
+class FinishedProcess(object):
+    '''Stands in for the Popen instance of a finished gpg process'''
+
+    def __init__(self, args, returncode, pid=None):
+        self.args = args
+        self.returncode = returncode
+        self.pid = pid
+
+
+    def poll(self):
+        return self.returncode
+
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+def _exitcode(status):
+    '''Returns the Popen style returncode of a waitpid() status'''
+    if hasattr(os, 'waitstatus_to_exitcode'):
+        return os.waitstatus_to_exitcode(status)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class SpawnBackend(object):
+    '''Starts gpg with os.posix_spawn()'''
+
+    def run(self, args, inputtxt, env=None):
+        '''Runs gpg
+
+        @param args: list of the gpg command line arguments
+        @param inputtxt: bytes to send to gpg's stdin
+        @param env: dict (optional) of the gpg environment
+        @rtype tuple: (FinishedProcess instance, (stdout, stderr))
+        '''
+        if env is None:
+            env = os.environ
+        # look gpg up in the PATH it is run with, as Popen does
+        path = args[0] if os.sep in args[0] else which(args[0],
+            path=env.get('PATH', os.defpath))
+        if not path:
+            raise OSError(2, 'No such file or directory', args[0])
+        # the pipes are created close on exec, only the dup2()'ed
+        # ends are left open in gpg
+        pipes = [os.pipe() for x in range(3)]
+        stdin, stdout, stderr = pipes
+        try:
+            pid = os.posix_spawn(path, args, env,
+                file_actions=[(os.POSIX_SPAWN_DUP2, stdin[0], 0),
+                              (os.POSIX_SPAWN_DUP2, stdout[1], 1),
+                              (os.POSIX_SPAWN_DUP2, stderr[1], 2)])
+        except Exception:
+            for pipe in pipes:
+                os.close(pipe[0])
+                os.close(pipe[1])
+            raise
+        os.close(stdin[0])
+        os.close(stdout[1])
+        os.close(stderr[1])
+        out, err = [], []
+        workers = [
+            Thread(target=feed, args=(os.fdopen(stdin[1], 'wb'), inputtxt)),
+            Thread(target=collect, args=(os.fdopen(stderr[0], 'rb'), err)),
+            ]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        collect(os.fdopen(stdout[0], 'rb'), out)
+        for worker in workers:
+            worker.join()
+        status = os.waitpid(pid, 0)[1]
+        return (FinishedProcess(args, _exitcode(status), pid),
+                (b''.join(out), b''.join(err)))
+
+
+def _forkserver_run(args, inputtxt, env):
+    '''Runs gpg in the fork server helper process'''
+    gpg, results = PopenBackend().run(args, inputtxt, env)
+    return (gpg.returncode, gpg.pid, results)
+
+
+class ForkServerBackend(object):
+    '''Hands the gpg launches to worker processes of a multiprocessing
+    fork server.  The fork server is a small, fresh python process, so
+    the gpg forks are cheap no matter the size of the calling process.'''
+
+    def __init__(self, workers=1):
+        '''Class init function
+
+        @param workers: int, the number of helper processes
+        '''
+        self.workers = workers
+        self._executor = None
+
+
+    def start(self):
+        '''Starts the fork server and its helper processes, best done
+        early, while the calling process is still small'''
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            from multiprocessing import get_context
+            context = get_context('forkserver')
+            context.set_forkserver_preload(['pyGPG.launch'])
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                mp_context=context)
+            # have the helpers started now, not on the first gpg run
+            for future in [self._executor.submit(os.getpid)
+                           for x in range(self.workers)]:
+                future.result()
+        return self
+
+
+    def run(self, args, inputtxt, env=None):
+        '''See SpawnBackend.run()'''
+        self.start()
+        # the input is pickled to the helper, it can not be shared
+        returncode, pid, results = self._executor.submit(
+            _forkserver_run, list(args), bytes(inputtxt),
+            dict(env if env is not None else os.environ)).result()
+        return (FinishedProcess(args, returncode, pid), results)
+
+
+    def shutdown(self):
+        '''Stops the helper processes'''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+# the fork server shared by the GPG instances of the process
+_forkserver = None
+
+
+def start_forkserver(workers=1):
+    '''Starts the shared fork server backend, call it early, before the
+    process grows, to have the forkserver launcher cheap from the start.
+    Like any multiprocessing start, the main module must be importable
+    without side effects, ie: guarded by if __name__ == '__main__':
+
+    @param workers: int, the number of helper processes
+    @rtype ForkServerBackend
+    '''
+    global _forkserver
+    if _forkserver is None:
+        _forkserver = ForkServerBackend(workers)
+    return _forkserver.start()
+
+
+def launcher_backend(launcher):
+    '''Returns the execution backend of a config 'launcher' value
+
+    @param launcher: string, one of LAUNCHERS
+    @rtype backend instance or None for the default Popen launcher
+    '''
+    if not launcher or launcher == 'popen':
+        return None
+    if launcher == 'posix_spawn':
+        if hasattr(os, 'posix_spawn'):
+            return SpawnBackend()
+        # not available, python < 3.8 or not a posix system
+        return None
+    if launcher == 'forkserver':
+        return start_forkserver()
+    raise ValueError('pyGPG.launch: unknown launcher: %r, must be one of %s'
+                     % (launcher, LAUNCHERS))
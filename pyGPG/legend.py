@@ -17,8 +17,9 @@
 #
 '''Holds pyGPG's gpg status output legend.'''
 
-
+import sys
 from collections import namedtuple
+from threading import Lock
 
 
 # make this global, so is easy to change, and calculates only once
@@ -128,6 +129,7 @@ You may see more than one of these status lines."""
         3 - decrypt"""
     ),
     ('FILE_DONE', [], "Marks the end of a file processing which has been started by FILE_START."),
+    ('FILE_ERROR', ['what', 'filename'], "Processing the file <filename> started by FILE_START failed, ie: it could not be opened."),
     ('BEGIN_DECRYPTION', [],
 """Mark the start of the actual decryption process.
 These are also emitted when in --list-only mode."""
@@ -299,11 +301,43 @@ The reasons codes currently in use are:
 
 
 
-# create the status_fd, pyGPG and Colon listing classes
-for (name, fields, msg) in CLASSES:
-    obj = locals()[name] = namedtuple(name, fields)
-    obj.name = name
-    obj.msg = msg
-    obj.__slots__ = ()
-del obj
+# the status_fd, pyGPG and Colon listing classes are created on their
+# first lookup (module __getattr__), most programs only use a few of them
+_DEFINITIONS = dict((name, (fields, msg)) for (name, fields, msg) in CLASSES)
+_lock = Lock()
+
+__all__ = ['GPG_IDENTIFIER', 'PYGPG_IDENTIFIER', 'GPG_VER_IDENTFIER',
+    'COLON_IDENTIFIERS', 'COLON_LISTING_FIELDS', 'FINGERPRINT_CLASSES',
+    'CLASSES'] + [name for (name, fields, msg) in CLASSES]
+
+
+def _create_class(name):
+    '''Creates the named record class, once
+
+    @param name: string, one of the CLASSES names
+    @rtype namedtuple class
+    '''
+    with _lock:
+        obj = globals().get(name)
+        if obj is None:
+            fields, msg = _DEFINITIONS[name]
+            obj = namedtuple(name, fields)
+            obj.name = name
+            obj.msg = msg
+            obj.__slots__ = ()
+            globals()[name] = obj
+        return obj
+
+
+def __getattr__(name):
+    try:
+        return _create_class(name)
+    except KeyError:
+        raise AttributeError("module %r has no attribute %r"
+                             % (__name__, name))
+
 
+if sys.version_info < (3, 7):
+    # no module __getattr__ support, create them all now
+    for (name, fields, msg) in CLASSES:
+        _create_class(name)
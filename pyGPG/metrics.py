@@ -0,0 +1,193 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG metrics
+####################
+# File:       metrics.py
+#
+#             Python classes for timing the gpg runs
+#             and aggregating the timings per task
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles pyGPG's per gpg run timing and metrics.'''
+
+import time
+from bisect import bisect_left
+from threading import Lock
+
+
+# monotonic, high resolution clock
+clock = getattr(time, 'perf_counter', time.time)
+
+# the latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class Timing(object):
+    '''Where the time of one gpg run went, and the bytes it moved.
+    The durations are in seconds.'''
+
+    __slots__ = ('task', 'args', 'spawn', 'wait', 'decode', 'parse',
+                 'bytes_in', 'bytes_out', 'bytes_err', 'returncode')
+
+    def __init__(self, task=None, args=None):
+        '''Class init function
+
+        @param task: string, the config task run
+        @param args: list of the gpg command line arguments
+        '''
+        self.task = task
+        self.args = args
+        # starting the gpg process
+        self.spawn = 0.0
+        # from the start of gpg until its exit and end of the pipe I/O
+        self.wait = 0.0
+        # decoding, then parsing the output, python side
+        self.decode = 0.0
+        self.parse = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.bytes_err = 0
+        self.returncode = None
+
+
+    @property
+    def total(self):
+        '''The sum of the durations'''
+        return self.spawn + self.wait + self.decode + self.parse
+
+
+    def as_dict(self):
+        '''Returns the timing as a dictionary, ie: for logging
+
+        @rtype dict
+        '''
+        result = dict((name, getattr(self, name)) for name in self.__slots__)
+        result['total'] = self.total
+        return result
+
+
+    def __repr__(self):
+        return ('<Timing %s: spawn %.6f, wait %.6f, decode %.6f, parse %.6f>'
+                % (self.task, self.spawn, self.wait, self.decode, self.parse))
+
+
+class Histogram(object):
+    '''Counts of values per bucket upper bound, not cumulative'''
+
+    def __init__(self, buckets=BUCKETS):
+        '''Class init function
+
+        @param buckets: sorted tuple of the bucket upper bounds
+        '''
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+
+    def add(self, value):
+        '''Counts a value in the first bucket it fits in'''
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+    def as_dict(self):
+        '''Returns the histogram as a dictionary
+
+        @rtype dict: {'buckets': [(upper bound, count), ...],
+                      'count': int, 'sum': float}
+        '''
+        return {'buckets': list(zip(self.buckets, self.counts)),
+                'count': self.count, 'sum': self.sum}
+
+
+class TaskMetrics(object):
+    '''The aggregated timings of one task'''
+
+    def __init__(self, buckets=BUCKETS):
+        self.count = 0
+        self.failures = 0
+        self.spawn = 0.0
+        self.wait = 0.0
+        self.decode = 0.0
+        self.parse = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = Histogram(buckets)
+
+
+    def add(self, timing, failed=False):
+        self.count += 1
+        if failed:
+            self.failures += 1
+        self.spawn += timing.spawn
+        self.wait += timing.wait
+        self.decode += timing.decode
+        self.parse += timing.parse
+        self.bytes_in += timing.bytes_in
+        self.bytes_out += timing.bytes_out
+        self.latency.add(timing.total)
+
+
+    def as_dict(self):
+        return {'count': self.count, 'failures': self.failures,
+                'spawn': self.spawn, 'wait': self.wait,
+                'decode': self.decode, 'parse': self.parse,
+                'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                'latency': self.latency.as_dict()}
+
+
+class Metrics(object):
+    '''Thread safe registry of the gpg run counts and latency
+    histograms, per task'''
+
+    def __init__(self, buckets=BUCKETS):
+        '''Class init function
+
+        @param buckets: sorted tuple of the latency histogram
+                        bucket upper bounds, in seconds
+        '''
+        self.buckets = buckets
+        self.tasks = {}
+        self._lock = Lock()
+
+
+    def record(self, timing, failed=False):
+        '''Adds the timing of a gpg run
+
+        @param timing: Timing instance
+        @param failed: boolean, the run failed
+        '''
+        with self._lock:
+            try:
+                task = self.tasks[timing.task]
+            except KeyError:
+                task = self.tasks[timing.task] = TaskMetrics(self.buckets)
+            task.add(timing, failed)
+
+
+    def snapshot(self):
+        '''Returns a copy of the metrics, ready for exporting
+
+        @rtype dict: of {task: {'count': ..., 'latency': {...}, ...}}
+        '''
+        with self._lock:
+            return dict((task, metrics.as_dict())
+                        for task, metrics in self.tasks.items())
+
+
+    def reset(self):
+        '''Clears all the metrics'''
+        with self._lock:
+            self.tasks = {}
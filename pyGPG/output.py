@@ -19,6 +19,7 @@
 
 
 import sys
+from threading import RLock
 if sys.version_info[0] >= 3:
     _str = str
     _unicode = str
@@ -31,6 +32,12 @@ from pyGPG.status import Status
 from pyGPG.legend import FINGERPRINT_CLASSES
 
 
+# GPGResult._check_param_type() results, the parameters used are
+# mostly the same few lists of the data properties
+_PARAM_CACHE = {}
+_PARAM_CACHE_SIZE = 256
+
+
 def encode(text, enc="UTF-8"):
     """py2, py3 compatibility function"""
     if hasattr(text, 'decode'):
@@ -42,32 +49,196 @@ class GPGResult(object):
     '''GnuPG process result handler'''
 
 
-    def __init__(self, gpg, results, extract_stdout=False):
-        '''Class init function'''
+    def __init__(self, gpg, results, extract_stdout=False, status=None,
+                 lazy=False, timing=None, binary=False):
+        '''Class init function
+
+        @param gpg: the Popen instance that was run
+        @param results: tuple of (stdout, stderr) output
+        @param extract_stdout: boolean, parse stdout as a colon listing
+        @param status: Status instance (optional) already holding the
+                       data parsed from a dedicated status-fd channel
+        @param lazy: boolean, defer the decoding until the first access
+                     to output, stderr_out or failed, and the parsing
+                     until the first access to status, messages or
+                     a data property
+        @param timing: Timing instance (optional) of the gpg run,
+                       the decode and parse durations are added to it
+        @param binary: boolean, stdout is binary data, it is left as is,
+                       only stderr is decoded
+        '''
         self.gpg = gpg
-        self.output = results[0]
-        self.stderr_out = results[1]
-        self.decode_errors = []
-        if isinstance(self.output, bytes):
+        self.timing = timing
+        self._results = results
+        self._extract_stdout = extract_stdout
+        self._binary = binary
+        self._status = status
+        self._decoded = False
+        self._parsed = False
+        # a lazy result may be shared between threads, ie: cached,
+        # the first decoding and parsing is done by a single thread
+        self._lock = RLock()
+        if not lazy:
+            self._parse()
+
+
+    def _decode(self):
+        '''Decodes the gpg output, only run once'''
+        if self._decoded:
+            return
+        with self._lock:
+            if self._decoded:
+                return
+            from pyGPG.metrics import clock
+            start = clock()
             try:
-                self.output = self.output.decode('UTF-8')
-                self.stderr_out = self.stderr_out.decode('UTF-8')
+                self._decode_output()
+            finally:
+                if self.timing is not None:
+                    self.timing.decode += clock() - start
+            # only flagged once all of the decoded state is set
+            self._decoded = True
+
+
+    def _decode_output(self):
+        '''Decodes the gpg stdout and stderr output,
+        stdout is left undecoded for binary results'''
+        self._output, self._stderr_out = self._results[0], self._results[1]
+        self._results = None
+        self._decode_errors = []
+        # set failed default, for use by consumer apps
+        self._failed = False
+        if self._binary:
+            if isinstance(self._stderr_out, bytes):
+                try:
+                    self._stderr_out = self._stderr_out.decode('UTF-8')
+                except UnicodeDecodeError:
+                    self._decode_errors.append("pyGPG.output(): Error decoding gpg stderr with utf-8")
+                    self._decode_errors.append(self._stderr_out)
+                    self._failed = True
+                    return
+        elif isinstance(self._output, bytes):
+            try:
+                self._output = self._output.decode('UTF-8')
+                self._stderr_out = self._stderr_out.decode('UTF-8')
             except UnicodeDecodeError:
-                self.decode_errors.append("pyGPG.output(): Error decoding gpg output with utf-8")
-                self.decode_errors.append(self.output)
-                self.decode_errors.append(self.stderr_out)
-                self.status = Status()
-                self.failed = True
+                self._decode_errors.append("pyGPG.output(): Error decoding gpg output with utf-8")
+                self._decode_errors.append(self._output)
+                self._decode_errors.append(self._stderr_out)
+                self._failed = True
+                return
+        self._stderr_out = _unicode(self._stderr_out)
+        self._stderr_out = self._stderr_out.split('\n')
+
+
+    def _parse(self):
+        '''Parses the decoded gpg output into the status data,
+        only run once'''
+        if self._parsed:
+            return
+        with self._lock:
+            if self._parsed:
                 return
-        self.stderr_out = _unicode(self.stderr_out)
-        self.stderr_out = self.stderr_out.split('\n')
-        self.status = Status()
-        if extract_stdout:
-            self.messages = self.status.extract_output(self.output)
+            self._decode()
+            from pyGPG.metrics import clock
+            start = clock()
+            try:
+                self._parse_output()
+            finally:
+                if self.timing is not None:
+                    self.timing.parse += clock() - start
+            self._parsed = True
+
+
+    def _parse_output(self):
+        '''Parses the decoded gpg output into the status data'''
+        if self._status is None:
+            self._status = Status()
+        if self._decode_errors:
+            self._messages = []
+        elif self._extract_stdout:
+            self._messages = self._status.extract_output(self._output)
         else:
-            self.messages = self.status.extract_data(self.stderr_out)
-        # set failed default, for use by consumer apps
-        self.failed = False
+            self._messages = self._status.extract_data(self._stderr_out)
+
+
+    @property
+    def output(self):
+        '''The decoded stdout output of the gpg run'''
+        self._decode()
+        return self._output
+
+
+    @output.setter
+    def output(self, value):
+        self._decode()
+        self._output = value
+
+
+    @property
+    def stderr_out(self):
+        '''The list of decoded stderr lines of the gpg run'''
+        self._decode()
+        return self._stderr_out
+
+
+    @stderr_out.setter
+    def stderr_out(self, value):
+        self._decode()
+        self._stderr_out = value
+
+
+    @property
+    def decode_errors(self):
+        '''The list of output decoding errors'''
+        self._decode()
+        return self._decode_errors
+
+
+    @decode_errors.setter
+    def decode_errors(self, value):
+        self._decode()
+        self._decode_errors = value
+
+
+    @property
+    def failed(self):
+        '''True if the output failed to decode,
+        also settable by consumer apps'''
+        self._decode()
+        return self._failed
+
+
+    @failed.setter
+    def failed(self, value):
+        self._decode()
+        self._failed = value
+
+
+    @property
+    def status(self):
+        '''The Status instance holding the parsed data'''
+        self._parse()
+        return self._status
+
+
+    @status.setter
+    def status(self, value):
+        self._parse()
+        self._status = value
+
+
+    @property
+    def messages(self):
+        '''The list of gpg's stderr messages that were not status data'''
+        self._parse()
+        return self._messages
+
+
+    @messages.setter
+    def messages(self, value):
+        self._parse()
+        self._messages = value
 
 
     @property
@@ -156,6 +327,22 @@ class GPGResult(object):
         return results
 
 
+    @property
+    def keyring(self):
+        '''Groups the colon listing data into a Keyring of Key's
+        with their subkeys, user ids and fingerprints, indexed by
+        keyid, fingerprint and email address
+
+        @rtype Keyring
+        '''
+        data = self.status.data
+        key = (id(data), len(data))
+        if getattr(self, '_keyring', (None, None))[0] != key:
+            from pyGPG.keyring import Keyring
+            self._keyring = (key, Keyring.from_records(self.status.data))
+        return self._keyring[1]
+
+
     @property
     def returncode(self):
         '''The return code of the gpg process that was run
@@ -191,8 +378,7 @@ class GPGResult(object):
         if status_type is None:
             return [(x.name, x._fields) for x in self.status.data]
         status_type = self._check_param_type(status_type)
-        return [(x.name, x._fields)
-                for x in self.status.data if x.name in status_type]
+        return [(x.name, x._fields) for x in self.status.find(status_type)]
 
 
     def get_data(self, fields=None, status_type=None):
@@ -202,31 +388,34 @@ class GPGResult(object):
         @param staus_type: string or list of class name strings to search for
         @rtype list: of (type name,field,data) tuples
         '''
-        if status_type is None:
-            status_type = [x.name for x in self.status.data]
-        else:
+        if status_type is not None:
             status_type = self._check_param_type(status_type)
         if fields is None:
-            return [x for x in self.status.data if x.name in status_type]
-        else:
-            fields = self._check_param_type(fields)
-
-        results = []
-        for x in self.status.data:
-            if x.name in status_type:
-                for f in x._fields:
-                    if f in fields:
-                        results.append((x.name, f, getattr(x, f)))
-        return results
+            if status_type is None:
+                return list(self.status.data)
+            return self.status.find(status_type)
+        fields = self._check_param_type(fields)
+        return self.status.find_fields(fields, status_type)
 
 
     @staticmethod
     def _check_param_type(param):
         """internal function that validates the repos parameter,
-        converting a string to a list[string] if it is not already a list.
+        converting a string to a tuple(string) if it is not already a list.
         produces and error message if it is any other type
-        returns repos as list always"""
+        returns repos as a tuple always, the result is cached"""
+        if not isinstance(param, _str):
+            # else assume it is an iterable, if not it will error
+            param = tuple(param)
+        try:
+            return _PARAM_CACHE[param]
+        except KeyError:
+            pass
         if isinstance(param, _str):
-            param = [param]
-        # else assume it is an iterable, if not it will error
-        return [encode(i) for i in param]
+            checked = (encode(param),)
+        else:
+            checked = tuple(encode(i) for i in param)
+        if len(_PARAM_CACHE) >= _PARAM_CACHE_SIZE:
+            _PARAM_CACHE.clear()
+        _PARAM_CACHE[param] = checked
+        return checked
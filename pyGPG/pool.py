@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG GPGPool
+####################
+# File:       pool.py
+#
+#             Python class for running many gpg
+#             subprocesses concurrently
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles running many gnupg processes concurrently.'''
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+
+from pyGPG.gpg import GPG
+
+
+class GPGPool(object):
+    '''Bounded worker pool of gpg subprocesses
+
+    Each worker thread only waits on its own gpg subprocess, the real
+    work is done by gpg, so the throughput scales with the number of
+    cores instead of being stuck on one serial subprocess loop.
+    '''
+
+    def __init__(self, config, workers=None, max_pending=None, logger=None):
+        '''Class init function
+
+        @param config: GPGConfig config instance to use
+        @param workers: int (optional) the number of concurrent gpg
+                        processes, defaults to the number of cpus
+        @param max_pending: int (optional) the number of submitted, but
+                            not yet finished jobs allowed before submit()
+                            blocks, defaults to twice the workers
+        @param logger: logger instance (optional)
+        '''
+        self.gpg = GPG(config, logger=logger)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 2
+        self._slots = BoundedSemaphore(self.max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+    def submit(self, method, *args, **kwargs):
+        '''Queues a GPG method call to be run by the pool.
+        Blocks while max_pending jobs are already queued or running.
+
+        @param method: string, the GPG method name to call,
+                       ie: 'runGPG', 'verify', 'decrypt', 'fingerprint'
+        @param args, kwargs: the parameters to pass to the GPG method
+        @rtype concurrent.futures.Future: of a GPGResult
+        '''
+        func = getattr(self.gpg, method)
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+
+    def _release(self, future):
+        '''Frees a job slot once its gpg run is done'''
+        self._slots.release()
+
+
+    def runGPG(self, task=None, inputtxt=None, inputfile=None,
+               outputfile=None):
+        '''Queues a GPG.runGPG() call, see it for the parameters
+
+        @rtype concurrent.futures.Future: of a GPGResult
+        '''
+        return self.submit('runGPG', task, inputtxt, inputfile, outputfile)
+
+
+    def map(self, method, *iterables):
+        '''Runs the GPG method for each set of parameters, in the same
+        fashion as the map() builtin.  The parameters are consumed lazily,
+        at most max_pending jobs are queued at any one time.
+
+        @param method: string, the GPG method name to call
+        @param iterables: one iterable per positional parameter
+        @rtype generator: of GPGResult's in the order of the parameters
+        '''
+        pending = deque()
+        for args in zip(*iterables):
+            while len(pending) >= self.max_pending:
+                yield pending.popleft().result()
+            pending.append(self.submit(method, *args))
+        while pending:
+            yield pending.popleft().result()
+
+
+    def shutdown(self, wait=True):
+        '''Shuts down the pool's worker threads
+
+        @param wait: boolean, wait for the queued jobs to finish
+        '''
+        self._executor.shutdown(wait=wait)
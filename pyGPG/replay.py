@@ -0,0 +1,206 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG replay
+####################
+# File:       replay.py
+#
+#             Python classes recording gpg runs to a corpus
+#             and replaying them without running gpg
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles pyGPG's record and replay gpg execution backends.
+
+A backend is set as GPG.backend, it is handed the complete gpg command
+line and input and returns the (process, (stdout, stderr)) of the run:
+
+    gpg = GPG(config, backend=RecordingBackend(Corpus('runs.jsonl')))
+    gpg.verify(signed)   # runs gpg, saves the run
+
+    gpg = GPG(config, backend=ReplayBackend(Corpus('runs.jsonl')))
+    gpg.verify(signed)   # no gpg process, same GPGResult
+'''
+
+import base64
+import hashlib
+import json
+import os
+from subprocess import Popen, PIPE
+from threading import Lock
+
+
+def input_digest(inputtxt):
+    '''Returns the digest identifying the input of a gpg run
+
+    @param inputtxt: bytes
+    @rtype string: the sha256 hex digest
+    '''
+    return hashlib.sha256(inputtxt or b'').hexdigest()
+
+
+class ReplayMiss(LookupError):
+    '''There is no recorded run for the command line and input'''
+
+
+class ReplayedProcess(object):
+    '''Stands in for the Popen instance of a replayed gpg run'''
+
+    def __init__(self, args, returncode):
+        self.args = args
+        self.returncode = returncode
+        self.pid = None
+
+
+    def poll(self):
+        return self.returncode
+
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+class Corpus(object):
+    '''The recorded gpg runs, indexed by command line and input digest.
+    Saved as json lines, one run per line, stdout and stderr base64
+    encoded, so the file can simply be appended to.'''
+
+
+    def __init__(self, path=None, match_command=False):
+        '''Class init function
+
+        @param path: string (optional) the json lines file to load
+                     and append the new runs to, in memory only if None
+        @param match_command: boolean, also match the gpg executable,
+                              by default only its arguments are matched
+        '''
+        self.path = path
+        self.match_command = match_command
+        self.runs = {}
+        self._lock = Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+
+    def __len__(self):
+        return len(self.runs)
+
+
+    def key(self, args, digest):
+        '''Returns the lookup key of a run'''
+        if not self.match_command:
+            args = args[1:]
+        return (tuple(args), digest)
+
+
+    def load(self, path):
+        '''Loads the runs of a json lines file, later runs of the
+        same command line and input replace the earlier ones
+
+        @param path: string
+        '''
+        with open(path) as corpus:
+            for line in corpus:
+                if line.strip():
+                    run = json.loads(line)
+                    self.runs[self.key(run['argv'], run['stdin'])] = run
+
+
+    def add(self, args, inputtxt, results, returncode):
+        '''Adds a run, appending it to the corpus file if any
+
+        @param args: list of the gpg command line arguments
+        @param inputtxt: bytes, what was sent to gpg's stdin
+        @param results: tuple of (stdout, stderr) bytes
+        @param returncode: int
+        @rtype dict: the run record
+        '''
+        run = {
+            'argv': list(args),
+            'stdin': input_digest(inputtxt),
+            'stdout': base64.b64encode(results[0] or b'').decode('ascii'),
+            'stderr': base64.b64encode(results[1] or b'').decode('ascii'),
+            'returncode': returncode,
+        }
+        with self._lock:
+            self.runs[self.key(args, run['stdin'])] = run
+            if self.path:
+                with open(self.path, 'a') as corpus:
+                    corpus.write(json.dumps(run, sort_keys=True) + '\n')
+        return run
+
+
+    def find(self, args, inputtxt):
+        '''Returns the recorded run of the command line and input
+
+        @param args: list of the gpg command line arguments
+        @param inputtxt: bytes
+        @rtype dict: the run record or None
+        '''
+        return self.runs.get(self.key(args, input_digest(inputtxt)))
+
+
+class PopenBackend(object):
+    '''Runs gpg as a subprocess'''
+
+    def run(self, args, inputtxt, env=None):
+        '''Runs gpg
+
+        @param args: list of the gpg command line arguments
+        @param inputtxt: bytes to send to gpg's stdin
+        @param env: dict (optional) of the gpg environment
+        @rtype tuple: (Popen instance, (stdout, stderr))
+        '''
+        gpg = Popen(args, stdin=PIPE, stdout=PIPE, stderr=PIPE, env=env)
+        results = gpg.communicate(inputtxt)
+        return (gpg, results)
+
+
+class RecordingBackend(object):
+    '''Runs gpg through another backend, adding each run to a corpus'''
+
+    def __init__(self, corpus, backend=None):
+        '''Class init function
+
+        @param corpus: Corpus instance to add the runs to
+        @param backend: the backend (optional) running gpg,
+                        defaults to PopenBackend
+        '''
+        self.corpus = corpus
+        self.backend = backend or PopenBackend()
+
+
+    def run(self, args, inputtxt, env=None):
+        '''See PopenBackend.run()'''
+        gpg, results = self.backend.run(args, inputtxt, env)
+        self.corpus.add(args, inputtxt, results, gpg.returncode)
+        return (gpg, results)
+
+
+class ReplayBackend(object):
+    '''Serves the gpg runs of a corpus, in process'''
+
+    def __init__(self, corpus):
+        '''Class init function
+
+        @param corpus: Corpus instance of the recorded runs
+        '''
+        self.corpus = corpus
+
+
+    def run(self, args, inputtxt, env=None):
+        '''Replays the recorded run, see PopenBackend.run()
+
+        @raises ReplayMiss: when the run was not recorded
+        '''
+        run = self.corpus.find(args, inputtxt)
+        if run is None:
+            raise ReplayMiss('pyGPG.replay: no recorded run of: %s' % args)
+        results = (base64.b64decode(run['stdout']),
+                   base64.b64decode(run['stderr']))
+        return (ReplayedProcess(args, run['returncode']), results)
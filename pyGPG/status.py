@@ -33,6 +33,7 @@ else:
 # that way we only retrieve the class(es) we actually need
 from pyGPG import legend
 
+from pyGPG.columns import ColumnStore
 from pyGPG.legend import (
     GPG_IDENTIFIER,
     PYGPG_IDENTIFIER,
@@ -41,17 +42,171 @@ from pyGPG.legend import (
 )
 
 
+class _StatusTable(dict):
+    '''The keyword dispatch table used to parse the status messages,
+    {keyword: (record class, number of fields)}.  The entries are
+    added on the first use of each keyword, so only the record
+    classes actually seen get created.'''
+
+    _names = frozenset(name for (name, fields, msg) in legend.CLASSES)
+
+    def __missing__(self, key):
+        if key not in self._names:
+            raise KeyError(key)
+        status = getattr(legend, key)
+        entry = self[key] = (status, len(status._fields))
+        return entry
+
+# the number of query results kept by each Status
+_QUERY_CACHE_SIZE = 64
+
+# more than the number of fields of any legend class,
+# see Status.find_fields()
+_MAX_FIELDS = 256
+
+# the record class and field count for each keyword.
+# The field count doubles as the splitting rule, the last field
+# (ie: <username>) keeps any remaining spaces.
+STATUS_TABLE = _StatusTable()
+
+
 class Status(object):
     '''Parses all status messages and
     puts the relavent info into the various lists'''
 
 
-    def __init__(self):
-        '''Class init function'''
+    def __init__(self, columnar=False):
+        '''Class init function
+
+        @param columnar: boolean, keep the data in a compact ColumnStore
+                         instead of a list of namedtuple's
+        '''
         self.messages = []
         self.status_msgs = []
-        self.data = []
+        self.data = ColumnStore() if columnar else []
         self.errors = []
+        # (data, length, last record, {name: [data index, ...]},
+        #  {query: results}) of the indexed data
+        self._index = None
+
+
+    def invalidate(self):
+        '''Drops the data index, it is rebuilt on the next query.
+        Only needed after replacing records in place, other than the
+        last one, appending, inserting or replacing the data list
+        are detected automatically.'''
+        self._index = None
+
+
+    def _indexes(self):
+        '''Builds the record name index of the data on first use,
+        or after the data changed.  The index holds a reference to
+        the data it was built from, so a new data list can not be
+        mistaken for it.
+
+        @rtype tuple: ({name: [data index, ...]}, {query: results})
+        '''
+        data = self.data
+        index = self._index
+        if (index is None or index[0] is not data or index[1] != len(data)
+                or (data and index[2] != data[-1])):
+            if isinstance(data, ColumnStore):
+                names = (cls.name for cls in data.classes())
+            else:
+                names = (record.name for record in data)
+            by_name = {}
+            for idx, name in enumerate(names):
+                try:
+                    by_name[name].append(idx)
+                except KeyError:
+                    by_name[name] = [idx]
+            # built apart, then swapped in, for concurrent readers
+            index = (data, len(data), data[-1] if data else None,
+                     by_name, {})
+            self._index = index
+        return index[3:]
+
+
+    @staticmethod
+    def _remember(queries, query, results):
+        '''Saves a query's results, the saved results are all
+        dropped once there are _QUERY_CACHE_SIZE of them'''
+        if len(queries) >= _QUERY_CACHE_SIZE:
+            queries.clear()
+        queries[query] = results
+
+
+    def find(self, names):
+        '''Returns the records of the named types in data order
+
+        @param names: tuple of record class name strings
+        @rtype list: of legend class instances
+        '''
+        by_name, queries = self._indexes()
+        query = ('find', names)
+        try:
+            return list(queries[query])
+        except KeyError:
+            pass
+        names = set(names)
+        found = []
+        for name in names:
+            found.extend(by_name.get(name, ()))
+        if len(names) > 1:
+            found.sort()
+        data = self.data
+        results = [data[idx] for idx in found]
+        self._remember(queries, query, results)
+        return list(results)
+
+
+    def find_fields(self, fields, names=None):
+        '''Returns the field data of the records, in data then
+        record field order
+
+        @param fields: tuple of field name strings
+        @param names: tuple (optional) of record class name strings
+                      to limit the search to
+        @rtype list: of (type name, field, data) tuples
+        '''
+        by_name, queries = self._indexes()
+        query = ('fields', fields, names)
+        try:
+            return list(queries[query])
+        except KeyError:
+            pass
+        data = self.data
+        columnar = isinstance(data, ColumnStore)
+        wanted = set(fields)
+        # the (name, field, value) results of each record class and
+        # field position, with their [idx * _MAX_FIELDS + position]
+        # data order keys
+        keys = []
+        results = []
+        groups = 0
+        for name in (by_name if names is None else set(names)):
+            indexes = by_name.get(name)
+            if not indexes:
+                continue
+            # the field positions are the same for all the records
+            # of a class
+            for pos, field in enumerate(data[indexes[0]]._fields):
+                if field not in wanted:
+                    continue
+                if columnar:
+                    value = data.value
+                    results.extend([(name, field, value(idx, pos))
+                                    for idx in indexes])
+                else:
+                    results.extend([(name, field, data[idx][pos])
+                                    for idx in indexes])
+                keys.extend([idx * _MAX_FIELDS + pos for idx in indexes])
+                groups += 1
+        if groups > 1:
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            results = [results[x] for x in order]
+        self._remember(queries, query, results)
+        return list(results)
 
 
     def extract_data(self, messages):
@@ -63,13 +218,14 @@ class Status(object):
         '''
         stderr_msgs = []
         self.messages = messages
+        process_status_msg = self.process_status_msg
         for msg in messages:
-            if self.isinstance_msg(GPG_IDENTIFIER, msg):
-                self.process_status_msg(msg)
+            if msg.startswith(GPG_IDENTIFIER):
+                process_status_msg(msg)
             # pyGPG version info is first in the list
-            elif self.isinstance_msg(PYGPG_IDENTIFIER, msg):
+            elif msg.startswith(PYGPG_IDENTIFIER):
                 self.process_pygpg_msg(msg)
-            elif self.isinstance_msg(GPG_VER_IDENTFIER, msg):
+            elif msg.startswith(GPG_VER_IDENTFIER):
                 self.process_gpg_ver(messages[1:])
                 break
             else:
@@ -77,9 +233,28 @@ class Status(object):
         return stderr_msgs
 
 
+    def extract_line(self, msg):
+        '''Incremental, single message version of extract_data()
+        for use while gpg is still running, such as when reading
+        a dedicated status-fd channel one line at a time.
+
+        @param msg: string message to parse
+        @rtype string: msg if it is not a status message, else None
+        '''
+        if msg.startswith(GPG_IDENTIFIER):
+            self.process_status_msg(msg)
+        elif msg.startswith(PYGPG_IDENTIFIER):
+            self.process_pygpg_msg(msg)
+        else:
+            self.messages.append(msg)
+            return msg
+        return None
+
+
     @staticmethod
     def isinstance_msg(identifier, msg):
-        '''Class specific message type comparision function
+        '''Class specific message type comparision function,
+        extract_data() uses str.startswith() directly
 
         @param identifier: string
         @param msg: string
@@ -98,34 +273,35 @@ class Status(object):
         # discard the *_IDENTIFIER
         # we are not yet spliting the actual data
         alerts = []
-        parts = msg.split(' ', 2)[1:]
-        key = parts.pop(0)
+        parts = msg.split(' ', 2)
+        key = parts[1] if len(parts) > 1 else ''
         try:
-            status = getattr(legend, key)
-        except AttributeError:
+            status, num_fields = STATUS_TABLE[key]
+        except KeyError:
             alerts.append(
                 (self.errors, [PYGPG_IDENTIFIER, 'PYGPG_ATTRIBUTE_ERROR',
                                legend, key]))
-            return (None, parts, alerts)
+            return (None, parts[2:], alerts)
         # need to handle <username> fields that would split
         # into many parts instead of just the one
-        num_fields = len(status._fields)
-        if num_fields != len(parts):
-            #print 'field parts', parts
-            if parts is not [] and len(parts) == 1:
-                parts = parts[0].split(' ', num_fields - 1)
-            missing = num_fields - len(parts)
-            #print num_fields,missing, 'parts', parts
-            while missing > 0:
-                parts.append(None)
-                missing -= 1
-            if missing < 0:  # uh-oh too much info
-                alerts.append(
-                    (self.errors, [PYGPG_IDENTIFIER, 'PYGPG_UNEXPECTED_DATA',
-                                   key, str(status._fields), str(parts[missing:])]))
-                # it's being logged, so trim off the extra
-                # to prevent a traceback
-                parts = parts[:missing]
+        if len(parts) < 3:
+            parts = []
+        elif num_fields == 0:
+            # no fields, all of the data is unexpected, split
+            # on every space for the PYGPG_UNEXPECTED_DATA message
+            parts = parts[2].split(' ')
+        else:
+            parts = parts[2].split(' ', num_fields - 1)
+        missing = num_fields - len(parts)
+        if missing > 0:
+            parts.extend([None] * missing)
+        elif missing < 0:  # uh-oh too much info
+            alerts.append(
+                (self.errors, [PYGPG_IDENTIFIER, 'PYGPG_UNEXPECTED_DATA',
+                               key, str(status._fields), str(parts[missing:])]))
+            # it's being logged, so trim off the extra
+            # to prevent a traceback
+            parts = parts[:missing]
         return (status, parts, alerts)
 
 
@@ -145,6 +321,35 @@ class Status(object):
         return
 
 
+    def split_files(self):
+        '''Splits the data of a multi-file gpg run (--verify-files, ...)
+        into one Status per file, using the FILE_START, FILE_DONE
+        brackets.  A new FILE_START also ends the previous file, as gpg
+        does not send a FILE_DONE for a file it failed to open.  The
+        records outside of any file's brackets are kept under a None
+        filename.
+
+        @rtype list: of (filename, Status) tuples in gpg's processing order
+        '''
+        files = []
+        current = None
+        unbracketed = None
+        for record in self.data:
+            if record.name == 'FILE_START':
+                current = Status(isinstance(self.data, ColumnStore))
+                files.append((record.filename, current))
+            if current is not None:
+                current.data.append(record)
+                if record.name == 'FILE_DONE':
+                    current = None
+            else:
+                if unbracketed is None:
+                    unbracketed = Status(isinstance(self.data, ColumnStore))
+                    files.append((None, unbracketed))
+                unbracketed.data.append(record)
+        return files
+
+
     def process_pygpg_msg(self, message=None, parts=None, target=None):
         '''Pygpg message processing function
 
@@ -236,25 +441,54 @@ class Status(object):
         @rtype None
         '''
         self.status_msgs.append(msg)
-        parts = msg.split(':')
-        key = parts.pop(0).upper()
-        #print("STATUS: key", key, ", parts:", parts)
-
-        if key in COLON_IDENTIFIERS:
-            status = getattr(legend, key)
-            length_difference = len(parts) - len(status._fields)
-
-            if length_difference > 0:
-                # Output has more fields than our library.
-                # Library needs to be updated with new fields.
-                parts = parts[:-length_difference]
-            elif length_difference < 0:
-                # Output is from an earlier version of gpg.
-                # We will set as many fields as possible. Rest empty.
-                parts.extend(-length_difference * [''])
-
-            # Number of fields in parts is equal to status class now.
-            # print status._make(parts)
-            self.data.append(status._make(parts))
-            return None
-        return msg
+        record = parse_colon_line(msg)
+        if record is None:
+            return msg
+        self.data.append(record)
+        return None
+
+
+    @staticmethod
+    def iter_colon_listing(lines):
+        '''Parses a colon listing one line at a time, as it is read,
+        without keeping the raw lines or the records.
+
+        @param lines: iterable of text or bytes lines
+        @rtype generator: of legend colon record class instances
+        '''
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode('UTF-8', 'replace')
+            record = parse_colon_line(line.rstrip('\r\n'))
+            if record is not None:
+                yield record
+
+
+def parse_colon_line(msg):
+    '''Parses one colon listing line into its record
+
+    @param msg: string
+    @rtype legend colon record class instance or None if msg
+           is not a known colon listing record
+    '''
+    parts = msg.split(':')
+    key = parts.pop(0).upper()
+    #print("STATUS: key", key, ", parts:", parts)
+
+    if key in COLON_IDENTIFIERS:
+        status = getattr(legend, key)
+        length_difference = len(parts) - len(status._fields)
+
+        if length_difference > 0:
+            # Output has more fields than our library.
+            # Library needs to be updated with new fields.
+            parts = parts[:-length_difference]
+        elif length_difference < 0:
+            # Output is from an earlier version of gpg.
+            # We will set as many fields as possible. Rest empty.
+            parts.extend(-length_difference * [''])
+
+        # Number of fields in parts is equal to status class now.
+        # print status._make(parts)
+        return status._make(parts)
+    return None
@@ -0,0 +1,222 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG streams
+####################
+# File:       streams.py
+#
+#             Chunked pipe I/O helpers for streaming data
+#             to and from a gpg subprocess
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles pyGPG's chunked gpg pipe I/O.'''
+
+import errno
+import os
+import sys
+
+try:
+    from mmap import mmap
+except ImportError:
+    mmap = None
+
+if sys.version_info[0] >= 3:
+    _str = str
+    _unicode = str
+else:
+    _str = basestring
+    _unicode = unicode
+
+
+# the size of each chunk read from, or written to a gpg pipe
+CHUNK_SIZE = 64 * 1024
+
+
+# the in memory binary buffers passed to gpg as they are
+BUFFER_TYPES = (bytes, bytearray, memoryview) + ((mmap,) if mmap else ())
+
+
+def is_buffer(source):
+    '''Checks if the source is a bytes like buffer, bytes, bytearray,
+    memoryview or mmap, which can be written to gpg without a copy
+
+    @param source: object
+    @rtype bool
+    '''
+    return isinstance(source, BUFFER_TYPES)
+
+
+def is_stream(source):
+    '''Checks if the source is something to be fed to gpg in chunks,
+    a file like object or an iterable of chunks, rather than a single
+    block of text or a buffer
+
+    @param source: object
+    @rtype bool
+    '''
+    if source is None or isinstance(source, _str) or is_buffer(source):
+        return False
+    return hasattr(source, 'read') or hasattr(source, '__iter__')
+
+
+def fileno_of(source):
+    '''Returns the file descriptor of a raw fd or a real, open file,
+    None for anything else (text, buffers, BytesIO, iterables, ...)
+
+    @param source: object
+    @rtype int or None
+    '''
+    if isinstance(source, bool):
+        return None
+    if isinstance(source, int):
+        return source
+    if is_buffer(source) or isinstance(source, _str):
+        # mmap.fileno() is not the data's position
+        return None
+    fileno = getattr(source, 'fileno', None)
+    if fileno is None:
+        return None
+    try:
+        return fileno()
+    except (AttributeError, IOError, OSError, ValueError):
+        # io.UnsupportedOperation, BytesIO and co
+        return None
+
+
+def buffer_size(source):
+    '''Returns the size in bytes of a text or buffer input
+
+    @param source: text or bytes like buffer
+    @rtype int
+    '''
+    if not source:
+        return 0
+    if isinstance(source, _unicode):
+        return len(source.encode('UTF-8'))
+    return memoryview(source).nbytes
+
+
+def to_bytes(chunk, enc='UTF-8'):
+    '''Returns the chunk as bytes ready to be written to a pipe
+
+    @param chunk: bytes or text string
+    @rtype bytes
+    '''
+    if isinstance(chunk, _unicode):
+        return chunk.encode(enc)
+    return chunk
+
+
+def iter_chunks(source, chunk_size=CHUNK_SIZE):
+    '''Generates the bytes chunks to send to gpg's stdin
+
+    @param source: a file like object, a raw fd, text, a bytes like
+                   buffer or an iterable of text or bytes chunks
+    @param chunk_size: int, the read size used for file like objects
+    @rtype generator: of bytes
+    '''
+    if source is None:
+        return
+    if isinstance(source, _str):
+        if source:
+            yield to_bytes(source)
+    elif is_buffer(source):
+        # slices of a memoryview do not copy the data
+        view = memoryview(source).cast('B')
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+    elif isinstance(source, int) and not isinstance(source, bool):
+        while True:
+            chunk = os.read(source, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield to_bytes(chunk)
+    else:
+        for chunk in source:
+            if chunk:
+                yield to_bytes(chunk)
+
+
+def sink_writer(sink):
+    '''Returns the callable used to hand each output chunk to the sink
+
+    @param sink: a callable or a file like object with a write()
+    @rtype callable
+    '''
+    if hasattr(sink, 'write'):
+        return sink.write
+    if callable(sink):
+        return sink
+    raise TypeError("pyGPG.streams: sink must be callable "
+                    "or have a write() method, got: %r" % sink)
+
+
+def feed(pipe, source, chunk_size=CHUNK_SIZE):
+    '''Writes the source to the pipe one chunk at a time,
+    then closes the pipe so gpg sees the end of its input.
+
+    @param pipe: the writable pipe (gpg's stdin)
+    @param source: see iter_chunks()
+    @param chunk_size: int
+    @rtype int: the number of bytes written
+    '''
+    written = 0
+    try:
+        for chunk in iter_chunks(source, chunk_size):
+            pipe.write(chunk)
+            written += len(chunk)
+    except (IOError, OSError) as error:
+        # gpg quit reading (bad input, wrong passphrase, ...),
+        # its status output will tell the consumer why
+        if error.errno not in (errno.EPIPE, errno.EINVAL):
+            raise
+    finally:
+        try:
+            pipe.close()
+        except (IOError, OSError):
+            pass
+    return written
+
+
+def pump(pipe, sink, chunk_size=CHUNK_SIZE):
+    '''Reads the pipe one chunk at a time, handing each chunk
+    to the sink as soon as it is available.
+
+    @param pipe: the readable pipe (gpg's stdout)
+    @param sink: see sink_writer()
+    @param chunk_size: int
+    @rtype int: the number of bytes read
+    '''
+    write = sink_writer(sink)
+    read = getattr(pipe, 'read1', pipe.read)
+    total = 0
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        write(chunk)
+        total += len(chunk)
+    pipe.close()
+    return total
+
+
+def collect(pipe, target, chunk_size=CHUNK_SIZE):
+    '''Reads the pipe to its end, appending the chunks to target
+
+    @param pipe: the readable pipe
+    @param target: list
+    @rtype int: the number of bytes read
+    '''
+    return pump(pipe, target.append, chunk_size)
@@ -0,0 +1,392 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+####################
+# pyGPG TreeVerifier
+####################
+# File:       tree.py
+#
+#             Python classes for the incremental verification
+#             of directory trees of detached signed files
+#
+# Copyright:
+#             (c) 2012 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+'''Handles pyGPG's incremental directory tree verification.
+
+Each data file of the tree is signed by a detached signature next to
+it, ie: Manifest and Manifest.asc.  The verdicts are kept in a state
+file, the later passes only send the new or changed files to gpg:
+
+    verifier = TreeVerifier(config, state_file='tree-state.json')
+    report = verifier.verify('/var/db/repos/gentoo')
+    print(report.summary)
+    for signature in report.failed:
+        print(signature, report.results[signature].verdict)
+'''
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+from pyGPG.cache import file_digest, keyring_token
+from pyGPG.gpg import GPG
+from pyGPG.metrics import clock
+from pyGPG.pool import GPGPool
+
+# os.replace() is atomic on all platforms, os.rename() only on posix
+_replace = getattr(os, 'replace', os.rename)
+
+# the state file format version
+STATE_VERSION = 2
+
+# the signature file suffixes, the data file is the same path without it
+SIGNATURE_SUFFIXES = ('.asc', '.sig')
+
+# the verdicts
+GOOD = 'good'
+BAD = 'bad'
+NO_PUBKEY = 'no-pubkey'
+MISSING_DATA = 'missing-data'
+ERROR = 'error'
+VERDICTS = [GOOD, BAD, NO_PUBKEY, MISSING_DATA, ERROR]
+
+
+def verdict_of(result):
+    '''Returns the verdict of a verify GPGResult
+
+    @param result: GPGResult instance
+    @rtype string: one of VERDICTS
+    '''
+    if result.gpg is None or result.failed:
+        return ERROR
+    if result.verified[0]:
+        return GOOD
+    if result.no_pubkey[0]:
+        return NO_PUBKEY
+    if result.get_data(status_type=['BADSIG']):
+        return BAD
+    return ERROR
+
+
+class FileResult(object):
+    '''The verification of one data file and its signature'''
+
+    __slots__ = ('path', 'signature', 'size', 'mtime', 'sig_size',
+                 'sig_mtime', 'digest', 'fingerprint', 'verdict', 'cached',
+                 'result')
+
+    def __init__(self, path, signature):
+        '''Class init function
+
+        @param path: string, the data file path, relative to the root
+        @param signature: string, the signature file path, relative
+                          to the root
+        '''
+        self.path = path
+        self.signature = signature
+        self.size = None
+        self.mtime = None
+        self.sig_size = None
+        self.sig_mtime = None
+        # the sha256 of the data and signature digests
+        self.digest = None
+        # the signing key's fingerprint, when gpg reported it
+        self.fingerprint = None
+        self.verdict = None
+        # the verdict comes from the state file, gpg was not run
+        self.cached = False
+        # the GPGResult of the gpg run, None when cached
+        self.result = None
+
+
+    def state(self):
+        '''Returns the state file entry of the file
+
+        @rtype dict
+        '''
+        return {'path': self.path, 'size': self.size,
+                'mtime': self.mtime, 'sig_size': self.sig_size,
+                'sig_mtime': self.sig_mtime, 'digest': self.digest,
+                'fingerprint': self.fingerprint, 'verdict': self.verdict}
+
+
+    def __repr__(self):
+        return '<FileResult %s: %s%s>' % (self.signature, self.verdict,
+                                          ' (cached)' if self.cached else '')
+
+
+class TreeReport(object):
+    '''The per file results and the summary of a tree verification'''
+
+    def __init__(self, root):
+        '''Class init function
+
+        @param root: string, the verified directory
+        '''
+        self.root = root
+        # {signature path: FileResult}, in tree walk order, keyed by
+        # the signature as foo.asc and foo.sig both sign foo
+        self.results = OrderedDict()
+        # the signature paths of the state file entries no longer
+        # in the tree
+        self.removed = []
+        # the number of files sent to gpg
+        self.checked = 0
+        self.seconds = 0.0
+
+
+    @property
+    def failed(self):
+        '''The signature paths of the files not verified good
+
+        @rtype list
+        '''
+        return [path for path, result in self.results.items()
+                if result.verdict != GOOD]
+
+
+    @property
+    def summary(self):
+        '''Counts of the files, per verdict and how they were verified
+
+        @rtype dict: {'files': int, 'checked': int, 'cached': int,
+                      'removed': int, 'seconds': float, verdict: int, ...}
+        '''
+        summary = dict((verdict, 0) for verdict in VERDICTS)
+        for result in self.results.values():
+            summary[result.verdict] += 1
+        summary['files'] = len(self.results)
+        summary['checked'] = self.checked
+        summary['cached'] = sum(1 for result in self.results.values()
+                                if result.cached)
+        summary['removed'] = len(self.removed)
+        summary['seconds'] = self.seconds
+        return summary
+
+
+class TreeVerifier(object):
+    '''Verifies the detached signatures of a directory tree,
+    only sending the files changed since the last pass to gpg.
+
+    A file is unchanged when the size and mtime of both the data file
+    and its signature match the state file entry.  A file with a new
+    mtime, but the same content digest, keeps its verdict as well.
+    Any change to the keyring or trustdb re-verifies every file.
+    '''
+
+
+    def __init__(self, config, state_file=None, workers=None,
+                 suffixes=SIGNATURE_SUFFIXES, logger=None):
+        '''Class init function
+
+        @param config: GPGConfig config instance to use
+        @param state_file: string (optional) the json file to keep the
+                           verdicts in, every file is verified if None
+        @param workers: int (optional) the number of concurrent gpg
+                        processes, see GPGPool
+        @param suffixes: tuple of the signature file suffixes
+        @param logger: logger instance (optional)
+        '''
+        self.config = config
+        self.state_file = state_file
+        self.workers = workers
+        self.suffixes = tuple(suffixes)
+        self.logger = logger
+
+
+    def pairs(self, root):
+        '''Walks the tree for the signature files and their data files
+
+        @param root: string, the directory to walk
+        @rtype generator: of (data path, signature path) tuples,
+                          relative to root
+        '''
+        state_file = self.state_file and os.path.abspath(self.state_file)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if not name.endswith(self.suffixes):
+                    continue
+                path = os.path.join(dirpath, name)
+                if os.path.abspath(path) == state_file:
+                    continue
+                signature = os.path.relpath(path, root)
+                yield (os.path.splitext(signature)[0], signature)
+
+
+    def load_state(self, root, token):
+        '''Returns the state file entries, none if the state file is
+        missing, unreadable, of another tree or keyring
+
+        @param root: string, the verified directory
+        @param token: list, the keyring_token() of the verify task
+        @rtype dict: of {signature path: entry dict}
+        '''
+        if not self.state_file:
+            return {}
+        try:
+            with open(self.state_file) as state_file:
+                state = json.load(state_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if (not isinstance(state, dict)
+                or state.get('version') != STATE_VERSION
+                or state.get('root') != os.path.abspath(root)
+                or state.get('keyring') != token):
+            return {}
+        return state.get('files') or {}
+
+
+    def save_state(self, root, token, report):
+        '''Saves the verdicts, a failure to write the state file
+        is ignored.  ERROR verdicts are not saved, those files are
+        retried on the next pass.
+
+        @param root: string, the verified directory
+        @param token: list, the keyring_token() of the verify task
+        @param report: TreeReport instance
+        @rtype boolean: True if saved
+        '''
+        if not self.state_file:
+            return False
+        files = dict((signature, result.state())
+                     for signature, result in report.results.items()
+                     if result.verdict != ERROR)
+        state = {'version': STATE_VERSION, 'root': os.path.abspath(root),
+                 'keyring': token, 'files': files}
+        directory = os.path.dirname(os.path.abspath(self.state_file))
+        try:
+            fd, tmp = tempfile.mkstemp(prefix='.tree-state-', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as state_file:
+                    json.dump(state, state_file, sort_keys=True)
+                _replace(tmp, self.state_file)
+            except Exception:
+                os.unlink(tmp)
+                raise
+        except (IOError, OSError):
+            return False
+        return True
+
+
+    def verify(self, root, full=False):
+        '''Verifies the tree, the unchanged files keep their last verdict
+
+        @param root: string, the directory to verify
+        @param full: boolean, ignore the state file, verify every file
+        @rtype TreeReport
+        '''
+        start = clock()
+        report = TreeReport(root)
+        # json has no tuples, keep the token as the state file has it
+        token = json.loads(json.dumps(
+            keyring_token(GPG(self.config).homedir('verify'))))
+        state = {} if full else self.load_state(root, token)
+        pending = []
+        for path, signature in self.pairs(root):
+            result = report.results[signature] = FileResult(path, signature)
+            if not self._stat(root, result):
+                result.verdict = MISSING_DATA
+                continue
+            entry = state.get(signature)
+            if entry is not None and self._unchanged(result, entry):
+                self._reuse(result, entry)
+                continue
+            result.digest = self._digest(root, result)
+            if result.digest is None:
+                result.verdict = ERROR
+            elif entry is not None and entry.get('digest') == result.digest:
+                # touched, not modified
+                self._reuse(result, entry)
+            else:
+                pending.append(result)
+        report.removed = sorted(set(state) - set(report.results))
+        if pending:
+            self._check(root, pending)
+            report.checked = len(pending)
+        report.seconds = clock() - start
+        self.save_state(root, token, report)
+        if self.logger:
+            self.logger.debug('TreeVerifier.verify(): %s: %s'
+                              % (root, report.summary))
+        return report
+
+
+    @staticmethod
+    def _stat(root, result):
+        '''Sets the size and mtime of the data and signature files
+
+        @rtype boolean: False if the data file is missing
+        '''
+        try:
+            sig_stat = os.stat(os.path.join(root, result.signature))
+            stat = os.stat(os.path.join(root, result.path))
+        except OSError:
+            return False
+        result.size = stat.st_size
+        result.mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+        result.sig_size = sig_stat.st_size
+        result.sig_mtime = getattr(sig_stat, 'st_mtime_ns', sig_stat.st_mtime)
+        return True
+
+
+    @staticmethod
+    def _unchanged(result, entry):
+        '''Checks the file stats against its state file entry'''
+        return (entry.get('verdict') in VERDICTS
+                and entry.get('path') == result.path
+                and (entry.get('size'), entry.get('mtime'),
+                     entry.get('sig_size'), entry.get('sig_mtime')) ==
+                    (result.size, result.mtime, result.sig_size,
+                     result.sig_mtime))
+
+
+    @staticmethod
+    def _reuse(result, entry):
+        '''Takes the verdict of the state file entry'''
+        result.digest = entry.get('digest')
+        result.fingerprint = entry.get('fingerprint')
+        result.verdict = entry.get('verdict')
+        result.cached = True
+
+
+    @staticmethod
+    def _digest(root, result):
+        '''Returns the digest of the data and signature contents
+
+        @rtype string: the sha256 hex digest, None if a file
+                       can not be read
+        '''
+        data = file_digest(os.path.join(root, result.path))
+        signature = file_digest(os.path.join(root, result.signature))
+        if data is None or signature is None:
+            return None
+        return hashlib.sha256((data + signature).encode('ascii')).hexdigest()
+
+
+    def _check(self, root, pending):
+        '''Verifies the files with gpg, in parallel.  One gpg process
+        per file, gpg's --verify-files does not take detached signatures.
+        The state file is the cache, GPG.verify()'s verify cache is
+        bypassed, it would digest the files a second time.
+
+        @param root: string, the verified directory
+        @param pending: list of FileResult's to verify
+        '''
+        files = [[os.path.join(root, result.signature),
+                  os.path.join(root, result.path)] for result in pending]
+        with GPGPool(self.config, self.workers, logger=self.logger) as pool:
+            verified = pool.map('runGPG', ['verify'] * len(files),
+                                [None] * len(files), files)
+            for result, gpg_result in zip(pending, verified):
+                result.result = gpg_result
+                result.verdict = verdict_of(gpg_result)
+                fingerprints = gpg_result.fingerprint
+                if fingerprints:
+                    result.fingerprint = fingerprints[0][2]
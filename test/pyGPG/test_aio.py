@@ -0,0 +1,180 @@
+# File:       test/pyGPG/test_aio.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/aio.py tests
+
+'''
+
+import asyncio
+import os
+
+from pyGPG import __version__
+from pyGPG.aio import AsyncGPG
+from pyGPG.config import GPGConfig
+
+TESTDIR = os.path.dirname(os.path.dirname(__file__))
+
+
+def test_version():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-version')
+    gpg = AsyncGPG(cfg)
+    v = asyncio.run(gpg.version())
+    assert v == {'gpg': '2.1.75', 'pygpg': __version__, 'libcrypt': '1.7.5'}
+
+
+def test_options():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-options')
+    gpg = AsyncGPG(cfg)
+    v = sorted(asyncio.run(gpg.options))
+    assert len(v) == 381
+    assert v[0] == '--agent-program'
+
+
+def test_verify_many():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-verify')
+    gpg = AsyncGPG(cfg)
+
+    async def verify_all():
+        return await asyncio.gather(*[gpg.verify('text %d' % i) for i in range(20)])
+
+    results = asyncio.run(verify_all())
+    assert len(results) == 20
+    assert all(r.verified[0] for r in results)
+    assert results[0].fingerprint == [
+        ('VALIDSIG', 'fingerprint', '884D0847E08005BC1E6DA041A9661AC8014A7CF0')]
+
+
+def test_runGPG_no_input():
+    gpg = AsyncGPG(GPGConfig())
+    v = asyncio.run(gpg.runGPG('verify'))
+    assert v.get_data(status_type='PYGPG_ERROR')[0].error == 'no-input-specified'
+
+
+def test_sign_mode():
+    gpg = AsyncGPG(GPGConfig())
+    v = asyncio.run(gpg.sign('sneaky-sign', 'text'))
+    assert v.get_data(status_type='PYGPG_ERROR')[0].error == 'unsupported-sign-mode'
+
+
+def test_verify_detached():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-verify')
+    gpg = AsyncGPG(cfg)
+    # a signature bigger than a pipe buffer
+    v = asyncio.run(gpg.verify_detached(b'signed text', b'signature' * 100000))
+    assert v.verified[0] is True
+    assert v.timing.args[-2].startswith('-&')
+    v = asyncio.run(gpg.verify_detached(b'signed text', 'nokey signature'))
+    assert v.no_pubkey == (True, '2214D90A014F17CB')
+
+
+def test_verify_files():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-verify-files')
+    gpg = AsyncGPG(cfg)
+    files = ['one.asc', 'two nokey.asc', 'skipped.asc', 'three.asc']
+    v = asyncio.run(gpg.verify_files(files, max_files=3))
+    assert list(v) == files
+    assert v['one.asc'].verified[0] is True
+    assert v['two nokey.asc'].no_pubkey == (True, '2214D90A014F17CB')
+    assert v['skipped.asc'].get_data(status_type='PYGPG_ERROR')[0].error == 'no-file-status'
+    assert v['three.asc'].verified[0] is True
+
+
+def test_listings():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-list-keys')
+    gpg = AsyncGPG(cfg)
+    lookup = asyncio.run(gpg.fingerprints(['0xABB2F2DC74991EE9', '0x2214D90A014F17CB']))
+    assert lookup['0xABB2F2DC74991EE9'].fingerprint == '476935D6D659B4C27B700FEDABB2F2DC74991EE9'
+    assert lookup.missing == []
+
+    async def listing():
+        return [x.name async for x in gpg.iter_listing('list-keys', '0xABB2F2DC74991EE9')]
+
+    assert asyncio.run(listing()) == ['TRU', 'PUB', 'FPR', 'UID', 'SUB', 'FPR']
+
+
+def test_stream_inputs(tmp_path):
+    import io
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-cat')
+    gpg = AsyncGPG(cfg)
+    v = asyncio.run(gpg.decrypt(iter([b'x' * 100000] * 10)))
+    assert v.output == 'x' * 1000000
+    assert v.timing.bytes_in == 1000000
+    v = asyncio.run(gpg.decrypt(io.BytesIO(b'some text')))
+    assert v.output == 'some text'
+    path = tmp_path / 'input'
+    path.write_bytes(b'file text')
+    with open(str(path), 'rb') as source:
+        # handed to gpg, as its stdin or a special filename
+        assert asyncio.run(gpg.decrypt(source)).output == 'file text'
+    with open(str(path), 'rb') as source:
+        assert asyncio.run(gpg.decrypt(inputfile=source)).output == 'file text'
+
+
+def test_status_pipe():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-verify')
+    cfg.options['status_pipe'] = True
+    gpg = AsyncGPG(cfg)
+    v = asyncio.run(gpg.verify(b'signed text'))
+    assert [x.name for x in v.status.data] == ['NEWSIG', 'GOODSIG', 'VALIDSIG', 'TRUST_ULTIMATE']
+    assert len(v.stderr_out) == 3
+
+
+def test_launcher():
+    import pytest
+    from pyGPG.launch import FinishedProcess
+    if not hasattr(os, 'posix_spawn'):
+        pytest.skip('no os.posix_spawn')
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-verify')
+    cfg.options['launcher'] = 'posix_spawn'
+    v = asyncio.run(AsyncGPG(cfg).verify(b'signed text'))
+    assert isinstance(v.gpg, FinishedProcess)
+    assert v.verified[0] is True
+
+
+def test_caches(tmp_path):
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-verify')
+    cfg.options['verify_cache_size'] = 4
+    cfg.options['key_cache_size'] = 4
+    cfg.options['tasks']['verify'] = ['--homedir', str(tmp_path)]
+    gpg = AsyncGPG(cfg)
+
+    async def verify():
+        v = await gpg.verify_detached(b'signed text', b'signature')
+        assert await gpg.verify_detached(b'signed text', b'signature') is v
+        signed = tmp_path / 'signed'
+        signed.write_bytes(b'clearsigned text')
+        v = await gpg.verify(inputfile=str(signed))
+        assert await gpg.verify(inputfile=str(signed)) is v
+        assert await gpg.verify(b'clearsigned text') is not v
+
+    asyncio.run(verify())
+    assert (gpg.verify_cache.hits, gpg.verify_cache.misses) == (2, 3)
+    cfg.options['gpg_command'] = os.path.join(TESTDIR, 'gpg-list-keys')
+    cfg.options['tasks']['fingerprint'] = ['--homedir', str(tmp_path), '--with-colons']
+
+    async def fingerprint():
+        v = await gpg.fingerprint('0xABB2F2DC74991EE9')
+        assert await gpg.fingerprint('0xABB2F2DC74991EE9') is v
+
+    asyncio.run(fingerprint())
+    assert gpg.key_cache.hits == 1
@@ -0,0 +1,248 @@
+# File:       test/pyGPG/test_cache.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/cache.py tests
+
+'''
+
+import os
+import time
+
+from pyGPG.cache import LRUCache, ProbeCache, binary_token, keyring_token
+from pyGPG.config import GPGConfig
+from pyGPG.gpg import GPG
+
+GPG_LIST_KEYS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-list-keys')
+GPG_VERIFY = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-verify')
+
+
+def test_lru():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache) == 2
+
+
+def test_lru_ttl():
+    cache = LRUCache(2, ttl=0.05)
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert (cache.hits, cache.misses, cache.expired) == (1, 1, 1)
+
+
+def test_keyring_token(tmp_path):
+    token = keyring_token(str(tmp_path))
+    assert token == keyring_token(str(tmp_path))
+    (tmp_path / 'pubring.kbx').write_bytes(b'keys')
+    token2 = keyring_token(str(tmp_path))
+    assert token2 != token
+    (tmp_path / 'pubring.kbx').write_bytes(b'more keys')
+    assert keyring_token(str(tmp_path)) != token2
+
+
+def test_key_cache(tmp_path):
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_LIST_KEYS
+    cfg.options['key_cache_size'] = 4
+    cfg.options['tasks']['fingerprint'] = ['--homedir', str(tmp_path), '--with-colons']
+    (tmp_path / 'pubring.kbx').write_bytes(b'keys')
+    gpg = GPG(cfg)
+    v = gpg.fingerprint('0xABB2F2DC74991EE9')
+    assert v.fingerprint[0] == ('FPR', 'fingerprint', '476935D6D659B4C27B700FEDABB2F2DC74991EE9')
+    assert gpg.fingerprint('0xABB2F2DC74991EE9') is v
+    assert gpg.fingerprint('0x2214D90A014F17CB') is not v
+    assert gpg.key_cache.hits == 1
+    (tmp_path / 'pubring.kbx').write_bytes(b'new keys')
+    assert gpg.fingerprint('0xABB2F2DC74991EE9') is not v
+
+
+def test_keyring_token_keyboxd(tmp_path):
+    keys = tmp_path / 'public-keys.d'
+    keys.mkdir()
+    token = keyring_token(str(tmp_path))
+    (keys / 'pubring.db').write_bytes(b'keys')
+    token2 = keyring_token(str(tmp_path))
+    assert token2 != token
+    # an import or delete only written to the write ahead log
+    (keys / 'pubring.db-wal').write_bytes(b'imported key')
+    assert keyring_token(str(tmp_path)) != token2
+
+
+def test_key_cache_keyboxd(tmp_path):
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_LIST_KEYS
+    cfg.options['key_cache_size'] = 4
+    cfg.options['tasks']['fingerprint'] = ['--homedir', str(tmp_path), '--with-colons']
+    (tmp_path / 'public-keys.d').mkdir()
+    (tmp_path / 'public-keys.d' / 'pubring.db').write_bytes(b'keys')
+    gpg = GPG(cfg)
+    v = gpg.fingerprint('0xABB2F2DC74991EE9')
+    assert gpg.fingerprint('0xABB2F2DC74991EE9') is v
+    (tmp_path / 'public-keys.d' / 'pubring.db-wal').write_bytes(b'deleted key')
+    assert gpg.fingerprint('0xABB2F2DC74991EE9') is not v
+
+
+def test_key_cache_disabled():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_LIST_KEYS
+    cfg.options['tasks']['fingerprint'] = ['--with-colons']
+    gpg = GPG(cfg)
+    assert gpg.fingerprint('0xABB2F2DC74991EE9') is not gpg.fingerprint('0xABB2F2DC74991EE9')
+    assert gpg.key_cache is None
+
+
+def test_verify_cache(tmp_path):
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_VERIFY
+    cfg.options['verify_cache_size'] = 4
+    cfg.options['tasks']['verify'] = ['--homedir', str(tmp_path)]
+    (tmp_path / 'trustdb.gpg').write_bytes(b'trust')
+    gpg = GPG(cfg)
+    v = gpg.verify_detached(b'signed text', b'signature')
+    assert v.verified[0] is True
+    assert gpg.verify_detached(b'signed text', 'signature') is v
+    assert gpg.verify_detached(b'other text', b'signature') is not v
+    nokey = gpg.verify_detached(b'signed text', b'nokey signature')
+    assert nokey.no_pubkey == (True, '2214D90A014F17CB')
+    assert gpg.verify_detached(b'signed text', b'nokey signature') is nokey
+    assert (gpg.verify_cache.hits, gpg.verify_cache.misses) == (2, 3)
+    assert gpg.metrics.snapshot()['verify']['count'] == 3
+    # a trustdb change invalidates the results
+    (tmp_path / 'trustdb.gpg').write_bytes(b'new trust')
+    assert gpg.verify_detached(b'signed text', b'signature') is not v
+    signed = tmp_path / 'signed'
+    signed.write_bytes(b'clearsigned text')
+    v = gpg.verify(inputfile=str(signed))
+    assert gpg.verify(inputfile=str(signed)) is v
+    assert gpg.verify(b'clearsigned text') is not v
+    signed.write_bytes(b'changed text')
+    assert gpg.verify(inputfile=str(signed)) is not v
+
+
+def test_verify_cache_keyboxd(tmp_path):
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_VERIFY
+    cfg.options['verify_cache_size'] = 4
+    cfg.options['tasks']['verify'] = ['--homedir', str(tmp_path)]
+    (tmp_path / 'public-keys.d').mkdir()
+    gpg = GPG(cfg)
+    v = gpg.verify_detached(b'signed text', b'signature')
+    assert gpg.verify_detached(b'signed text', b'signature') is v
+    # a revocation imported into keyboxd invalidates the verdicts
+    (tmp_path / 'public-keys.d' / 'pubring.db-wal').write_bytes(b'revoked')
+    assert gpg.verify_detached(b'signed text', b'signature') is not v
+
+
+def test_verify_cache_disabled():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_VERIFY
+    gpg = GPG(cfg)
+    assert gpg.verify_detached(b'text', b'sig') is not gpg.verify_detached(b'text', b'sig')
+    assert gpg.verify_cache is None
+
+
+def test_probe_cache(tmp_path):
+    binary = tmp_path / 'gpg'
+    binary.write_bytes(b'#! /bin/sh\n')
+    cache = ProbeCache(str(tmp_path / 'cache'))
+    assert cache.get(str(binary), 'version') is None
+    assert cache.put(str(binary), 'version', ['2.2.40'], ['args'])
+    assert cache.put(str(binary), 'dump-options', ['--armor'])
+    assert cache.get(str(binary), 'version', ['args']) == ['2.2.40']
+    assert cache.get(str(binary), 'version', ['other args']) is None
+    assert cache.get(str(binary), 'dump-options') == ['--armor']
+    # an upgraded binary invalidates the cache
+    binary.write_bytes(b'#! /bin/sh\n# upgraded\n')
+    assert cache.get(str(binary), 'version', ['args']) is None
+    assert binary_token(str(tmp_path / 'missing')) is None
+
+
+def test_probe_cache_version(tmp_path):
+    cfg = GPGConfig()
+    cfg.options['probe_cache_dir'] = str(tmp_path)
+    gpg = GPG(cfg)
+    version = gpg.version(verbose=True)
+    options = gpg.options
+    gpg = GPG(cfg)
+    # no gpg runs from now on
+    gpg.runGPG = None
+    assert gpg.version(verbose=True) == version
+    assert gpg.options == options
+
+
+def test_probe_cache_stale(tmp_path):
+    import json
+    import pyGPG.cache
+    cfg = GPGConfig()
+    cfg.options['probe_cache_dir'] = str(tmp_path)
+    version = GPG(cfg).version(verbose=True)
+    cache_file = next(tmp_path.glob('probe-*.json'))
+    cached = json.loads(cache_file.read_text())
+    # another pyGPG release or format version drops the entries
+    cached['pygpg'] = '0.1'
+    cache_file.write_text(json.dumps(cached))
+    assert ProbeCache(str(tmp_path)).get(cfg.get_key('gpg_command'),
+                                         'version') is None
+    cached['pygpg'] = pyGPG.cache.__version__
+    cached['version'] = pyGPG.cache.PROBE_VERSION + 1
+    cache_file.write_text(json.dumps(cached))
+    gpg = GPG(cfg)
+    assert gpg._load_probe('version') is None
+    # an entry not matching the GPG_VERSION fields is a miss
+    cached['version'] = pyGPG.cache.PROBE_VERSION
+    cached['probes']['version']['data'] = ['2.2.40']
+    cache_file.write_text(json.dumps(cached))
+    assert gpg._load_probe('version') is None
+    assert gpg.version(verbose=True) == version
+
+
+def test_verify_cache_data_file(tmp_path):
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_VERIFY
+    cfg.options['verify_cache_size'] = 4
+    cfg.options['tasks']['verify'] = ['--homedir', str(tmp_path)]
+    gpg = GPG(cfg)
+    data = tmp_path / 'foo'
+    data.write_bytes(b'signed text')
+    signature = str(tmp_path / 'foo.asc')
+    (tmp_path / 'foo.asc').write_bytes(b'signature')
+    v = gpg.verify(inputfile=signature)
+    assert gpg.verify(inputfile=signature) is v
+    # gpg checks the detached signature against foo, not in the inputs
+    data.write_bytes(b'changed text')
+    assert gpg.verify(inputfile=signature) is not v
+    data.unlink()
+    missing = gpg.verify(inputfile=signature)
+    assert missing is not v
+    assert gpg.verify(inputfile=signature) is missing
+
+
+def test_verify_cache_disabled_digests(monkeypatch):
+    import pyGPG.cache
+
+    def digest(*args):
+        raise AssertionError('digested with the verify cache disabled')
+    monkeypatch.setattr(pyGPG.cache, 'content_digest', digest)
+    monkeypatch.setattr(pyGPG.cache, 'file_digest', digest)
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_VERIFY
+    gpg = GPG(cfg)
+    assert gpg.verify(b'signed text').verified[0] is True
+    assert gpg.verify_detached(b'text', b'sig').verified[0] is True
@@ -0,0 +1,81 @@
+# File:       test/pyGPG/test_columns.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/columns.py tests
+
+'''
+
+from pyGPG import columns
+from pyGPG.columns import ColumnStore
+from pyGPG.output import GPGResult
+from pyGPG.status import Status
+
+
+LISTING = '\n'.join([
+    'tru::1:1485105495:1578417368:3:1:5',
+    'pub:u:4096:1:ABB2F2DC74991EE9:1485105368:1578417368::u:::cSC:::::::',
+    'fpr:::::::::476935D6D659B4C27B700FEDABB2F2DC74991EE9:',
+    'uid:u::::1485105368::64D29249C3C521D9557A5AE461B02179C7D5F227::pyGPG Test <pygpg@nowhere.foo>:',
+    'sub:u:4096:1:A9661AC8014A7CF0:1485105368:1578417368:::::s::::::',
+    'fpr:::::::::884D0847E08005BC1E6DA041A9661AC8014A7CF0:',
+    ])
+
+
+def test_columnstore1():
+    rows = Status()
+    rows.extract_output(LISTING)
+    store = Status(columnar=True)
+    store.extract_output(LISTING)
+    assert isinstance(store.data, ColumnStore)
+    assert store.data == rows.data
+    assert store.data[-1] == rows.data[-1]
+    assert store.data[1:3] == rows.data[1:3]
+    assert store.data[1].long_keyid == 'ABB2F2DC74991EE9'
+    assert store.find(('FPR',)) == rows.find(('FPR',))
+
+
+def test_columnstore2():
+    # mixed record classes and field counts, inserts
+    status = Status()
+    status.extract_data([
+        '[GNUPG:] NEWSIG',
+        '[GNUPG:] GOODSIG A9661AC8014A7CF0 pyGPG Test <pygpg@nowhere.foo>',
+        '[GNUPG:] TRUST_ULTIMATE 0 pgp',
+        ])
+    store = ColumnStore(status.data[1:])
+    store.insert(0, status.data[0])
+    assert store == status.data
+    assert list(reversed(store)) == list(reversed(status.data))
+
+
+def test_columnstore3(monkeypatch):
+    # past the vocabulary limit a column holds the values
+    monkeypatch.setattr(columns, 'VOCAB_LIMIT', 4)
+    status = Status()
+    status.extract_output('\n'.join(
+        'pub:u:4096:1:%016X:1485105368:1578417368::u:::cSC:::::::' % num
+        for num in range(10)))
+    store = ColumnStore(status.data)
+    assert store == status.data
+    assert isinstance(store._columns[3], list)
+    assert store._columns[0].typecode == 'B'
+
+
+def test_columnstore4():
+    # GPGResult queries on top of the columnar data
+    result = GPGResult(None, (LISTING.encode('UTF-8'), b''), extract_stdout=True,
+                       status=Status(columnar=True))
+    assert result.fingerprint == [
+        ('FPR', 'fingerprint', '476935D6D659B4C27B700FEDABB2F2DC74991EE9'),
+        ('FPR', 'fingerprint', '884D0847E08005BC1E6DA041A9661AC8014A7CF0')]
+    assert result.keyring.get('pygpg@nowhere.foo').long_keyid == 'ABB2F2DC74991EE9'
@@ -142,3 +142,78 @@ def test_sub_nottype():
 
 
 
+
+
+def test_compile_task1():
+    cfg = GPGConfig()
+    task = cfg.compile_task('list-keys')
+    assert task.args == ('/usr/bin/gpg', '--display-charset', 'utf-8', '--status-fd', '2', '--no-tty')
+    assert task.command == '--list-keys'
+    assert task.colons is False
+    assert cfg.compile_task('list-keys') is task
+
+
+def test_compile_task2():
+    cfg = GPGConfig()
+    task = cfg.compile_task('list-keys')
+    cfg.options['tasks']['list-keys'] = ['--homedir', '/tmp/foo']
+    task2 = cfg.compile_task('list-keys')
+    assert task2 is not task
+    assert task2.args[-2:] == ('--homedir', '/tmp/foo')
+    cfg.options['tasks']['list-keys'].append('--with-colons')
+    task3 = cfg.compile_task('list-keys')
+    assert task3.args[-1] == '--with-colons'
+    assert task3.colons is True
+
+
+def test_compile_task3():
+    cfg = GPGConfig()
+    cfg.compile_task('verify')
+    cfg.options = {'tasks': {}, 'gpg_command': '/usr/local/bin/gpg2'}
+    assert cfg.compile_task('verify').args[0] == '/usr/local/bin/gpg2'
+    cfg.options['homedir'] = '/tmp/foo'
+    cfg.options['tasks']['verify'] = ['--homedir', '%(homedir)s']
+    assert cfg.compile_task('verify').args[-1] == '/tmp/foo'
+    cfg.options['homedir'] = '/tmp/bar'
+    assert cfg.compile_task('verify').args[-1] == '/tmp/bar'
+
+
+def test_compile_task4():
+    # the caller's containers are used as they are, not copied
+    cfg = GPGConfig()
+    opts = ['--homedir', '/tmp/foo']
+    cfg.options['tasks']['verify'] = opts
+    assert cfg.compile_task('verify').args[-1] == '/tmp/foo'
+    opts.append('--x')
+    assert cfg.get_key('tasks', 'verify')[-1] == '--x'
+    assert cfg.compile_task('verify').args[-1] == '--x'
+    options = {'tasks': {}}
+    cfg.options = options
+    assert cfg.options is options
+    assert cfg.compile_task('verify').args[0] == '/usr/bin/gpg'
+    options['gpg_command'] = '/opt/gpg'
+    assert cfg.get_key('gpg_command') == '/opt/gpg'
+    assert cfg.compile_task('verify').args[0] == '/opt/gpg'
+    del options['tasks']
+    assert cfg.compile_task('verify').args[-1] == '--no-tty'
+
+
+def test_compile_task5():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = '%(gpg_dir)s/gpg'
+    cfg.options['gpg_dir'] = '/usr/bin'
+    assert cfg.compile_task('verify').args[0] == '/usr/bin/gpg'
+    cfg.options['gpg_dir'] = '/opt/bin'
+    assert cfg.compile_task('verify').args[0] == '/opt/bin/gpg'
+
+
+def test_sub_re():
+    cfg = GPGConfig()
+    assert cfg.sub_re == r'.*\%(.*)'
+    assert cfg.type_re.sub('', str(dict)).replace('class', '') == 'dict'
+    cfg.options['gpg_dir'] = '/opt/bin'
+    assert cfg._sub_('%(gpg_dir)s/gpg') == '/opt/bin/gpg'
+    # an overridden pattern is used
+    cfg.sub_re = r'^\%'
+    assert cfg._sub_('%(gpg_dir)s/gpg') == '/opt/bin/gpg'
+    assert cfg._sub_('/usr/%(gpg_dir)s') == '/usr/%(gpg_dir)s'
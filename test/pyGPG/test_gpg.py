@@ -6,6 +6,7 @@ import os
 from pyGPG import __version__
 from pyGPG.config import GPGConfig
 from pyGPG.gpg import GPG
+from pyGPG.status import Status
 
 
 
@@ -194,3 +195,294 @@ sub:u:4096:1:A9661AC8014A7CF0:1485105368:1578417368:::::s::::::
 fpr:::::::::884D0847E08005BC1E6DA041A9661AC8014A7CF0:
 '''
     assert v.stderr_out == ['[GNUPG:] KEY_CONSIDERED 476935D6D659B4C27B700FEDABB2F2DC74991EE9 0', '']
+
+
+def test_decrypt_stream1():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-cat')
+    gpg = GPG(cfg)
+    chunks = [b'x' * 100000 for i in range(20)]
+    received = []
+    v = gpg.decrypt(iter(chunks), sink=received.append)
+    assert b''.join(received) == b''.join(chunks)
+    assert v.output == ''
+    assert [x.name for x in v.status.data] == ['BEGIN_DECRYPTION', 'DECRYPTION_OKAY', 'END_DECRYPTION']
+
+
+def test_decrypt_stream3():
+    import itertools
+    import threading
+    import pytest
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-cat')
+    gpg = GPG(cfg)
+    threads = threading.active_count()
+
+    def sink(chunk):
+        raise ValueError('sink failed')
+    # gpg would never end, the endless input is cut short by its kill
+    with pytest.raises(ValueError):
+        gpg.decrypt(itertools.repeat(b'x' * 65536), sink=sink)
+    assert threading.active_count() == threads
+
+
+def test_decrypt_stream2():
+    import io
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-cat')
+    gpg = GPG(cfg)
+    source = io.BytesIO(b'some encrypted text\n' * 5000)
+    v = gpg.decrypt(source)
+    assert v.output == 'some encrypted text\n' * 5000
+    assert v.get_data(status_type='DECRYPTION_OKAY') != []
+
+
+def test_decrypt_buffers1():
+    import mmap
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-cat')
+    gpg = GPG(cfg)
+    data = b'some encrypted text\n' * 5000
+    buf = mmap.mmap(-1, len(data))
+    buf.write(data)
+    for source in ('some encrypted text\n' * 5000, bytearray(data),
+                   memoryview(data), buf):
+        v = gpg.decrypt(source)
+        assert v.output == 'some encrypted text\n' * 5000
+        assert v.timing.bytes_in == len(data)
+    received = []
+    gpg.decrypt(memoryview(data), sink=received.append)
+    assert b''.join(received) == data
+
+
+def test_decrypt_binary1():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-cat')
+    gpg = GPG(cfg)
+    data = bytes(bytearray(range(256))) * 1000
+    v = gpg.decrypt(data)
+    # not valid utf-8, the text result fails to decode
+    assert v.failed
+    assert v.decode_errors != []
+    v = gpg.decrypt(data, binary=True)
+    assert not v.failed
+    assert v.decode_errors == []
+    assert v.output == data
+    assert type(v.output) is bytes
+    assert v.timing.bytes_out == len(data)
+    assert isinstance(v.stderr_out, list)
+    received = []
+    v = gpg.decrypt(memoryview(data), sink=received.append, binary=True)
+    assert b''.join(received) == data
+    assert not v.output
+
+
+def test_decrypt_fds1(tmp_path):
+    path = tmp_path / 'encrypted'
+    path.write_bytes(b'some encrypted text\n' * 5000)
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-cat')
+    gpg = GPG(cfg)
+    # an open file as gpg's stdin
+    with open(str(path), 'rb') as source:
+        v = gpg.decrypt(source)
+    assert v.output == 'some encrypted text\n' * 5000
+    # raw fds as -&N special filenames
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        v = gpg.decrypt(inputfile=fd)
+    finally:
+        os.close(fd)
+    assert '--enable-special-filenames' in v.timing.args
+    assert v.timing.args[-1] == '-&%d' % fd
+    assert v.output == 'some encrypted text\n' * 5000
+
+
+def test_verify_detached1():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-verify')
+    gpg = GPG(cfg)
+    # a signature bigger than a pipe buffer
+    v = gpg.verify_detached(b'signed text' * 100000, b'signature' * 100000)
+    assert v.verified[0] is True
+    assert v.timing.args[-2:] == [v.timing.args[-2], '-']
+    assert v.timing.args[-2].startswith('-&')
+    v = gpg.verify_detached(memoryview(b''), 'nokey signature')
+    assert v.verified[0] is False
+    assert v.no_pubkey == (True, '2214D90A014F17CB')
+
+
+def test_status_pipe1():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-verify')
+    cfg.options['status_pipe'] = True
+    gpg = GPG(cfg)
+    v = gpg.verify(b'signed text')
+    assert v.verified[0] is True
+    assert v.verified[1].name == 'TRUST_ULTIMATE'
+    assert [x.name for x in v.status.data] == ['NEWSIG', 'GOODSIG', 'VALIDSIG', 'TRUST_ULTIMATE']
+    assert v.stderr_out == ['gpg: Signature made Sun 22 Jan 2017 09:16:08 AM PST',
+                            'gpg: Good signature from "pyGPG Test <pygpg@nowhere.foo>" [ultimate]', '']
+
+
+def test_status_pipe2():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-verify')
+    gpg = GPG(cfg)
+    v = gpg.verify(b'signed text')
+    assert v.verified[0] is True
+    assert len(v.stderr_out) == 7
+
+
+def test_verify_files1():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-verify-files')
+    gpg = GPG(cfg)
+    files = ['one.asc', 'two nokey.asc', 'missing.asc', 'three.asc']
+    v = gpg.verify_files(files, max_files=3)
+    assert list(v) == files
+    assert v['one.asc'].verified[0] is True
+    assert v['one.asc'].no_pubkey == (False, None)
+    assert v['one.asc'].fingerprint == [('VALIDSIG', 'fingerprint', '884D0847E08005BC1E6DA041A9661AC8014A7CF0')]
+    assert v['two nokey.asc'].verified == (False, 'Unknown')
+    assert v['two nokey.asc'].no_pubkey == (True, '2214D90A014F17CB')
+    assert v['missing.asc'].verified[0] is False
+    assert v['missing.asc'].get_data(status_type='FILE_ERROR')[0].filename == 'missing.asc'
+    assert v['three.asc'].verified[0] is True
+    # the results follow gpg's FILE_START filenames, not the positions
+    v = gpg.verify_files(['skipped.asc', 'nokey.asc', 'one.asc'])
+    assert v['skipped.asc'].verified[0] is False
+    assert v['skipped.asc'].get_data(status_type='PYGPG_ERROR')[0].error == 'no-file-status'
+    assert v['nokey.asc'].no_pubkey == (True, '2214D90A014F17CB')
+    assert v['one.asc'].verified[0] is True
+
+
+def test_chunk_args():
+    from pyGPG.gpg import chunk_args
+    assert list(chunk_args(['aaa', 'bbb', 'ccc'], max_bytes=8)) == [['aaa', 'bbb'], ['ccc']]
+    assert list(chunk_args(['a', 'b', 'c'], max_items=2)) == [['a', 'b'], ['c']]
+
+
+def test_lazy_results1():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-verify')
+    cfg.options['lazy_results'] = True
+    gpg = GPG(cfg)
+    v = gpg.verify(b'signed text')
+    assert v._parsed is False
+    assert v.failed is False
+    assert v._decoded is True
+    assert v._parsed is False
+    assert v.verified[0] is True
+    assert v._parsed is True
+    assert v.messages[0] == 'gpg: Signature made Sun 22 Jan 2017 09:16:08 AM PST'
+
+
+def test_lazy_results2():
+    from pyGPG.output import GPGResult
+    v = GPGResult(None, (b'\xff\xfe', b''), lazy=True)
+    assert v._decoded is False
+    assert v.failed is True
+    assert v.decode_errors[0] == "pyGPG.output(): Error decoding gpg output with utf-8"
+    assert v.status.data == []
+    assert v.messages == []
+
+
+def test_lazy_results3():
+    from threading import Thread
+    from pyGPG.output import GPGResult
+    key = (b'pub:u:4096:1:ABB2F2DC74991EE9:1485105368:1578417368::u:::cSC:::::::\n'
+           b'fpr:::::::::476935D6D659B4C27B700FEDABB2F2DC74991EE9:\n')
+    v = GPGResult(None, (key * 20000, b''), extract_stdout=True, lazy=True)
+    found = []
+    errors = []
+
+    def reader():
+        try:
+            found.append(len(v.fingerprint))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [Thread(target=reader) for num in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert found == [20000] * 4
+
+
+def test_listkeys_bulk1():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-list-keys')
+    gpg = GPG(cfg)
+    ids = ['0xABB2F2DC74991EE9', 'dolsen@gentoo.org', '0xDEADBEEFDEADBEEF',
+           '476935D6D659B4C27B700FEDABB2F2DC74991EE9', 'nobody@nowhere.foo']
+    v = gpg.listkeys_bulk(ids, max_ids=3)
+    assert list(v) == ids
+    assert len(v.results) == 2
+    assert v.missing == ['0xDEADBEEFDEADBEEF', 'nobody@nowhere.foo']
+    assert v['0xABB2F2DC74991EE9'].fingerprint == '476935D6D659B4C27B700FEDABB2F2DC74991EE9'
+    assert v['476935D6D659B4C27B700FEDABB2F2DC74991EE9'].long_keyid == 'ABB2F2DC74991EE9'
+    assert [x.name for x in v['dolsen@gentoo.org'].records] == ['PUB', 'FPR', 'UID', 'UID', 'SUB', 'FPR']
+    assert v['0xDEADBEEFDEADBEEF'] is None
+
+
+def test_fingerprints1():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-list-keys')
+    gpg = GPG(cfg)
+    v = gpg.fingerprints(['0x2214D90A014F17CB', '0x2214D90A014F17CB'])
+    assert list(v) == ['0x2214D90A014F17CB']
+    assert v['0x2214D90A014F17CB'].fingerprints == [
+        '8688FD1CC71C1C04EAEA42372214D90A014F17CB', 'B8A0A8AAB4CB4B16E0C5C2A265E309F2189DB0B8']
+    assert v.missing == []
+
+
+def test_iter_listing1():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-list-keys')
+    gpg = GPG(cfg)
+    records = gpg.iter_listing('list-keys', ['0xABB2F2DC74991EE9'])
+    assert next(records).name == 'TRU'
+    assert [x.name for x in records] == ['PUB', 'FPR', 'UID', 'SUB', 'FPR']
+
+
+def test_iter_listing2():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-list-keys')
+    gpg = GPG(cfg)
+    status = Status()
+    keys = list(gpg.iter_listing('list-keys', ['0xABB2F2DC74991EE9', '0x2214D90A014F17CB'],
+                                 keys=True, status=status))
+    assert [x.fingerprint for x in keys] == ['476935D6D659B4C27B700FEDABB2F2DC74991EE9',
+                                             '8688FD1CC71C1C04EAEA42372214D90A014F17CB']
+    assert status.data == []
+
+
+def test_iter_listing3():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-list-keys')
+    gpg = GPG(cfg)
+    records = gpg.iter_listing('list-keys', ['0xABB2F2DC74991EE9', '0x2214D90A014F17CB'])
+    # stopping early reaps gpg
+    assert next(records).name == 'TRU'
+    records.close()
+
+
+def test_iter_listing4(tmp_path):
+    from pyGPG.replay import Corpus, RecordingBackend, ReplayBackend
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-list-keys')
+    path = str(tmp_path / 'runs.jsonl')
+    gpg = GPG(cfg, backend=RecordingBackend(Corpus(path)))
+    seen = []
+    gpg.hooks.append(seen.append)
+    names = [x.name for x in gpg.iter_listing('list-keys', ['0xABB2F2DC74991EE9'])]
+    assert names == ['TRU', 'PUB', 'FPR', 'UID', 'SUB', 'FPR']
+    assert seen[0].timing.bytes_out > 0
+    assert gpg.metrics.snapshot()['list-keys']['count'] == 1
+    # replayed without gpg
+    cfg.options['gpg_command'] = '/nonexistent/gpg'
+    gpg = GPG(cfg, backend=ReplayBackend(Corpus(path)))
+    assert [x.name for x in gpg.iter_listing('list-keys', ['0xABB2F2DC74991EE9'])] == names
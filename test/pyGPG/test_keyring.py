@@ -0,0 +1,93 @@
+# File:       test/pyGPG/test_keyring.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/keyring.py tests
+
+'''
+
+import os
+
+from pyGPG.config import GPGConfig
+from pyGPG.gpg import GPG
+from pyGPG.keyring import Keyring, email_of
+from pyGPG.status import Status
+
+LISTING = '''tru::1:1485105495:1578417368:3:1:5
+pub:u:4096:1:ABB2F2DC74991EE9:1485105368:1578417368::u:::cSC:::::::
+fpr:::::::::476935D6D659B4C27B700FEDABB2F2DC74991EE9:
+uid:u::::1485105368::64D29249C3C521D9557A5AE461B02179C7D5F227::pyGPG Test <pygpg@nowhere.foo>:
+sig:::1:ABB2F2DC74991EE9:1485105368::::pyGPG Test <pygpg@nowhere.foo>:13x:::::8:
+sub:u:4096:1:A9661AC8014A7CF0:1485105368:1578417368:::::s::::::
+fpr:::::::::884D0847E08005BC1E6DA041A9661AC8014A7CF0:
+pub:-:2048:1:2214D90A014F17CB:1267578490:1393894470::-:::scESC:
+fpr:::::::::8688FD1CC71C1C04EAEA42372214D90A014F17CB:
+uid:-::::1350795605::C25D1F20E350D3CB86FC477A74F5BBAFF2119B50::Brian Dolbec <dolsen@gentoo.org>:
+uid:-::::1330822470::F107C1F60159DD59F568B512EC20954A025C3423::PyGPG Test <PYGPG@nowhere.foo>:
+'''
+
+
+def keyring():
+    status = Status()
+    status.extract_output(LISTING)
+    return Keyring.from_records(status.data)
+
+
+def test_email_of():
+    assert email_of('pyGPG Test <PyGPG@nowhere.foo>') == 'pygpg@nowhere.foo'
+    assert email_of('pygpg@nowhere.foo') == 'pygpg@nowhere.foo'
+    assert email_of('pyGPG Test') is None
+
+
+def test_grouping():
+    keys = keyring()
+    assert len(keys) == 2
+    key = keys.keys[0]
+    assert key.fingerprint == '476935D6D659B4C27B700FEDABB2F2DC74991EE9'
+    assert key.long_keyid == 'ABB2F2DC74991EE9'
+    assert [x.fingerprint for x in key.subkeys] == ['884D0847E08005BC1E6DA041A9661AC8014A7CF0']
+    assert [x.user_ID for x in key.uids] == ['pyGPG Test <pygpg@nowhere.foo>']
+    assert len(key.uids[0].sigs) == 1
+    assert [x.name for x in key.records] == ['PUB', 'FPR', 'UID', 'SIG', 'SUB', 'FPR']
+    assert [x.name for x in key.subkeys[0].records] == ['SUB', 'FPR']
+
+
+def test_lookups():
+    keys = keyring()
+    first, second = keys.keys
+    assert keys.get('0xABB2F2DC74991EE9') is first
+    assert keys.get('a9661ac8014a7cf0') is first
+    assert keys.get('884D0847E08005BC1E6DA041A9661AC8014A7CF0') is first
+    assert keys.get('8688 FD1C C71C 1C04 EAEA  4237 2214 D90A 014F 17CB') is second
+    assert keys.get('<dolsen@gentoo.org>') is second
+    assert keys.find('pygpg@nowhere.foo') == [first, second]
+    assert keys.get('0xDEADBEEFDEADBEEF') is None
+    assert 'dolsen@gentoo.org' in keys
+
+
+def test_result_keyring():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-list-keys')
+    cfg.options['tasks']['list-keys'] = ['--with-colons']
+    v = GPG(cfg).listkeys(['pygpg@nowhere.foo', 'dolsen@gentoo.org'])
+    assert len(v.keyring) == 2
+    assert v.keyring.get('dolsen@gentoo.org').fingerprint == '8688FD1CC71C1C04EAEA42372214D90A014F17CB'
+    assert v.keyring is v.keyring
+
+
+def test_lookups2():
+    keys = keyring()
+    first, second = keys.keys
+    assert keys.get('74991EE9') is first
+    assert keys.get('0x014F17CB') is second
+    assert keys.find('brian dolbec') == [second]
+    assert keys.find('pyGPG Test') == [first, second]
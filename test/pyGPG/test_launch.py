@@ -0,0 +1,111 @@
+# File:       test/pyGPG/test_launch.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/launch.py tests
+
+'''
+
+import os
+
+import pytest
+
+from pyGPG.config import GPGConfig
+from pyGPG.gpg import GPG
+from pyGPG.launch import (ForkServerBackend, SpawnBackend, FinishedProcess,
+    launcher_backend)
+
+TEST_DIR = os.path.dirname(os.path.dirname(__file__))
+
+
+def _verify(launcher):
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TEST_DIR, 'gpg-verify')
+    cfg.options['launcher'] = launcher
+    return GPG(cfg).verify(b'signed text')
+
+
+def test_posix_spawn():
+    if not hasattr(os, 'posix_spawn'):
+        pytest.skip('no os.posix_spawn')
+    v = _verify('posix_spawn')
+    assert isinstance(v.gpg, FinishedProcess)
+    assert v.gpg.returncode == 0
+    assert v.status.data == _verify('popen').status.data
+
+
+def test_posix_spawn_failure():
+    if not hasattr(os, 'posix_spawn'):
+        pytest.skip('no os.posix_spawn')
+    gpg, results = SpawnBackend().run(['sh', '-c', 'cat; echo err >&2; exit 3'], b'in')
+    assert gpg.returncode == 3
+    assert results == (b'in', b'err\n')
+
+
+def test_posix_spawn_path(tmp_path):
+    if not hasattr(os, 'posix_spawn'):
+        pytest.skip('no os.posix_spawn')
+    script = tmp_path / 'fake-gpg'
+    script.write_bytes(b'#! /bin/sh\necho found\n')
+    script.chmod(0o755)
+    # looked up in the gpg environment's PATH, not the process one
+    gpg, results = SpawnBackend().run(['fake-gpg'], b'',
+        {'PATH': str(tmp_path)})
+    assert results == (b'found\n', b'')
+    with pytest.raises(OSError):
+        SpawnBackend().run(['fake-gpg'], b'', dict(os.environ))
+
+
+def test_posix_spawn_popen_runs():
+    if not hasattr(os, 'posix_spawn'):
+        pytest.skip('no os.posix_spawn')
+    from subprocess import Popen
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TEST_DIR, 'gpg-verify')
+    cfg.options['launcher'] = 'posix_spawn'
+    gpg = GPG(cfg)
+    # the runs the launcher can not do are left to Popen
+    v = gpg.verify_detached(b'signed text', b'signature')
+    assert isinstance(v.gpg, Popen)
+    assert v.verified[0] is True
+    out = []
+    v = gpg.verify(iter([b'signed ', b'text']), sink=out.append)
+    assert isinstance(v.gpg, Popen)
+    cfg.options['status_pipe'] = True
+    v = gpg.verify(b'signed text')
+    assert isinstance(v.gpg, Popen)
+    assert [x.name for x in v.status.data] == ['NEWSIG', 'GOODSIG', 'VALIDSIG', 'TRUST_ULTIMATE']
+
+
+def test_forkserver():
+    backend = ForkServerBackend()
+    try:
+        gpg, results = backend.run(['sh', '-c', 'cat; exit 4'], b'in', {'PATH': os.environ['PATH']})
+        assert gpg.returncode == 4
+        assert gpg.pid != os.getpid()
+        assert results == (b'in', b'')
+    finally:
+        backend.shutdown()
+
+
+def test_launcher_backend():
+    assert launcher_backend('popen') is None
+    with pytest.raises(ValueError):
+        launcher_backend('fork')
+
+
+def test_lazy_env():
+    gpg = GPG(GPGConfig())
+    assert gpg._env is None
+    gpg.env['GNUPGHOME'] = '/nowhere'
+    assert gpg.homedir('verify') == '/nowhere'
+    assert 'GNUPGHOME' not in os.environ or os.environ['GNUPGHOME'] != '/nowhere'
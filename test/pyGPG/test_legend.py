@@ -25,3 +25,17 @@ from pyGPG.legend import *
 def test_classes():
     klass = PYGPG_VERSION('0.1.0', 'BSD')
     assert isinstance(klass, PYGPG_VERSION)
+
+
+def test_lazy_classes():
+    from pyGPG import legend
+    klass = getattr(legend, 'KEY_CREATED')
+    assert klass is legend.KEY_CREATED
+    assert klass.name == 'KEY_CREATED'
+    assert list(klass._fields) == ['type', 'fingerprint', 'handle']
+    try:
+        legend.NOT_A_STATUS
+    except AttributeError:
+        pass
+    else:
+        assert False, 'no AttributeError'
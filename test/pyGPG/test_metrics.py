@@ -0,0 +1,101 @@
+# File:       test/pyGPG/test_metrics.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/metrics.py tests
+
+'''
+
+import io
+import os
+
+from pyGPG.config import GPGConfig
+from pyGPG.gpg import GPG
+from pyGPG.metrics import Histogram, Metrics, Timing
+
+TEST_DIR = os.path.dirname(os.path.dirname(__file__))
+
+
+def test_histogram():
+    histogram = Histogram((0.1, 1.0, float('inf')))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.add(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.as_dict()['buckets'][0] == (0.1, 2)
+
+
+def test_metrics():
+    metrics = Metrics()
+    timing = Timing('verify', ['gpg', '--verify'])
+    timing.spawn, timing.wait = 0.002, 0.010
+    timing.bytes_in = 10
+    metrics.record(timing)
+    metrics.record(timing, failed=True)
+    snapshot = metrics.snapshot()
+    assert snapshot['verify']['count'] == 2
+    assert snapshot['verify']['failures'] == 1
+    assert snapshot['verify']['bytes_in'] == 20
+    assert snapshot['verify']['latency']['count'] == 2
+    metrics.reset()
+    assert metrics.snapshot() == {}
+
+
+def test_gpg_timing():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TEST_DIR, 'gpg-verify')
+    gpg = GPG(cfg)
+    seen = []
+    gpg.hooks.append(seen.append)
+    v = gpg.verify(b'signed text')
+    assert seen == [v]
+    timing = v.timing
+    assert timing.task == 'verify'
+    assert timing.args[0] == cfg.options['gpg_command']
+    assert timing.spawn > 0 and timing.wait > 0 and timing.parse > 0
+    assert timing.bytes_in == len(b'signed text')
+    assert timing.bytes_err > 0
+    assert timing.returncode == 0
+    assert gpg.metrics.snapshot()['verify']['count'] == 1
+
+
+def test_gpg_hook_error():
+    import logging
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TEST_DIR, 'gpg-verify')
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger('pyGPG-testing-hooks')
+    logger.addHandler(handler)
+    gpg = GPG(cfg, logger=logger)
+    seen = []
+
+    def failing(result):
+        raise RuntimeError('hook failed')
+    gpg.hooks.extend([failing, seen.append])
+    v = gpg.verify(b'signed text')
+    assert v.verified[0] is True
+    assert seen == [v]
+    assert [r.exc_info[0] for r in records if r.exc_info] == [RuntimeError]
+    logger.removeHandler(handler)
+
+
+def test_gpg_timing_stream():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TEST_DIR, 'gpg-cat')
+    gpg = GPG(cfg)
+    out = io.BytesIO()
+    v = gpg.decrypt(io.BytesIO(b'x' * 100000), sink=out)
+    assert v.timing.bytes_in == 100000
+    assert v.timing.bytes_out == 100000
+    assert gpg.metrics.snapshot()['decrypt']['bytes_out'] == 100000
@@ -0,0 +1,51 @@
+# File:       test/pyGPG/test_pool.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/pool.py tests
+
+'''
+
+import os
+
+from pyGPG.config import GPGConfig
+from pyGPG.pool import GPGPool
+
+GPG_VERIFY = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-verify')
+
+
+def test_submit():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_VERIFY
+    with GPGPool(cfg, workers=4, max_pending=2) as pool:
+        futures = [pool.submit('verify', b'signed text') for i in range(10)]
+        results = [f.result() for f in futures]
+    assert len(results) == 10
+    assert all(r.verified[0] for r in results)
+
+
+def test_map():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_VERIFY
+    with GPGPool(cfg, workers=3) as pool:
+        results = list(pool.map('verify', [b'text %d' % i for i in range(8)]))
+    assert len(results) == 8
+    assert all(r.verified[0] for r in results)
+
+
+def test_runGPG():
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_VERIFY
+    with GPGPool(cfg, workers=2) as pool:
+        result = pool.runGPG('verify', b'signed text').result()
+    assert result.no_pubkey == (False, None)
+    assert result.verified[0]
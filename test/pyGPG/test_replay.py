@@ -0,0 +1,60 @@
+# File:       test/pyGPG/test_replay.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/replay.py tests
+
+'''
+
+import io
+import os
+
+import pytest
+
+from pyGPG.config import GPGConfig
+from pyGPG.gpg import GPG
+from pyGPG.replay import (Corpus, RecordingBackend, ReplayBackend, ReplayMiss,
+    ReplayedProcess)
+
+TEST_DIR = os.path.dirname(os.path.dirname(__file__))
+
+
+def test_record_replay(tmp_path):
+    path = str(tmp_path / 'runs.jsonl')
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TEST_DIR, 'gpg-verify')
+    recorded = GPG(cfg, backend=RecordingBackend(Corpus(path))).verify(b'signed text')
+    assert recorded.verified[0] is True
+
+    # no gpg executable needed to replay
+    cfg.options['gpg_command'] = '/nonexistent/gpg'
+    gpg = GPG(cfg, backend=ReplayBackend(Corpus(path)))
+    replayed = gpg.verify(b'signed text')
+    assert isinstance(replayed.gpg, ReplayedProcess)
+    assert replayed.verified == recorded.verified
+    assert replayed.status.data == recorded.status.data
+    assert replayed.returncode == recorded.returncode
+    with pytest.raises(ReplayMiss):
+        gpg.verify(b'other text')
+
+
+def test_replay_sink():
+    corpus = Corpus()
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = os.path.join(TEST_DIR, 'gpg-cat')
+    GPG(cfg, backend=RecordingBackend(corpus)).decrypt(b'secret')
+    assert len(corpus) == 1
+    out = io.BytesIO()
+    v = GPG(cfg, backend=ReplayBackend(corpus)).decrypt(io.BytesIO(b'secret'), sink=out)
+    assert out.getvalue() == b'secret'
+    assert v.output == ''
+    assert v.timing.bytes_out == 6
@@ -0,0 +1,116 @@
+# File:       test/pyGPG/test_status.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/status.py tests
+
+'''
+
+from pyGPG.status import Status
+
+
+def test_extract_data1():
+    status = Status()
+    msgs = status.extract_data([
+        '[GNUPG:] NEWSIG',
+        'gpg: Good signature from "pyGPG Test <pygpg@nowhere.foo>" [ultimate]',
+        '[GNUPG:] GOODSIG A9661AC8014A7CF0 pyGPG Test <pygpg@nowhere.foo>',
+        '[GNUPG:] NEED_PASSPHRASE A9661AC8014A7CF0',
+        ])
+    assert msgs == ['gpg: Good signature from "pyGPG Test <pygpg@nowhere.foo>" [ultimate]']
+    assert [x.name for x in status.data] == ['NEWSIG', 'GOODSIG', 'NEED_PASSPHRASE']
+    assert status.data[1].username == 'pyGPG Test <pygpg@nowhere.foo>'
+    assert status.data[2] == ('A9661AC8014A7CF0', None, None, None)
+
+
+def test_extract_data2():
+    status = Status()
+    status.extract_data([
+        '[GNUPG:] KEY_CONSIDERED 476935D6D659B4C27B700FEDABB2F2DC74991EE9 0',
+        '[GNUPG:] NEWSIG pygpg@nowhere.foo',
+        ])
+    assert [x.name for x in status.data] == ['NEWSIG']
+    assert [x.name for x in status.errors] == ['PYGPG_ATTRIBUTE_ERROR', 'PYGPG_UNEXPECTED_DATA']
+    assert status.errors[0].classname == 'KEY_CONSIDERED'
+    assert status.errors[1].extra_data == "['pygpg@nowhere.foo']"
+    # the extra data of a record without fields is split on every space
+    status.extract_data(['[GNUPG:] NEWSIG pyGPG Test <pygpg@nowhere.foo>'])
+    assert status.errors[2].extra_data == "['pyGPG', 'Test', '<pygpg@nowhere.foo>']"
+
+
+def test_isinstance_msg():
+    from pyGPG.legend import GPG_IDENTIFIER
+    status = Status()
+    assert status.isinstance_msg(GPG_IDENTIFIER, '[GNUPG:] NEWSIG')
+    assert not Status.isinstance_msg(GPG_IDENTIFIER, 'gpg: Good signature')
+
+
+def test_split_files():
+    status = Status()
+    status.extract_data([
+        '[GNUPG:] KEYEXPIRED 1485105368',
+        '[GNUPG:] FILE_START 1 one.asc',
+        '[GNUPG:] NEWSIG',
+        '[GNUPG:] FILE_DONE',
+        '[GNUPG:] FILE_START 1 two words.asc',
+        '[GNUPG:] FILE_ERROR 1 two words.asc',
+        '[GNUPG:] FILE_START 1 three.asc',
+        '[GNUPG:] FILE_DONE',
+        ])
+    files = status.split_files()
+    assert [x[0] for x in files] == [None, 'one.asc', 'two words.asc', 'three.asc']
+    assert [x.name for x in files[0][1].data] == ['KEYEXPIRED']
+    assert [x.name for x in files[1][1].data] == ['FILE_START', 'NEWSIG', 'FILE_DONE']
+    assert [x.name for x in files[2][1].data] == ['FILE_START', 'FILE_ERROR']
+
+
+def test_find():
+    status = Status()
+    status.extract_data([
+        '[GNUPG:] GOODSIG A9661AC8014A7CF0 pyGPG Test <pygpg@nowhere.foo>',
+        '[GNUPG:] NO_PUBKEY 2214D90A014F17CB',
+        '[GNUPG:] TRUST_ULTIMATE 0 pgp',
+        ])
+    assert [x.name for x in status.find(('TRUST_ULTIMATE', 'GOODSIG'))] == ['GOODSIG', 'TRUST_ULTIMATE']
+    assert status.find_fields(('long_keyid',)) == [
+        ('GOODSIG', 'long_keyid', 'A9661AC8014A7CF0'),
+        ('NO_PUBKEY', 'long_keyid', '2214D90A014F17CB')]
+    assert status.find_fields(('username', 'long_keyid'), ('GOODSIG',)) == [
+        ('GOODSIG', 'long_keyid', 'A9661AC8014A7CF0'),
+        ('GOODSIG', 'username', 'pyGPG Test <pygpg@nowhere.foo>')]
+    # the indexes follow newly added data
+    status.extract_line('[GNUPG:] NO_PUBKEY 476935D6D659B4C2')
+    assert len(status.find(('NO_PUBKEY',))) == 2
+    # a new data list of the same length
+    data = list(status.data)
+    data[-1] = data[0]
+    status.data = data
+    assert [x.name for x in status.find(('NO_PUBKEY',))] == ['NO_PUBKEY']
+    # the query results kept are bounded
+    for num in range(200):
+        status.find_fields(('field%d' % num,))
+    assert len(status._indexes()[1]) <= 64
+
+
+def test_find_columnar():
+    msgs = [
+        '[GNUPG:] GOODSIG A9661AC8014A7CF0 pyGPG Test <pygpg@nowhere.foo>',
+        '[GNUPG:] NO_PUBKEY 2214D90A014F17CB',
+        '[GNUPG:] TRUST_ULTIMATE 0 pgp',
+        ]
+    status, columnar = Status(), Status(columnar=True)
+    status.extract_data(msgs)
+    columnar.extract_data(msgs)
+    for fields, names in [(('long_keyid',), None),
+                          (('username', 'long_keyid'), ('GOODSIG',)),
+                          (('validation_model', 'long_keyid'), None)]:
+        assert columnar.find_fields(fields, names) == status.find_fields(fields, names)
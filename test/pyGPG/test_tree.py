@@ -0,0 +1,136 @@
+# File:       test/pyGPG/test_tree.py
+#
+#             Python Interface access to gnupg
+#
+# Copyright:
+#             (c) 2017 Brian Dolbec
+#             Distributed under the terms of the BSD license
+#
+# Author(s):
+#             Brian Dolbec <dolsen@gentoo.org>
+#
+
+'''
+pyGPG/tree.py tests
+
+'''
+
+import json
+import os
+
+from pyGPG.config import GPGConfig
+from pyGPG.tree import TreeVerifier
+
+GPG_VERIFY = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gpg-verify')
+
+
+def _tree(tmp_path):
+    root = tmp_path / 'tree'
+    (root / 'sub').mkdir(parents=True)
+    (root / 'Manifest').write_bytes(b'DIST foo 1')
+    (root / 'Manifest.asc').write_bytes(b'signature')
+    (root / 'sub' / 'Manifest').write_bytes(b'DIST bar 2')
+    (root / 'sub' / 'Manifest.asc').write_bytes(b'nokey signature')
+    (root / 'sub' / 'data.bin').write_bytes(b'\xff\xfe')
+    (root / 'sub' / 'data.bin.sig').write_bytes(b'bad signature')
+    (root / 'orphan.asc').write_bytes(b'signature')
+    (root / 'unsigned').write_bytes(b'text')
+    return root
+
+
+def _verifier(tmp_path):
+    cfg = GPGConfig()
+    cfg.options['gpg_command'] = GPG_VERIFY
+    cfg.options['tasks']['verify'] = ['--homedir', str(tmp_path)]
+    return TreeVerifier(cfg, state_file=str(tmp_path / 'state.json'), workers=2)
+
+
+def test_tree_verify1(tmp_path):
+    root = _tree(tmp_path)
+    verifier = _verifier(tmp_path)
+    report = verifier.verify(str(root))
+    assert list(report.results) == ['Manifest.asc', 'orphan.asc',
+                                    os.path.join('sub', 'Manifest.asc'),
+                                    os.path.join('sub', 'data.bin.sig')]
+    verdicts = dict((path, r.verdict) for path, r in report.results.items())
+    assert verdicts == {'Manifest.asc': 'good', 'orphan.asc': 'missing-data',
+                        os.path.join('sub', 'Manifest.asc'): 'no-pubkey',
+                        os.path.join('sub', 'data.bin.sig'): 'bad'}
+    assert report.results['Manifest.asc'].path == 'Manifest'
+    assert report.results['Manifest.asc'].fingerprint == '884D0847E08005BC1E6DA041A9661AC8014A7CF0'
+    assert report.results['Manifest.asc'].result.verified[0] is True
+    assert sorted(report.failed) == ['orphan.asc',
+                                     os.path.join('sub', 'Manifest.asc'),
+                                     os.path.join('sub', 'data.bin.sig')]
+    summary = report.summary
+    assert (summary['files'], summary['checked'], summary['cached']) == (4, 3, 0)
+    assert (summary['good'], summary['bad'], summary['no-pubkey']) == (1, 1, 1)
+    with open(str(tmp_path / 'state.json')) as state:
+        assert json.load(state)['files']['Manifest.asc']['verdict'] == 'good'
+
+
+def test_tree_verify2(tmp_path):
+    root = _tree(tmp_path)
+    verifier = _verifier(tmp_path)
+    verifier.verify(str(root))
+    # nothing changed, nothing sent to gpg
+    report = verifier.verify(str(root))
+    assert (report.summary['checked'], report.summary['cached']) == (0, 3)
+    assert report.results['Manifest.asc'].verdict == 'good'
+    assert report.results['Manifest.asc'].result is None
+    # touched, same content
+    os.utime(str(root / 'Manifest'), (1, 1))
+    report = verifier.verify(str(root))
+    assert report.summary['checked'] == 0
+    # a changed signature and a removed file
+    (root / 'Manifest.asc').write_bytes(b'bad signature, changed')
+    os.unlink(str(root / 'sub' / 'data.bin'))
+    os.unlink(str(root / 'sub' / 'data.bin.sig'))
+    report = verifier.verify(str(root))
+    assert report.summary['checked'] == 1
+    assert report.results['Manifest.asc'].verdict == 'bad'
+    assert report.removed == [os.path.join('sub', 'data.bin.sig')]
+    # a keyring change re-verifies everything
+    (tmp_path / 'pubring.kbx').write_bytes(b'keys')
+    report = verifier.verify(str(root))
+    assert report.summary['checked'] == 2
+    assert verifier.verify(str(root), full=True).summary['checked'] == 2
+    # so does a gpg 2.4 keyboxd one
+    (tmp_path / 'public-keys.d').mkdir()
+    (tmp_path / 'public-keys.d' / 'pubring.db').write_bytes(b'keys')
+    assert verifier.verify(str(root)).summary['checked'] == 2
+    assert verifier.verify(str(root)).summary['checked'] == 0
+    (tmp_path / 'public-keys.d' / 'pubring.db-wal').write_bytes(b'revoked')
+    assert verifier.verify(str(root)).summary['checked'] == 2
+
+
+def test_tree_verify_signatures(tmp_path):
+    root = _tree(tmp_path)
+    # a second signature of the same data file
+    (root / 'Manifest.sig').write_bytes(b'bad signature')
+    verifier = _verifier(tmp_path)
+    report = verifier.verify(str(root))
+    assert report.results['Manifest.asc'].verdict == 'good'
+    assert report.results['Manifest.sig'].verdict == 'bad'
+    assert report.results['Manifest.sig'].path == 'Manifest'
+    assert report.summary['files'] == 5
+    # both verdicts are kept in the state file
+    report = verifier.verify(str(root))
+    assert report.summary['cached'] == 4
+    assert report.results['Manifest.asc'].verdict == 'good'
+    assert report.results['Manifest.sig'].verdict == 'bad'
+
+
+def test_tree_verify_cache(tmp_path, monkeypatch):
+    import pyGPG.cache
+
+    def digest(*args):
+        raise AssertionError('digested twice')
+    root = _tree(tmp_path)
+    verifier = _verifier(tmp_path)
+    verifier.config.options['verify_cache_size'] = 16
+    # the tree digests the files itself, the verify cache is not used
+    monkeypatch.setattr(pyGPG.cache, 'file_digest', digest)
+    report = verifier.verify(str(root))
+    assert report.summary['checked'] == 3
+    assert report.results['Manifest.asc'].verdict == 'good'